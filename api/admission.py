@@ -0,0 +1,248 @@
+"""
+Admission control for requests that wait on Groq.
+
+- Each client gets a token bucket of requests a minute. A client over its
+  rate is turned away at once with 429 and the seconds until its next token.
+- At most `max_concurrent` admitted requests run at a time. A request holds
+  its slot until its response, streamed or not, has been sent.
+- Requests beyond that wait in a bounded queue, best priority first: chat
+  turns ahead of interactive features, then summaries, then batch items. A
+  full queue makes room by dropping its lowest-priority waiter, if the new
+  request outranks it.
+- Every request has a deadline. One whose expected wait in the queue would
+  not leave time to finish is shed immediately with 503 and Retry-After,
+  rather than holding a thread until it times out. The expected wait comes
+  from a moving average of how long requests hold a slot.
+
+`max_concurrent=0` disables the slots and queue; `per_minute=0` disables the
+client buckets.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from werkzeug.wsgi import ClosingIterator
+
+PRIORITIES = ("chat", "interactive", "summary", "batch")  # best first
+
+
+class Overloaded(Exception):
+    """A request turned away: `status` is 429 or 503, `retry_after` the seconds to wait before retrying."""
+
+    def __init__(self, status, retry_after, message):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class ClientBuckets:
+    """
+    A token bucket per client: `per_minute` requests a minute, in bursts of
+    up to `burst` (default: ten seconds' worth, at least 5). The least
+    recently seen clients beyond `max_clients` are forgotten.
+    """
+
+    def __init__(self, per_minute=0, burst=None, max_clients=10_000):
+        self.rate = per_minute / 60.0
+        self.burst = burst or max(5.0, self.rate * 10)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, client):
+        """0 if `client` may go ahead (a token is spent), else the seconds until it may."""
+        if self.rate <= 0 or client is None:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class _Waiter:
+    __slots__ = ("event", "admitted", "dropped")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.dropped = False
+
+
+class Admission:
+    def __init__(self, max_concurrent=0, queue_size=64, clients=None, proxies=0, service=1.0):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.clients = clients or ClientBuckets()
+        self.proxies = proxies
+        self._service = service  # moving average of the seconds a slot is held
+        self._active = 0
+        self._queue = []  # heap of (rank, seq, waiter)
+        self._seq = itertools.count()
+        self._admitted = dict.fromkeys(PRIORITIES, 0)
+        self._shed = {}  # (priority, reason) -> count
+        self._lock = threading.Lock()
+
+    def admit(self, client, priority, deadline):
+        """
+        Waits for a slot for a request of `priority` that must finish within
+        `deadline` seconds; returns the token to pass to release(). Raises
+        Overloaded if the request is turned away. `client=None` skips the
+        client's bucket (background work).
+        """
+        wait = self.clients.take(client)
+        if wait:
+            with self._lock:
+                self._count_shed_locked(priority, "client_rate")
+            raise Overloaded(429, wait, "Too many requests. Please slow down and try again shortly.")
+        if self.max_concurrent <= 0:
+            return self._granted(priority)
+
+        rank = PRIORITIES.index(priority)
+        with self._lock:
+            if self._active < self.max_concurrent:
+                self._active += 1
+                return self._granted_locked(priority)
+            ahead = sum(1 for queued, _, _ in self._queue if queued <= rank)
+            expected = (ahead + 1) * self._service / self.max_concurrent
+            budget = deadline - self._service
+            if expected > budget:
+                raise self._rejected_locked(priority, "deadline", expected)
+            if len(self._queue) >= self.queue_size:
+                lowest = max(self._queue)
+                if lowest[0] <= rank:
+                    raise self._rejected_locked(priority, "queue_full", expected)
+                self._queue.remove(lowest)
+                heapq.heapify(self._queue)
+                lowest[2].dropped = True
+                lowest[2].event.set()
+            waiter = _Waiter()
+            heapq.heappush(self._queue, (rank, next(self._seq), waiter))
+
+        waiter.event.wait(budget)
+        with self._lock:
+            if waiter.admitted:
+                return self._granted_locked(priority)
+            if not waiter.dropped:
+                self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                heapq.heapify(self._queue)
+            raise self._rejected_locked(priority, "dropped" if waiter.dropped else "timeout", self._service)
+
+    def release(self, token):
+        """Frees the slot taken by admit(), handing it to the best waiter, if any."""
+        if self.max_concurrent <= 0:
+            return
+        with self._lock:
+            self._service += 0.2 * (time.monotonic() - token - self._service)
+            if self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                waiter.admitted = True
+                waiter.event.set()
+            else:
+                self._active -= 1
+
+    @contextmanager
+    def slot(self, client, priority, deadline):
+        token = self.admit(client, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release(token)
+
+    def _granted(self, priority):
+        with self._lock:
+            return self._granted_locked(priority)
+
+    def _granted_locked(self, priority):
+        self._admitted[priority] += 1
+        return time.monotonic()
+
+    def _count_shed_locked(self, priority, reason):
+        self._shed[(priority, reason)] = self._shed.get((priority, reason), 0) + 1
+
+    def _rejected_locked(self, priority, reason, retry_after):
+        self._count_shed_locked(priority, reason)
+        return Overloaded(503, retry_after, "The server is busy. Please try again shortly.")
+
+    def client_of(self, request):
+        """The client's address: the peer, or with `proxies` proxies in front, the address they forwarded."""
+        route = request.access_route
+        if self.proxies and len(route) >= self.proxies:
+            return route[-self.proxies]
+        return request.remote_addr
+
+    # ── Flask hooks ──
+    def install(self, app, request, routes):
+        """
+        Admits requests to the views in `routes` (view name -> (priority,
+        deadline seconds)) before they run. A turned-away request raises
+        Overloaded, for an app error handler to answer.
+        """
+
+        @app.before_request
+        def _admit():
+            route = routes.get(request.endpoint)
+            if route is not None:
+                request.environ["smartnotes.admission"] = [self.admit(self.client_of(request), *route)]
+
+        @app.after_request
+        def _hold_while_streaming(response):
+            held = request.environ.get("smartnotes.admission")
+            if held and response.is_streamed:
+                token, held[:] = held[0], []
+                response.response = ClosingIterator(response.response, lambda: self.release(token))
+            return response
+
+        @app.teardown_request
+        def _release(exc):
+            held = request.environ.get("smartnotes.admission")
+            if held:
+                token, held[:] = held[0], []
+                self.release(token)
+
+    def info(self):
+        with self._lock:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "service_seconds": round(self._service, 3),
+                "admitted": dict(self._admitted),
+                "shed": dict(self._shed),
+            }
+
+
+def admission_from_env():
+    """
+    ADMIT_CONCURRENCY: admitted requests running at once per worker (default 32; 0 disables).
+    ADMIT_QUEUE: requests waiting for a slot per worker (default 24).
+    CLIENT_RPM: requests a minute per client for the whole server, split
+    between the WEB_CONCURRENCY workers (default 0: no limit), in bursts of
+    CLIENT_BURST per worker.
+    CLIENT_PROXIES: reverse proxies in front of the app whose
+    X-Forwarded-For names the client (default 0).
+    """
+    workers = max(1, int(os.environ.get("WEB_CONCURRENCY", 2)))
+    burst = os.environ.get("CLIENT_BURST")
+    return Admission(
+        max_concurrent=int(os.environ.get("ADMIT_CONCURRENCY", 32)),
+        queue_size=int(os.environ.get("ADMIT_QUEUE", 24)),
+        clients=ClientBuckets(float(os.environ.get("CLIENT_RPM", 0)) / workers,
+                              burst=float(burst) if burst else None),
+        proxies=int(os.environ.get("CLIENT_PROXIES", 0)),
+    )
@@ -1,10 +1,38 @@
-from flask import Flask, render_template, request, jsonify
-from groq import Groq
+from flask import Flask, Response, abort, render_template, request, jsonify, stream_with_context
+from groq import DefaultHttpxClient, Groq
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import chain, compress, count, repeat
+import base64
+import codecs
+import hashlib
+import heapq
+import hmac
+import httpx
 import json
 import os
+import random
 import re
+import threading
+import time
+import zlib
 from dotenv import load_dotenv
 
+from admission import Overloaded, admission_from_env
+from assets import REVALIDATE, Assets, Precompressed
+from cache import MemoryCache, SQLiteCache, cache_from_env, make_key
+from jobs import JobRunner, RetryLater, job_store_from_env
+from jsonextract import (JsonExtractor, any_of, is_complete_json, list_of, one_of, optional,
+                         parse_json, validate)
+from metrics import metrics_from_env
+from resilience import CircuitOpen, DeadlineExceeded, resilient_from_env
+from retrieval import PassageIndex, terms
+from router import router_from_env
+from singleflight import singleflight_from_env
+
 load_dotenv()
 
 # ─── CONFIG ───────────────────────────────────────────────────────────────────
@@ -13,10 +41,144 @@ MAX_SYLLABUS_CHARS = 2_000
 MAX_SUMMARY_CHARS  = 8_000
 MAX_FC_CHARS       = 6_000
 
+SYSTEM_PROMPT = (
+    "You are an expert academic assistant. "
+    "Always respond with valid JSON only — "
+    "no markdown, no explanation, no extra text."
+)
+
+# Uploaded notes sessions (/api/notes): lifetime and size bound. Sessions are
+# stored in SQLite (NOTES_SESSION_PATH) for every worker, and the scored
+# sessions in use are kept in each worker's memory within the same bound.
+NOTES_SESSION_TTL         = int(os.environ.get("NOTES_SESSION_TTL", 2 * 3600))
+NOTES_SESSION_MAX_ENTRIES = int(os.environ.get("NOTES_SESSION_MAX_ENTRIES", 500))
+NOTES_SESSION_MAX_BYTES   = int(os.environ.get("NOTES_SESSION_MAX_BYTES", 64 * 1024 * 1024))
+NOTES_SESSION_PATH        = os.environ.get("NOTES_SESSION_PATH", "/tmp/smartnotes-notes.sqlite3")
+
+# Multipart notes files (.txt/.md) are read UPLOAD_READ_BYTES at a time and
+# never held whole; UPLOAD_MAX_BYTES caps the request body.
+UPLOAD_MAX_BYTES  = int(os.environ.get("UPLOAD_MAX_BYTES", 50 * 1024 * 1024))
+UPLOAD_READ_BYTES = 64 * 1024
+UPLOAD_FILE_TYPES = (".txt", ".md")
+
+# Chat context: prompt-token budget per turn, how many recent messages are
+# sent verbatim, and how long a conversation's running summary is kept.
+CHAT_TOKEN_BUDGET     = int(os.environ.get("CHAT_TOKEN_BUDGET", 3000))
+CHAT_RECENT_MESSAGES  = int(os.environ.get("CHAT_RECENT_MESSAGES", 8))
+CHAT_SUMMARY_TOKENS   = 300
+CHAT_SUMMARY_TTL      = int(os.environ.get("CHAT_SUMMARY_TTL", 6 * 3600))
+
+# Chat grounding: notes sent with a chat turn are indexed in passages of about
+# CHAT_PASSAGE_CHARS, and only the CHAT_PASSAGES best matches for the question,
+# up to CHAT_NOTES_CHARS in all, go into the prompt.
+CHAT_PASSAGE_CHARS = 600
+CHAT_PASSAGES      = int(os.environ.get("CHAT_PASSAGES", 5))
+CHAT_NOTES_CHARS   = int(os.environ.get("CHAT_NOTES_CHARS", 2500))
+
+# Large-notes mode (`"full": true`): notes over MAX_NOTES_CHARS are split into
+# chunks of about MAP_CHUNK_CHARS that are condensed MAP_CONCURRENCY at a time
+# per worker. Notes beyond MAP_MAX_CHARS are trimmed to it first.
+MAP_CHUNK_CHARS = int(os.environ.get("MAP_CHUNK_CHARS", 6000))
+MAP_CONCURRENCY = int(os.environ.get("MAP_CONCURRENCY", 4))
+MAP_MAX_CHARS   = int(os.environ.get("MAP_MAX_CHARS", 400_000))
+
+# Question bank: per set of notes, about this many quiz questions and
+# flashcards are generated once and served in fresh mixes. 0 turns it off,
+# and every request generates its own set as before.
+QUIZ_BANK_SIZE      = int(os.environ.get("QUIZ_BANK_SIZE", 40))
+FLASHCARD_BANK_SIZE = int(os.environ.get("FLASHCARD_BANK_SIZE", 50))
+QUIZ_MIX      = {"easy": 3, "medium": 3, "hard": 2}
+FLASHCARD_MIX = {"easy": 4, "medium": 3, "hard": 3}
+
+# Batch jobs (/api/batch/analyze) are stored in SQLite (JOBS_PATH) and run
+# BATCH_WORKERS items at a time per worker process.
+BATCH_WORKERS       = int(os.environ.get("BATCH_WORKERS", 4))
+BATCH_MAX_DOCUMENTS = int(os.environ.get("BATCH_MAX_DOCUMENTS", 500))
+BATCH_STREAM_SECONDS = int(os.environ.get("BATCH_STREAM_SECONDS", 300))  # per results stream
+
+# One pooled HTTP client per process, shared by every request thread. Size the
+# pool to the number of requests a worker serves at once (see gunicorn.conf.py).
+GROQ_MAX_CONNECTIONS = int(os.environ.get("GROQ_MAX_CONNECTIONS", 128))
+
+# Seconds a Groq call may take per endpoint, retries included (see resilience.py).
+# Override with GROQ_DEADLINES="chat=20,evaluate=5".
+GROQ_DEADLINES = {
+    "default":      30.0,
+    "analyze":      45.0,
+    "flashcards":   45.0,
+    "quiz":         45.0,
+    "summary":      60.0,
+    "chunk_digest": 45.0,
+    "evaluate":     10.0,   # has a local fallback, so give up early
+    "chat":         30.0,
+    "chat_summary": 60.0,   # background work, nobody is waiting on it
+}
+
 api_key = os.environ.get("GROQ_API_KEY")
 
-client = Groq(api_key=api_key)
-app = Flask(__name__)
+# Feedback ids are signed, so /api/quiz-feedback only generates feedback for
+# outcomes this server graded. Every worker must share the secret; without
+# FEEDBACK_SECRET it is derived from the Groq API key.
+FEEDBACK_SECRET = (os.environ.get("FEEDBACK_SECRET", "").encode("utf-8")
+                   or hashlib.sha256(b"smartnotes feedback ids\0" + (api_key or "").encode("utf-8")).digest())
+
+client = Groq(
+    api_key=api_key,
+    http_client=DefaultHttpxClient(
+        limits=httpx.Limits(
+            max_connections=GROQ_MAX_CONNECTIONS,
+            max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+            keepalive_expiry=30.0,
+        ),
+    ),
+    max_retries=0,  # retries are done by `groq_calls` below, within each endpoint's deadline
+)
+llm_cache = cache_from_env()
+
+
+def revive_flight_error(error):
+    """
+    A leader in another worker that hit the open breaker or its deadline
+    fails its followers here the same way, so they answer 503 or 504 too.
+    """
+    if error.kind == "CircuitOpen":
+        return CircuitOpen(error.retry_after or 1.0)
+    if error.kind == "DeadlineExceeded":
+        return DeadlineExceeded(str(error))
+    return error
+
+
+flights = singleflight_from_env(revive=revive_flight_error)
+models = router_from_env()
+chat_summaries = MemoryCache(ttl=CHAT_SUMMARY_TTL, max_entries=2000)
+notes_indexes = MemoryCache(ttl=NOTES_SESSION_TTL, max_entries=64,  # notes hash -> PassageIndex
+                            max_bytes=NOTES_SESSION_MAX_BYTES, sizeof=PassageIndex.size)
+quiz_feedback = MemoryCache(ttl=24 * 3600, max_entries=2000,  # feedback_id -> AI feedback
+                            sizeof=lambda feedback: len(json.dumps(feedback)))
+background = ThreadPoolExecutor(max_workers=4, thread_name_prefix="background")
+map_pool = ThreadPoolExecutor(max_workers=MAP_CONCURRENCY, thread_name_prefix="map")
+job_store = job_store_from_env()
+app = Flask(__name__, static_folder=None)  # static files are served by `assets` below
+metrics = metrics_from_env()
+metrics.install(app, request)
+groq_calls = resilient_from_env(
+    client.chat.completions.create, GROQ_DEADLINES, max_workers=GROQ_MAX_CONNECTIONS,
+    on_event=lambda name, endpoint: metrics.inc(f"smartnotes_groq_{name}_total", (("endpoint", endpoint),)),
+)
+# Routes that wait on Groq or start Groq work: admission priority and the
+# deadline their wait for a slot must leave time for (see admission.py). Quiz
+# evaluation is graded locally and falls back to local feedback, so it is
+# never turned away; fetching its feedback later is.
+admission = admission_from_env()
+admission.install(app, request, {
+    "ai_chat":             ("chat", groq_calls.deadline("chat")),
+    "analyze_notes":       ("interactive", groq_calls.deadline("analyze")),
+    "generate_flashcards": ("interactive", groq_calls.deadline("flashcards")),
+    "generate_quiz":       ("interactive", groq_calls.deadline("quiz")),
+    "summarize_notes":     ("summary", groq_calls.deadline("summary")),
+    "study_pack":          ("summary", groq_calls.deadline("summary")),
+    "get_quiz_feedback":   ("interactive", groq_calls.deadline("evaluate")),
+})
 
 
 # ─── HELPERS ──────────────────────────────────────────────────────────────────
@@ -64,12 +226,15 @@ _STOP_WORDS = {
 }
 
 
+_SYLLABUS_BULLET = re.compile(r'^\s*[\-\*\•\d\.\)]+\s*')
+
+
 def extract_syllabus_keywords(syllabus):
     if not syllabus or not syllabus.strip():
         return []
     keywords = set()
     for line in syllabus.splitlines():
-        clean = re.sub(r'^\s*[\-\*\•\d\.\)]+\s*', '', line).strip()
+        clean = _SYLLABUS_BULLET.sub('', line).strip()
         if not clean:
             continue
         tokens = re.findall(r"[a-zA-Z']+", clean.lower())
@@ -84,41 +249,212 @@ def extract_syllabus_keywords(syllabus):
     return list(keywords)
 
 
-def smart_trim(text, max_chars, syllabus=''):
-    text = text.strip()
-    if len(text) <= max_chars:
-        return text
-
-    syllabus_keywords = extract_syllabus_keywords(syllabus)
-    raw_lines = re.split(r'(?<=[.!?])\s+|\n+', text)
-    lines = [l.strip() for l in raw_lines if l.strip()]
-
-    if not lines:
-        return text[:max_chars]
-
-    def score_line(line):
-        lower = line.lower()
-        syllabus_hits = sum(1 for kw in syllabus_keywords if kw in lower)
-        base_hits     = sum(1 for kw in BASE_KEYWORDS if kw in lower)
-        length_bonus  = min(len(line), 300) / 300
-        return syllabus_hits * 5 + base_hits * 2 + length_bonus
+class KeywordMatcher:
+    """
+    Counts, per line, how many distinct keywords occur as substrings — the
+    same answer as `sum(1 for kw in keywords if kw in line.lower())`, without
+    testing every keyword against every line.
+
+    Single-word keywords are folded into one trie-shaped regex that is run
+    once over the distinct space-separated tokens of the text. Multi-word
+    keywords are matched token-by-token from their first word: the first word
+    must end a token, middle words must equal whole tokens and the last word
+    must start a token. Lines must not contain newlines.
+    """
 
-    scored_lines = [(i, line, score_line(line)) for i, line in enumerate(lines)]
+    def __init__(self, keywords):
+        counts = Counter(keywords)
+        self.keywords = sorted(kw for kw in counts if kw)
+        index = {kw: i for i, kw in enumerate(self.keywords)}
+        # Duplicate keywords count once per copy and "" matches every line.
+        self._weights = None
+        if "" in counts or any(n > 1 for n in counts.values()):
+            self._weights = [counts[kw] for kw in self.keywords]
+        self._always = counts[""]
+        words = [kw for kw in self.keywords if " " not in kw and "\n" not in kw]
+
+        # The regex reports the longest keyword starting at each position;
+        # every other keyword starting there is a prefix of it.
+        self._prefix_ids = {
+            kw: tuple(index[kw[:n]] for n in range(1, len(kw) + 1) if kw[:n] in index)
+            for kw in words
+        }
+        trie = {}
+        for kw in words:
+            node = trie
+            for ch in kw:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        self._regex = re.compile("(?=(" + self._trie_pattern(trie) + "))") if words else None
+
+        self._phrases = {}
+        for kw in self.keywords:
+            if " " in kw:
+                first, *rest = kw.split(" ")
+                self._phrases.setdefault(first, []).append((index[kw], rest[:-1], rest[-1]))
+        self._first_lens = sorted({len(first) for first in self._phrases})
+
+    @classmethod
+    def _trie_pattern(cls, node):
+        branches = [re.escape(ch) + cls._trie_pattern(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = "(?:" + body + ")?"
+        return body
+
+    def _word_ids(self, tokens):
+        found = {}
+        if self._regex is None:
+            return found
+        text = "\n".join(tokens)
+        starts = [0] + [m.end() for m in re.finditer("\n", text)]
+        for m in self._regex.finditer(text):
+            token = tokens[bisect_right(starts, m.start()) - 1]
+            found.setdefault(token, set()).update(self._prefix_ids[m.group(1)])
+        return found
+
+    def _phrase_heads(self, tokens):
+        heads = {}
+        for token in tokens:
+            n = len(token)
+            for size in self._first_lens:
+                if size > n:
+                    break
+                first = token[n - size:]
+                if first in self._phrases:
+                    heads.setdefault(token, []).extend(self._phrases[first])
+        return heads
+
+    @staticmethod
+    def tokenize(lines):
+        split = [line.lower().split(" ") for line in lines]
+        return split, list(set(chain.from_iterable(split)))
+
+    def count_hits(self, lines, tokens=None):
+        """`tokens` may carry a `tokenize(lines)` result shared between matchers."""
+        split, vocab = tokens or self.tokenize(lines)
+        word_ids = self._word_ids(vocab).get
+        heads = self._phrase_heads(vocab)
+
+        hits = []
+        for parts in split:
+            found = set(chain.from_iterable(map(word_ids, parts, repeat(()))))
+            if heads and not heads.keys().isdisjoint(parts):
+                for i in compress(count(), map(heads.__contains__, parts)):
+                    for kw_id, middle, last in heads[parts[i]]:
+                        j = i + 1 + len(middle)
+                        if (j < len(parts) and kw_id not in found
+                                and parts[i + 1:j] == middle and parts[j].startswith(last)):
+                            found.add(kw_id)
+            if self._weights is None:
+                hits.append(len(found))
+            else:
+                hits.append(sum(self._weights[i] for i in found) + self._always)
+        return hits
+
+
+_BASE_MATCHER = KeywordMatcher(BASE_KEYWORDS)
+
+
+@lru_cache(maxsize=64)
+def syllabus_matcher(syllabus):
+    return KeywordMatcher(extract_syllabus_keywords(syllabus))
+
+
+class ScoredDocument:
+    """
+    Notes split into sentences and scored once, so they can be trimmed to
+    any number of budgets. `trim(n)` returns exactly what
+    `smart_trim(text, n, syllabus)` does.
 
-    spread_budget   = int(max_chars * 0.60)
-    priority_budget = max_chars - spread_budget
+    `trimmed(n)` returns the trim as a document of its own, scored without
+    a syllabus — the same as calling smart_trim again on the trimmed text —
+    by reusing the keyword hits instead of rescoring every line.
+    """
 
-    chunk_size = max(20, len(lines) // 20)
-    chunks = [scored_lines[i:i + chunk_size] for i in range(0, len(scored_lines), chunk_size)]
+    def __init__(self, text, syllabus=''):
+        self.text = text.strip()
+        self.syllabus = syllabus
+        self._scored = None
+        self._trims = {}
+
+    @classmethod
+    def _from_lines(cls, lines, base_hits):
+        doc = cls('\n'.join(lines))
+        doc._scored = (lines, [
+            (i, line, base_hits[i] * 2 + min(len(line), 300) / 300)
+            for i, line in enumerate(lines)
+        ], base_hits)
+        return doc
+
+    def _score(self):
+        # Built lazily: texts already under budget are never split.
+        if self._scored is None:
+            raw_lines = _SENTENCE_BREAK.split(self.text)
+            lines = [l.strip() for l in raw_lines if l.strip()]
+            tokens = KeywordMatcher.tokenize(lines)
+            syllabus_hits = syllabus_matcher(self.syllabus).count_hits(lines, tokens)
+            base_hits     = _BASE_MATCHER.count_hits(lines, tokens)
+            scored_lines = [
+                (i, line, syllabus_hits[i] * 5 + base_hits[i] * 2 + min(len(line), 300) / 300)
+                for i, line in enumerate(lines)
+            ]
+            self._scored = (lines, scored_lines, base_hits)
+        return self._scored
+
+    def _select(self, max_chars):
+        lines, scored_lines, _ = self._score()
+        chunk_size = max(20, len(lines) // 20)
+        chunks = [scored_lines[i:i + chunk_size] for i in range(0, len(scored_lines), chunk_size)]
+        block_bests = (max(chunk, key=lambda x: x[2]) for chunk in chunks)
+        return _select_lines(block_bests, scored_lines, max_chars)
+
+    def trim(self, max_chars):
+        if len(self.text) <= max_chars:
+            return self.text
+        if max_chars not in self._trims:
+            if not self._score()[0]:
+                self._trims[max_chars] = self.text[:max_chars]
+            else:
+                self._trims[max_chars] = '\n'.join(line for _, line in self._select(max_chars))
+        return self._trims[max_chars]
+
+    def trimmed(self, max_chars):
+        if len(self.text) <= max_chars or not self._score()[0]:
+            return ScoredDocument(self.trim(max_chars))
+        lines, _, base_hits = self._score()
+        selected = self._select(max_chars)
+        kept_lines = [line for _, line in selected]
+        kept_hits = [
+            base_hits[i] if line is lines[i] else _BASE_MATCHER.count_hits([line])[0]
+            for i, line in selected
+        ]
+        return ScoredDocument._from_lines(kept_lines, kept_hits)
+
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def _select_lines(block_bests, candidates, max_chars):
+    """
+    smart_trim's selection from (i, line, score) triples. 60% of the budget
+    goes to the best line of each block, in document order, to spread the
+    trim over the whole text. The rest goes to the highest-scoring remaining
+    `candidates` (in document order, so ties go to the earlier line). Returns
+    [(i, line)] sorted by i.
+    """
+    spread_budget = int(max_chars * 0.60)
 
     selected_indices = set()
     selected = []
     total_chars = 0
 
-    for chunk in chunks:
-        if not chunk or total_chars >= spread_budget:
+    for best in block_bests:
+        if total_chars >= spread_budget:
             break
-        best = max(chunk, key=lambda x: x[2])
         i, line, score = best
         needed = len(line) + 1
         if total_chars + needed <= spread_budget:
@@ -126,7 +462,7 @@ def smart_trim(text, max_chars, syllabus=''):
             selected_indices.add(i)
             total_chars += needed
 
-    remaining_lines = [(i, line, score) for i, line, score in scored_lines
+    remaining_lines = [(i, line, score) for i, line, score in candidates
                        if i not in selected_indices]
     remaining_lines.sort(key=lambda x: x[2], reverse=True)
 
@@ -143,58 +479,523 @@ def smart_trim(text, max_chars, syllabus=''):
             remaining_budget = 0
 
     selected.sort(key=lambda x: x[0])
-    return '\n'.join(line for _, line in selected)
+    return selected
+
+
+class StreamingTrim:
+    """
+    smart_trim for text that arrives in pieces (an upload read in chunks),
+    in memory proportional to `max_chars` rather than to the text.
+
+    Lines are split at the same breaks and scored the same way as in
+    ScoredDocument. The spread pass needs the line count up front, so its
+    blocks start at 20 lines and double, keeping the better line of each
+    pair, whenever there are 40. The priority pass keeps only the
+    best-scoring lines that could still make the cut. Text that fits the
+    budget is kept verbatim, so a short upload trims exactly like smart_trim.
+    text() also takes a smaller budget, so one pass serves several.
+    """
+
+    BLOCKS = 20
+
+    def __init__(self, max_chars, syllabus=''):
+        self.max_chars = max_chars
+        self.chars = 0
+        self._matcher = syllabus_matcher(syllabus)
+        self._raw = []           # the text so far, until it is clearly over budget
+        self._pending = ""       # the unfinished last line
+        self._lines = 0
+        self._block_size = self.BLOCKS
+        self._blocks = []        # (i, line, score): the best line of each full block
+        self._block = None
+        self._block_fill = 0
+        self._best = []          # min-heap of (score, -i, line): priority candidates
+        self._best_chars = 0
+
+    def feed(self, text):
+        self.chars += len(text)
+        if self._raw is not None:
+            self._raw.append(text)
+            if self.chars > 2 * self.max_chars:
+                self._raw = None
+        parts = _SENTENCE_BREAK.split(self._pending + text)
+        self._pending = parts.pop()
+        if len(self._pending) > self.max_chars:
+            parts.append(self._pending)
+            self._pending = ""
+        self._score([line.strip() for line in parts if line.strip()])
+
+    def _score(self, lines):
+        if not lines:
+            return
+        tokens = KeywordMatcher.tokenize(lines)
+        syllabus_hits = self._matcher.count_hits(lines, tokens)
+        base_hits = _BASE_MATCHER.count_hits(lines, tokens)
+        for line, s_hits, b_hits in zip(lines, syllabus_hits, base_hits):
+            self._add(self._lines, line, s_hits * 5 + b_hits * 2 + min(len(line), 300) / 300)
+            self._lines += 1
+
+    def _add(self, i, line, score):
+        if self._block is None or score > self._block[2]:
+            self._block = (i, line, score)
+        self._block_fill += 1
+        if self._block_fill == self._block_size:
+            self._blocks.append(self._block)
+            self._block, self._block_fill = None, 0
+            if len(self._blocks) == 2 * self.BLOCKS:
+                pairs = zip(self._blocks[::2], self._blocks[1::2])
+                self._blocks = [b if b[2] > a[2] else a for a, b in pairs]
+                self._block_size *= 2
+
+        heapq.heappush(self._best, (score, -i, line))
+        self._best_chars += len(line) + 1
+        while self._best_chars - len(self._best[0][2]) - 1 >= 2 * self.max_chars:
+            self._best_chars -= len(heapq.heappop(self._best)[2]) + 1
+
+    def text(self, max_chars=None):
+        """The text trimmed to `max_chars` (at most the constructor's), after the last feed()."""
+        max_chars = min(max_chars or self.max_chars, self.max_chars)
+        last = self._pending.strip()
+        self._pending = ""
+        self._score([last] if last else [])
+        if self._raw is not None:
+            text = "".join(self._raw).strip()
+            if len(text) <= max_chars:
+                return text
+        blocks = self._blocks + ([self._block] if self._block is not None else [])
+        candidates = sorted(((-neg_i, line, score) for score, neg_i, line in self._best))
+        return "\n".join(line for _, line in _select_lines(blocks, candidates, max_chars))
+
+
+SCORED_DOC_CACHE_SIZE = int(os.environ.get("SCORED_DOC_CACHE_SIZE", 32))
+_scored_docs = OrderedDict()
+_scored_docs_lock = threading.Lock()
+
+
+def _doc_key(text, syllabus):
+    return hashlib.sha256(f"{len(syllabus)}:{syllabus}{text}".encode("utf-8")).hexdigest()
+
+
+def scored_document(text, syllabus=''):
+    """ScoredDocument for (text, syllabus), shared across requests by content hash."""
+    text = text.strip()
+    key = _doc_key(text, syllabus)
+    with _scored_docs_lock:
+        doc = _scored_docs.get(key)
+        if doc is not None:
+            _scored_docs.move_to_end(key)
+            return doc
+    return remember_document(ScoredDocument(text, syllabus))
+
+
+def remember_document(doc):
+    with _scored_docs_lock:
+        key = _doc_key(doc.text, doc.syllabus)
+        _scored_docs[key] = doc
+        _scored_docs.move_to_end(key)
+        while len(_scored_docs) > SCORED_DOC_CACHE_SIZE:
+            _scored_docs.popitem(last=False)
+    return doc
+
+
+def smart_trim(text, max_chars, syllabus=''):
+    text = text.strip()
+    if len(text) <= max_chars:
+        return text
+    return scored_document(text, syllabus).trim(max_chars)
 
 
 def get_notes_from_request():
+    with metrics.stage("notes"):
+        return _notes_from_request()
+
+
+def _notes_from_request():
     data = request.get_json(silent=True) or {}
+    if data.get("notes_id"):
+        session = load_notes_session(str(data["notes_id"]))
+        if session is None:
+            raise NotesSessionNotFound()
+        data.setdefault("syllabus", session.syllabus)
+        remember_document(session.doc)
+        return data, session.notes
+
     syllabus = data.get("syllabus", "").strip()
-    notes = smart_trim(data.get("notes", "").strip(), MAX_NOTES_CHARS, syllabus=syllabus)
+    doc = scored_document(data.get("notes", "").strip(), syllabus)
+    # Later trims of these notes (flashcards, summary) find the trimmed
+    # document in the cache and skip rescoring.
+    notes = remember_document(doc.trimmed(MAX_NOTES_CHARS)).text
     return data, notes
 
 
+# ─── NOTES SESSIONS ───────────────────────────────────────────────────────────
+# Notes uploaded once to /api/notes and referenced by `notes_id` afterwards.
+# The text is stored in SQLite, which every worker reads, so a notes_id works
+# whichever worker serves the request. A worker that has not seen the session
+# yet rebuilds it from the stored, already-trimmed text and keeps it in memory.
+class NotesSessionNotFound(Exception):
+    pass
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class NotesSession:
+    """
+    Uploaded notes, trimmed and scored up front for every route's budget.
+    Uploads pass their already-trimmed `notes`, with the original length as
+    `chars` and the MAP_MAX_CHARS trim, for large-notes mode, as `full_text`.
+    """
+
+    def __init__(self, notes_id, notes, syllabus, chars=None, full_text=None):
+        self.id = notes_id
+        self.syllabus = syllabus
+        self.chars = len(notes) if chars is None else chars
+        self.full_text = notes if full_text is None else full_text  # for large-notes mode
+        self.doc = scored_document(notes, syllabus).trimmed(MAX_NOTES_CHARS)
+        self.notes = self.doc.text
+        for budget in (MAX_FC_CHARS, MAX_SUMMARY_CHARS):
+            self.doc.trim(budget)
+        self.syllabus_keywords = extract_syllabus_keywords(syllabus)
+
+    def size(self):
+        # The full text, plus the trimmed text with its lines and trims, roughly.
+        return len(self.full_text) + 4 * len(self.notes) + 2 * len(self.syllabus)
+
+    def info(self):
+        return {
+            "notes_id": self.id,
+            "chars": self.chars,
+            "trimmed_chars": len(self.notes),
+            "word_count": len(self.notes.split()),
+            "syllabus_keywords": len(self.syllabus_keywords),
+            "expires_in": notes_sessions.ttl,
+        }
+
+
+notes_sessions = MemoryCache(
+    ttl=NOTES_SESSION_TTL,
+    max_entries=NOTES_SESSION_MAX_ENTRIES,
+    max_bytes=NOTES_SESSION_MAX_BYTES,
+    sizeof=NotesSession.size,
+)
+notes_store = SQLiteCache(
+    NOTES_SESSION_PATH,
+    ttl=NOTES_SESSION_TTL,
+    max_entries=NOTES_SESSION_MAX_ENTRIES,
+    max_bytes=NOTES_SESSION_MAX_BYTES,
+    table="notes_sessions",
+)
+
+
+def load_notes_session(notes_id):
+    """The NotesSession for `notes_id`, from this worker's memory or the shared store; None if unknown or expired."""
+    session = notes_sessions.get(notes_id)
+    if session is None:
+        stored = notes_store.get(notes_id)
+        if stored is None:
+            return None
+        stored = json.loads(stored)
+        session = NotesSession(notes_id, stored["notes"], stored["syllabus"],
+                               chars=stored["chars"], full_text=stored["full_text"])
+        notes_sessions.set(notes_id, session)
+    return session
+
+
+def save_notes_session(session):
+    """
+    Keeps `session` in this worker's memory and (again, renewing its
+    lifetime) in the shared store. Raises UploadError (413) if it is too
+    large for either, rather than hand out a notes_id that would not work.
+    """
+    record = json.dumps({
+        "notes": session.notes,
+        "syllabus": session.syllabus,
+        "chars": session.chars,
+        "full_text": session.full_text,
+    }, ensure_ascii=False)
+    if max(session.size(), len(record.encode("utf-8"))) > NOTES_SESSION_MAX_BYTES:
+        raise UploadError("Notes are too large to keep on the server; send them with each request instead", 413)
+    notes_sessions.set(session.id, session)
+    notes_store.set(session.id, record)
+
+
+class NotesUpload:
+    """
+    A notes file fed in byte chunks as it is read. Keeps only the trims for
+    MAX_NOTES_CHARS and MAP_MAX_CHARS and a running hash, so memory does not
+    grow with the file. The hash equals _doc_key(notes.strip(), syllabus), so
+    the same notes get the same notes_id whether sent as JSON or as a file.
+    """
+
+    def __init__(self, syllabus):
+        self.syllabus = syllabus
+        self.trim = StreamingTrim(max(MAX_NOTES_CHARS, MAP_MAX_CHARS), syllabus)
+        self._hash = hashlib.sha256(f"{len(syllabus)}:{syllabus}".encode("utf-8"))
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._started = False
+        self._whitespace = ""  # trailing whitespace, hashed only if more text follows
+
+    def feed(self, data, final=False):
+        text = self._decoder.decode(data, final)
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        body = text.rstrip()
+        if not body:
+            self._whitespace += text
+            return
+        body, self._whitespace = self._whitespace + body, text[len(body):]
+        self._hash.update(body.encode("utf-8"))
+        self.trim.feed(body)
+
+    def session(self):
+        if not self._started:
+            raise UploadError("Notes content is required")
+        notes_id = self._hash.hexdigest()[:32]
+        session = load_notes_session(notes_id)
+        if session is None:
+            session = NotesSession(notes_id, self.trim.text(MAX_NOTES_CHARS), self.syllabus,
+                                   chars=self.trim.chars, full_text=self.trim.text(MAP_MAX_CHARS))
+        save_notes_session(session)
+        return session
+
+
+def read_notes_upload():
+    """
+    Reads a multipart/form-data body as it arrives: an optional `syllabus`
+    field, then one .txt/.md `file`. Returns the NotesSession.
+    """
+    boundary = request.mimetype_params.get("boundary")
+    if not boundary:
+        raise UploadError("Missing multipart boundary")
+    decoder = MultipartDecoder(boundary.encode("latin-1"))
+    fields, field, upload, received = {}, None, None, 0  # field: the form field being read
+    while True:
+        data = request.stream.read(UPLOAD_READ_BYTES)
+        received += len(data)
+        if received > UPLOAD_MAX_BYTES:
+            raise UploadError(f"Upload is larger than {UPLOAD_MAX_BYTES // (1024 * 1024)} MB", 413)
+        try:
+            decoder.receive_data(data or None)
+            event = decoder.next_event()
+        except ValueError:  # e.g. the body ends before the closing boundary
+            raise UploadError("Malformed upload")
+        while not isinstance(event, (NeedData, Epilogue)):
+            if isinstance(event, File):
+                if upload is not None:
+                    raise UploadError("Send one notes file per upload")
+                if not event.filename.lower().endswith(UPLOAD_FILE_TYPES):
+                    raise UploadError("Only .txt and .md files can be uploaded", 415)
+                upload, field = NotesUpload(fields.get("syllabus", "").strip()), None
+            elif isinstance(event, Field):
+                field = event.name
+                fields[field] = ""
+            elif isinstance(event, Data):
+                if field is None:
+                    upload.feed(event.data, final=not event.more_data)
+                else:
+                    fields[field] += event.data.decode("utf-8", "replace")
+                    if len(fields[field]) > 4 * UPLOAD_READ_BYTES:
+                        raise UploadError(f"Form field '{field}' is too long", 413)
+            try:
+                event = decoder.next_event()
+            except ValueError:
+                raise UploadError("Malformed upload")
+        if isinstance(event, Epilogue) or not data:
+            break
+    if upload is None:
+        raise UploadError("Notes file is required")
+    return upload.session()
+
+
 # ─── AI CALL ──────────────────────────────────────────────────────────────────
-def call_ai(prompt, max_tokens=800, temperature=0.3):
-    completion = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
+def call_ai(prompt, max_tokens=800, temperature=0.3, cache=True, endpoint="default", model=None):
+    """
+    `cache=False` always goes to Groq — for routes that want a fresh
+    generation on every call. Only responses holding a complete JSON value
+    are cached; truncated ones are repaired per request, not stored.
+    `endpoint` picks the deadline (GROQ_DEADLINES) and, unless `model` is
+    given, the model (router.py). A cache hit is served even while the
+    circuit breaker is open. Identical cacheable calls that are in flight
+    at the same time share one Groq call (singleflight.py).
+    """
+    model = model or models.model(models.tier(endpoint))
+    key = cached = None
+    if cache:
+        with metrics.stage("cache"):
+            key = make_key(model, SYSTEM_PROMPT, prompt, max_tokens, temperature)
+            if llm_cache is not None:
+                cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    with metrics.stage("groq"):
+        if key is None or flights is None:
+            return complete_ai(prompt, max_tokens, temperature, endpoint, key, model)
+        return flights.do(key, lambda: complete_ai(prompt, max_tokens, temperature, endpoint, key, model),
+                          timeout=flight_timeout(endpoint))
+
+
+def complete_ai(prompt, max_tokens, temperature, endpoint, key, model):
+    t0 = time.perf_counter()
+    completion = groq_calls.create(
+        endpoint,
+        model=model,
         messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an expert academic assistant. "
-                    "Always respond with valid JSON only — "
-                    "no markdown, no explanation, no extra text."
-                ),
-            },
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt},
         ],
         max_tokens=max_tokens,
         temperature=temperature,
-        timeout=30.0,
     )
-    return completion.choices[0].message.content
+    metrics.observe("smartnotes_model_seconds", (("model", model),), time.perf_counter() - t0)
+    metrics.record_usage(model, completion.usage)
+    content = completion.choices[0].message.content
 
+    if key is not None and llm_cache is not None and is_complete_json(content):
+        llm_cache.set(key, content)
+    return content
 
-def extract_json(text):
-    text = text.strip()
-    for pattern in [
-        r'```json\s*([\s\S]*?)\s*```',
-        r'```\s*([\s\S]*?)\s*```',
-        r'(\[[\s\S]*\]|\{[\s\S]*\})',
-    ]:
-        match = re.search(pattern, text)
-        if match:
-            return json.loads(match.group(1))
-    return json.loads(text)
 
+def stream_ai(prompt, max_tokens=800, temperature=0.3, cache=True, endpoint="default", model=None):
+    """
+    Like call_ai, but yields the response text as Groq produces it.
+    A cache hit is yielded as a single chunk; a request that joins an
+    identical stream already in flight gets its text from the beginning.
+    """
+    model = model or models.model(models.tier(endpoint))
+    key = cached = None
+    if cache:
+        with metrics.stage("cache"):
+            key = make_key(model, SYSTEM_PROMPT, prompt, max_tokens, temperature)
+            if llm_cache is not None:
+                cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    if key is None or flights is None:
+        yield from stream_completion(prompt, max_tokens, temperature, endpoint, key, model)
+    else:
+        yield from flights.stream(
+            key, lambda: stream_completion(prompt, max_tokens, temperature, endpoint, key, model),
+            timeout=flight_timeout(endpoint))
+
+
+def stream_completion(prompt, max_tokens, temperature, endpoint, key, model):
+    stream = timed_stream(model, groq_calls.create(
+        endpoint,
+        model=model,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        max_tokens=max_tokens,
+        temperature=temperature,
+        stream=True,
+    ))
+    parts = []
+    for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    if key is not None and llm_cache is not None:
+        content = "".join(parts)
+        if is_complete_json(content):
+            llm_cache.set(key, content)
 
-# ─── PROMPT BUILDERS ──────────────────────────────────────────────────────────
-def build_analyze_prompt(notes, syllabus):
-    syllabus_section = (
-        syllabus
-        if syllabus
-        else "Infer key academic topics from the notes themselves and evaluate coverage depth."
+
+def flight_timeout(endpoint):
+    """How long a coalesced request waits on the leading call: its deadline, plus time for the error to arrive."""
+    return groq_calls.deadline(endpoint) + 5.0
+
+
+def timed_stream(model, stream):
+    """
+    Passes a Groq stream through, timing the wait for each chunk as the
+    `groq` stage (time spent by the consumer is not counted) and recording
+    the usage Groq sends with the last chunk.
+    """
+    if not metrics.enabled:
+        return stream
+    return _timed_chunks(model, iter(stream))
+
+
+def _timed_chunks(model, chunks):
+    waited = 0.0
+    try:
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            waited += time.perf_counter() - t0
+            if chunk is None:
+                return
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None:
+                metrics.record_usage(model, getattr(x_groq, "usage", None))
+            yield chunk
+    finally:
+        metrics.observe_stage("groq", waited)
+        metrics.observe("smartnotes_model_seconds", (("model", model),), waited)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events):
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+def wants_stream(data):
+    return bool(data.get("stream")) or "text/event-stream" in request.headers.get("Accept", "")
+
+
+def ai_error(message, error):
+    """
+    The error response for a failed AI call: 503 with Retry-After while the
+    circuit breaker is open, 504 when the endpoint's deadline (or the wait
+    for an identical call in flight) ran out, else 500.
+    """
+    if isinstance(error, CircuitOpen):
+        return (jsonify({"error": "The AI service is temporarily unavailable. Please try again shortly."}),
+                503, {"Retry-After": str(int(error.retry_after + 0.5))})
+    if isinstance(error, TimeoutError):
+        return jsonify({"error": "The AI service took too long to respond. Please try again."}), 504
+    return jsonify({"error": message}), 500
+
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    """A request turned away by admission control: 429 or 503 with Retry-After."""
+    return jsonify({"error": str(e)}), e.status, e.headers()
+
+
+# ─── PROMPT BUILDERS ──────────────────────────────────────────────────────────
+def build_analyze_prompt(notes, syllabus, missing=()):
+    """`missing`: syllabus topics already found to be absent from the notes, left out of `syllabus`."""
+    if syllabus:
+        syllabus_section = syllabus
+    elif missing:
+        syllabus_section = "(none left to check)"
+    else:
+        syllabus_section = "Infer key academic topics from the notes themselves and evaluate coverage depth."
+    if missing:
+        syllabus_section += (
+            "\n\nALREADY CHECKED: these syllabus topics are not mentioned anywhere in the notes. "
+            "They are reported separately, so do not list them in topics_covered, but count them "
+            "against completeness and overall_score:\n" + "\n".join(f"- {topic}" for topic in missing)
+        )
     return f"""You are a careful, evidence-based academic evaluator. Your job is to analyze student notes STRICTLY based on what is actually written in them.
 
 CRITICAL RULES:
@@ -280,15 +1081,69 @@ Rules:
 - Return exactly 8 items"""
 
 
-def build_evaluate_prompt(score, total, percentage, weak_unique, correct_topics):
-    return f"""A student scored {score}/{total} ({percentage}%) on a quiz.
-Weak topics: {', '.join(weak_unique) if weak_unique else 'None'}
-Strong topics: {', '.join(set(correct_topics)) if correct_topics else 'None'}
+def _avoid_section(avoid):
+    if not avoid:
+        return ""
+    listed = "\n".join(f"- {text}" for text in avoid[-60:])
+    return f"\nThese already exist; do not repeat or rephrase them:\n{listed}\n"
+
+
+def build_quiz_bank_prompt(notes, difficulty, count, avoid=()):
+    return f"""Create exactly {count} {difficulty} multiple-choice quiz questions from these student notes.
+The questions should test understanding of key concepts, not just recall. Each question must have 4 options (A, B, C, D) with only one correct answer.
+Cover as many different topics from the notes as you can, and make every question distinct.
+
+NOTES:
+{notes}
+{_avoid_section(avoid)}
+Return ONLY a valid JSON array, no markdown, no extra text:
+[
+  {{
+    "id": 1,
+    "question": "Question text?",
+    "options": ["A) Option one", "B) Option two", "C) Option three", "D) Option four"],
+    "correct_answer": "A",
+    "explanation": "Why A is correct",
+    "topic": "Topic name",
+    "difficulty": "{difficulty}"
+  }}
+]
+
+Rules:
+- correct_answer must be exactly one of: A, B, C, or D
+- every question is {difficulty}
+- Return exactly {count} items"""
+
+
+def build_flashcard_bank_prompt(notes, difficulty, count, avoid=()):
+    return f"""Generate exactly {count} {difficulty} academic flashcards from these student notes.
+Cover as many different topics from the notes as you can, and make every card distinct.
+
+NOTES:
+{notes}
+{_avoid_section(avoid)}
+Return ONLY a valid JSON array, no markdown, no extra text:
+[
+  {{"id": 1, "front": "Clear question", "back": "Detailed answer", "topic": "Topic name", "difficulty": "{difficulty}"}}
+]
+
+Rules:
+- every card is {difficulty}
+- Test understanding, not just memorization
+- Return exactly {count} items"""
+
+
+def build_evaluate_prompt(band, weak_topics):
+    # Only the score band and weak topics, so the feedback can be reused for
+    # every student with the same outcome (see quiz_feedback).
+    low, high = band * 10, (100 if band == 9 else band * 10 + 9)
+    return f"""A student scored between {low}% and {high}% on a quiz.
+Weak topics: {', '.join(weak_topics) if weak_topics else 'None'}
 
 Return ONLY valid JSON, no markdown:
 {{
   "performance_level": "good",
-  "message": "Personalized encouraging message based on their score",
+  "message": "Personalized encouraging message based on their score band",
   "recommendations": ["Specific recommendation 1", "Specific recommendation 2", "Tip 3"],
   "study_plan": "Concrete 2-3 sentence study plan targeting weak areas",
   "next_steps": ["Step 1", "Step 2"]
@@ -297,6 +1152,36 @@ Return ONLY valid JSON, no markdown:
 performance_level must be one of: excellent (90-100%), good (70-89%), needs_improvement (50-69%), critical (below 50%)"""
 
 
+def build_chunk_digest_prompt(chunk):
+    # No part numbers: the prompt depends on the chunk alone, so an unchanged
+    # chunk hits the response cache however the rest of the notes changed.
+    return f"""Condense this part of a student's notes so it can later be summarized, analysed and turned into flashcards together with the other parts, without the original text.
+
+NOTES:
+{chunk}
+
+Return ONLY this JSON:
+{{
+  "summary": "2-4 sentences covering everything this part explains",
+  "key_points": ["Up to 6 key facts, formulas or ideas, one sentence each"],
+  "definitions": [{{"term": "Term", "definition": "Definition as given in the notes"}}],
+  "topics": ["Topics covered in this part"]
+}}"""
+
+
+def build_chat_summary_prompt(previous_summary, messages):
+    transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    return f"""Update the running summary of a tutoring conversation between a student and Nova, an AI study tutor.
+
+PREVIOUS SUMMARY:
+{previous_summary or "(none yet)"}
+
+NEW MESSAGES:
+{transcript}
+
+Write the updated summary in under 200 words of plain text. Keep the topics discussed, what the student struggled with or asked to remember, and any facts, definitions or examples Nova gave that later turns may refer to. No preamble."""
+
+
 def build_summary_prompt(style, notes_excerpt, word_count):
     if style == "brief":
         return f"""Summarize these student notes in a concise TL;DR (4-6 sentences).
@@ -412,10 +1297,721 @@ Return ONLY valid JSON (no markdown):
 Generate 4-6 branches in the mindmap."""
 
 
+# ─── RESPONSE SCHEMAS ─────────────────────────────────────────────────────────
+# What each feature's JSON must contain. Items that do not fit are dropped,
+# missing optional fields get the defaults the frontend expects.
+DIFFICULTY = one_of("easy", "medium", "hard")
+STRINGS = list_of(str)
+
+ANALYZE_SCHEMA = {
+    "overall_score": float,
+    "completeness": float,
+    "clarity": float,
+    "structure": float,
+    "topics_covered": optional(list_of({
+        "topic": str,
+        "status": one_of("complete", "partial", "missing"),
+        "explanation": optional(str, ""),
+    }), list),
+    "strengths": optional(STRINGS, list),
+    "weaknesses": optional(STRINGS, list),
+    "improvement_suggestions": optional(STRINGS, list),
+    "summary": optional(str, ""),
+}
+
+FLASHCARDS_SCHEMA = list_of({
+    "id": int,
+    "front": str,
+    "back": str,
+    "topic": optional(str, "General"),
+    "difficulty": optional(DIFFICULTY, "medium"),
+}, min_items=1)
+
+QUIZ_SCHEMA = list_of({
+    "id": int,
+    "question": str,
+    "options": any_of(list_of(str, min_items=2), dict),
+    "correct_answer": str,
+    "explanation": optional(str, ""),
+    "topic": optional(str, "General"),
+    "difficulty": optional(DIFFICULTY, "medium"),
+}, min_items=1)
+
+EVALUATE_SCHEMA = {
+    "performance_level": one_of("excellent", "good", "needs_improvement", "critical"),
+    "message": str,
+    "recommendations": optional(STRINGS, list),
+    "study_plan": optional(str, ""),
+    "next_steps": optional(STRINGS, list),
+}
+
+SUMMARY_SCHEMA = {
+    "title": optional(str, "Summary"),
+    "subject_area": optional(str, ""),
+    "word_count_estimate": optional(int),
+    "brief_summary": str,
+    "detailed_summary": optional(str),
+    "bullet_summary": optional(STRINGS),
+    "key_definitions": optional(list_of({"term": str, "definition": str})),
+    "mindmap": optional({
+        "root": str,
+        "branches": list_of({"topic": str, "subtopics": optional(STRINGS, list)}),
+    }),
+    "connections": optional(STRINGS),
+    "important_dates_or_numbers": optional(list_of({
+        "value": any_of(str, float),
+        "context": optional(str, ""),
+    })),
+    "gaps": optional(STRINGS),
+    "revision_tips": optional(STRINGS),
+}
+
+
+CHUNK_DIGEST_SCHEMA = {
+    "summary": str,
+    "key_points": optional(STRINGS, list),
+    "definitions": optional(list_of({"term": str, "definition": str}), list),
+    "topics": optional(STRINGS, list),
+}
+
+
+def checked_json(extractor, schema):
+    """The extractor's value, validated. Responses cut off at max_tokens are repaired and counted."""
+    result = validate(extractor.value(), schema)
+    if extractor.truncated:
+        app.logger.warning("AI response was truncated; kept the complete part")
+        metrics.inc("smartnotes_json_repaired_total")
+    return result
+
+
+# ─── GENERATION ───────────────────────────────────────────────────────────────
+# One function per AI feature, shared by the single-feature routes and
+# /api/study-pack. `notes` is the request's already-trimmed notes.
+def routed_tier(endpoint, style=None):
+    tier = models.tier(endpoint, style)
+    metrics.inc("smartnotes_model_routes_total", (("endpoint", endpoint), ("tier", tier)))
+    return tier
+
+
+def escalated_tier(endpoint, tier):
+    """The tier to ask again after `tier` gave an unusable answer, or None."""
+    higher = models.next_tier(tier)
+    if higher is not None:
+        metrics.inc("smartnotes_model_escalations_total", (("endpoint", endpoint), ("from", tier)))
+    return higher
+
+
+def ask_json(prompt, schema, style=None, endpoint="default", **kwargs):
+    """Asks the tier routed for `endpoint` (and summary `style`)."""
+    return ask_tier(prompt, schema, routed_tier(endpoint, style), endpoint, **kwargs)
+
+
+def ask_tier(prompt, schema, tier, endpoint, **kwargs):
+    """An answer that does not parse or fit `schema` is asked again of the next tier up, while there is one."""
+    while True:
+        content = call_ai(prompt, endpoint=endpoint, model=models.model(tier), **kwargs)
+        try:
+            with metrics.stage("parse"):
+                return checked_json(parse_json(content), schema)
+        except ValueError:
+            tier = escalated_tier(endpoint, tier)
+            if tier is None:
+                raise
+
+
+def run_analyze(notes, syllabus, whole=None, coverage=None):
+    """
+    `whole`: the untrimmed notes, searched for the syllabus topics (default: `notes`).
+    `coverage`: their syllabus_coverage(), if it was worked out beforehand.
+    """
+    with metrics.stage("prompt"):
+        syllabus = smart_trim(syllabus, MAX_SYLLABUS_CHARS)
+        if coverage is None:
+            coverage = syllabus_coverage(whole or notes, syllabus)
+        missing = [c["topic"] for c in coverage if c["status"] == "missing"]
+        if coverage:
+            metrics.inc("smartnotes_topics_settled_total", value=len(missing))
+            syllabus = "\n".join(c["topic"] for c in coverage if c["status"] is None)
+        prompt = build_analyze_prompt(notes, syllabus, missing)
+    return with_coverage(ask_json(prompt, ANALYZE_SCHEMA, max_tokens=2000, endpoint="analyze"), coverage)
+
+
+def run_flashcards(notes):
+    with metrics.stage("prompt"):
+        notes = smart_trim(notes, MAX_FC_CHARS)
+    if FLASHCARD_BANK_SIZE:
+        return sample_bank("flashcards", notes)
+    with metrics.stage("prompt"):
+        prompt = build_flashcard_prompt(notes)
+    return ask_json(prompt, FLASHCARDS_SCHEMA, max_tokens=2500, endpoint="flashcards")
+
+
+def run_quiz(notes):
+    if QUIZ_BANK_SIZE:
+        return sample_bank("quiz", notes)
+    with metrics.stage("prompt"):
+        prompt = build_quiz_prompt(notes)
+    return ask_json(prompt, QUIZ_SCHEMA, max_tokens=2500, cache=False, endpoint="quiz")
+
+
+def summary_prompt(notes, style, word_count=None):
+    with metrics.stage("prompt"):
+        notes_excerpt = smart_trim(notes, MAX_SUMMARY_CHARS)
+        word_count = word_count or len(notes.split())
+        return build_summary_prompt(style, notes_excerpt, word_count)
+
+
+def run_summary(notes, style, word_count=None):
+    try:
+        return ask_json(summary_prompt(notes, style, word_count), SUMMARY_SCHEMA, style=style,
+                        max_tokens=3000, temperature=0.2, endpoint="summary")
+    except CircuitOpen:
+        return offline_summary(notes, style)
+
+
+def feedback_band(percentage):
+    """The 10-point band of a quiz score: 0 for 0-9%, ..., 9 for 90-100%."""
+    return min(9, percentage // 10)
+
+
+def _feedback_signature(payload):
+    digest = hmac.new(FEEDBACK_SECRET, payload.encode("utf-8"), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode("ascii").rstrip("=")
+
+
+def feedback_id(band, weak_topics):
+    """
+    Names the feedback for a band and sorted weak topics, signed with
+    FEEDBACK_SECRET; any worker can check and decode it.
+    """
+    raw = json.dumps([band, weak_topics], separators=(",", ":"), ensure_ascii=False)
+    payload = base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+    return f"{payload}.{_feedback_signature(payload)}"
+
+
+def parse_feedback_id(value):
+    """(band, weak_topics) from a feedback_id this server issued, or None."""
+    payload, _, signature = value.partition(".")
+    if not hmac.compare_digest(signature.encode("utf-8"),
+                               _feedback_signature(payload).encode("ascii")):
+        return None
+    try:
+        band, weak_topics = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if (not isinstance(band, int) or not 0 <= band <= 9 or not isinstance(weak_topics, list)
+            or not all(isinstance(t, str) for t in weak_topics)):
+        return None
+    return band, weak_topics
+
+
+def run_feedback(band, weak_topics):
+    """AI feedback for a quiz outcome, shared by every result with the same band and weak topics."""
+    key = feedback_id(band, weak_topics)
+    feedback = quiz_feedback.get(key)
+    if feedback is None:
+        with metrics.stage("prompt"):
+            prompt = build_evaluate_prompt(band, weak_topics)
+        feedback = ask_json(prompt, EVALUATE_SCHEMA, max_tokens=800, endpoint="evaluate")
+        quiz_feedback.set(key, feedback)
+    return feedback
+
+
+_feedback_running = set()
+_feedback_lock = threading.Lock()
+
+
+def start_feedback(band, weak_topics):
+    """Generates the feedback in the background unless it is cached or on its way. True if cached."""
+    key = feedback_id(band, weak_topics)
+    if quiz_feedback.get(key) is not None:
+        return True
+    with _feedback_lock:
+        if key in _feedback_running:
+            return False
+        _feedback_running.add(key)
+    background.submit(metrics.bind(_generate_feedback), key, band, weak_topics)
+    return False
+
+
+def _generate_feedback(key, band, weak_topics):
+    try:
+        run_feedback(band, weak_topics)
+    except Exception as e:
+        app.logger.warning("quiz feedback failed: %s", e)
+    finally:
+        with _feedback_lock:
+            _feedback_running.discard(key)
+
+
+def local_feedback(percentage, weak_topics):
+    level = (
+        "excellent" if percentage >= 90
+        else "good" if percentage >= 70
+        else "needs_improvement" if percentage >= 50
+        else "critical"
+    )
+    return {
+        "performance_level": level,
+        "message": f"You scored {percentage}%. {'Great work!' if percentage >= 70 else 'Keep studying!'}",
+        "recommendations": [f"Review {t}" for t in weak_topics[:3]],
+        "study_plan": "Focus on weak topics and retake the quiz.",
+        "next_steps": ["Re-read notes on weak topics", "Retake the quiz"],
+    }
+
+
+def offline_summary(notes, style):
+    """
+    An extractive summary of the notes' highest-scoring sentences, served
+    while Groq is unavailable. `degraded: true` tells the client it is not
+    an AI summary.
+    """
+    doc = scored_document(notes)
+    result = {
+        "style": style,
+        "title": "Key sentences (AI summary unavailable)",
+        "brief_summary": " ".join(doc.trim(600).split("\n")),
+        "degraded": True,
+    }
+    if style in ("detailed", "all"):
+        result["detailed_summary"] = doc.trim(2500)
+    if style in ("bullet", "all"):
+        result["bullet_summary"] = doc.trim(1500).split("\n")
+    return result
+
+
+# ─── LARGE NOTES (map-reduce) ─────────────────────────────────────────────────
+# With `"full": true`, notes over MAX_NOTES_CHARS are not sampled down by
+# smart_trim. Each chunk is condensed by its own call (map), and the digests
+# stand in for the notes in the usual analyze/flashcards/summary prompt
+# (reduce), so the result has the same shape as for short notes.
+def chunk_notes(text, target=MAP_CHUNK_CHARS):
+    """
+    Sentence-aligned chunks of about `target` chars, never over MAX_NOTES_CHARS.
+    Once a chunk holds half the target, it ends after any sentence whose hash
+    picks it. So a boundary depends only on the sentence before it, and an
+    edit changes the chunks around it but leaves the rest — and their cached
+    digests — alone.
+    """
+    every = max(1, target // 240)
+    chunks, current, size = [], [], 0
+    for sentence in _SENTENCE_BREAK.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        pieces = [sentence[i:i + MAX_NOTES_CHARS] for i in range(0, len(sentence), MAX_NOTES_CHARS)]
+        for piece in pieces:
+            if current and size + len(piece) + 1 > MAX_NOTES_CHARS:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 1
+            if size >= target // 2 and zlib.crc32(piece.encode("utf-8")) % every == 0:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def digest_chunk(chunk):
+    """One chunk condensed by the model, or its top sentences if the call fails."""
+    try:
+        return ask_json(build_chunk_digest_prompt(chunk), CHUNK_DIGEST_SCHEMA, max_tokens=700,
+                        temperature=0.2, endpoint="chunk_digest")
+    except Exception as e:
+        app.logger.warning("chunk digest error: %s", e)
+        metrics.inc("smartnotes_chunk_digest_fallbacks_total")
+        return {"summary": ScoredDocument(chunk).trim(800), "key_points": [], "definitions": [], "topics": []}
+
+
+def format_digest(digest):
+    lines = [digest["summary"], *digest["key_points"]]
+    lines += [f"{d['term']}: {d['definition']}" for d in digest["definitions"]]
+    if digest["topics"]:
+        lines.append("Topics: " + ", ".join(digest["topics"]))
+    return "\n".join(lines)
+
+
+def condense_notes(text):
+    """
+    Notes over MAX_NOTES_CHARS condensed to fit it: chunks are digested in
+    parallel on map_pool and the digests joined; if they are still too
+    long, the digests are chunked and condensed again.
+    """
+    text = smart_trim(text, MAP_MAX_CHARS)
+    for _ in range(3):
+        if len(text) <= MAX_NOTES_CHARS:
+            break
+        chunks = chunk_notes(text)
+        metrics.inc("smartnotes_map_chunks_total", value=len(chunks))
+        digests = map_pool.map(metrics.bind(digest_chunk), chunks)
+        text = "\n\n".join(format_digest(d) for d in digests)
+    return smart_trim(text, MAX_NOTES_CHARS)
+
+
+def large_notes(data):
+    """The whole notes if the request asks for `"full": true` and they are over MAX_NOTES_CHARS, else None."""
+    if not data.get("full"):
+        return None
+    if data.get("notes_id"):
+        session = load_notes_session(str(data["notes_id"]))
+        text = session.full_text if session is not None else ""
+    else:
+        text = data.get("notes", "").strip()
+    return text if len(text) > MAX_NOTES_CHARS else None
+
+
+# ─── SYLLABUS COVERAGE ────────────────────────────────────────────────────────
+# Before /api/analyze asks the model, each syllabus line is looked up in the
+# notes' passage index (the one chat uses). A topic none of whose words
+# appear anywhere in the notes is settled as missing locally, and only the
+# other topics go to the model. Every topic is reported with evidence: the
+# sentences of the notes that match it best.
+def syllabus_topics(syllabus):
+    """The syllabus's lines without bullets or numbering, each once."""
+    topics = []
+    for line in syllabus.splitlines():
+        topic = _SYLLABUS_BULLET.sub('', line).strip()
+        if topic and topic not in topics:
+            topics.append(topic)
+    return topics
+
+
+def topic_terms(topic):
+    return [term for term in terms(topic, _STOP_WORDS) if len(term) >= 3]
+
+
+def topic_coverage(index, topic):
+    """{"topic", "status": "missing" or None (for the model to judge), "evidence": [sentences]}."""
+    wanted = topic_terms(topic)
+    found = index.containing(wanted) if wanted else {}
+    if wanted and not found:
+        return {"topic": topic, "status": "missing", "evidence": []}
+    # Sentences score a point per topic word and two per pair of topic words in a row.
+    pairs = set(zip(wanted, wanted[1:]))
+    scored = []
+    for i, _ in heapq.nlargest(4, found.items(), key=lambda item: item[1]):
+        for sentence in index.passages[i].split("\n"):
+            words = terms(sentence, _STOP_WORDS)
+            score = len(set(words).intersection(wanted)) + 2 * len(pairs.intersection(zip(words, words[1:])))
+            if score:
+                scored.append((score, -i, sentence))
+    evidence = []
+    for _, _, sentence in sorted(scored, reverse=True):
+        if sentence[:200] not in evidence:  # notes often repeat a sentence
+            evidence.append(sentence[:200])
+            if len(evidence) == 2:
+                break
+    return {"topic": topic, "status": None, "evidence": evidence}
+
+
+def syllabus_coverage(text, syllabus, cache=True):
+    """
+    topic_coverage() for each syllabus line in `text`; [] without a syllabus.
+    `cache=False` leaves the passage index out of the cache chat shares.
+    """
+    topics = syllabus_topics(syllabus)
+    if not topics or not text:
+        return []
+    index = notes_index(text, cache)
+    return [topic_coverage(index, topic) for topic in topics]
+
+
+def with_coverage(result, coverage):
+    """
+    The model's analysis with the locally settled topics added and evidence
+    attached to every topic, in syllabus order where the names match. Where
+    the two disagree, the notes win: a topic missing locally is missing, and
+    one the model calls missing but that has evidence is partial.
+    """
+    if not coverage:
+        return result
+    named = [set(topic_terms(c["topic"])) for c in coverage]
+
+    def closest(name):
+        words = set(topic_terms(name))
+        overlaps = [len(words & other) / (len(words | other) or 1) for other in named]
+        best = max(range(len(coverage)), key=overlaps.__getitem__)
+        return best if overlaps[best] > 0 else None
+
+    topics = []
+    for topic in result["topics_covered"]:
+        match = closest(topic["topic"])
+        if match is not None and coverage[match]["status"] == "missing":
+            continue  # the model listed a topic settled locally anyway
+        topic["evidence"] = coverage[match]["evidence"] if match is not None else []
+        if topic.get("status") == "missing" and topic["evidence"]:
+            topic["status"] = "partial"  # the notes do mention it: the evidence says so
+            topic["explanation"] = ("Mentioned in the notes, but the analysis found it missing: "
+                                    + str(topic.get("explanation", "")))
+        topics.append((len(coverage) if match is None else match, topic))
+    topics += [(i, {"topic": c["topic"], "status": "missing",
+                    "explanation": "Not mentioned anywhere in the notes.", "evidence": []})
+               for i, c in enumerate(coverage) if c["status"] == "missing"]
+    topics.sort(key=lambda item: item[0])
+    result["topics_covered"] = [topic for _, topic in topics]
+    return result
+
+
+# ─── QUESTION BANK ────────────────────────────────────────────────────────────
+# Quiz questions and flashcards are generated in bulk per set of notes, one
+# call per difficulty in parallel, and each request samples a fresh mix from
+# the bank locally. When a difficulty runs short of items no one has been
+# served yet, more are generated in the background.
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+class QuestionBank:
+    """
+    Generated items for one set of notes, tagged by difficulty and
+    de-duplicated by their question text (`field`). Tracks how often each
+    item was served so samples rotate through the whole bank.
+    """
+
+    def __init__(self, kind, notes, field):
+        self.kind = kind
+        self.notes = notes
+        self.field = field
+        self.items = []
+        self.served = []
+        self.refilling = False
+        self._words = []
+        self._lock = threading.Lock()
+
+    def add(self, items, difficulty):
+        """Adds the items that are not near-duplicates; returns how many were added."""
+        added = 0
+        with self._lock:
+            for item in items:
+                words = set(_WORDS.findall(str(item.get(self.field, "")).lower()))
+                if not words or any(len(words & seen) >= 0.8 * len(words | seen) for seen in self._words):
+                    continue
+                self.items.append({**item, "difficulty": difficulty})
+                self.served.append(0)
+                self._words.append(words)
+                added += 1
+        return added
+
+    def unseen(self, difficulty):
+        with self._lock:
+            return sum(1 for item, n in zip(self.items, self.served)
+                       if n == 0 and item["difficulty"] == difficulty)
+
+    def sample(self, mix):
+        """
+        Up to sum(mix) items, `mix[difficulty]` of each, least served first
+        (ties at random). A difficulty that runs short is made up from the others.
+        """
+        with self._lock:
+            order = sorted(range(len(self.items)), key=lambda i: (self.served[i], random.random()))
+            picked = []
+            for difficulty, count in mix.items():
+                picked += [i for i in order if self.items[i]["difficulty"] == difficulty][:count]
+            chosen = set(picked)
+            picked += [i for i in order if i not in chosen][:sum(mix.values()) - len(picked)]
+            for i in picked:
+                self.served[i] += 1
+            items = [self.items[i] for i in picked]
+        random.shuffle(items)
+        return [{**item, "id": n} for n, item in enumerate(items, 1)]
+
+    def questions(self):
+        with self._lock:
+            return [item[self.field] for item in self.items]
+
+    def start_refill(self, max_items):
+        """True if the caller is to refill the bank: it holds fewer than `max_items` and no refill is running."""
+        with self._lock:
+            if self.refilling or len(self.items) >= max_items:
+                return False
+            self.refilling = True
+            return True
+
+    def end_refill(self):
+        with self._lock:
+            self.refilling = False
+
+    def size(self):
+        return len(self.notes) + sum(len(json.dumps(item)) for item in self.items)
+
+
+# kind -> (target size, mix, question field, prompt builder, schema, tokens per item).
+# A bank holds at least one request's mix.
+BANKS = {
+    "quiz":       (max(QUIZ_BANK_SIZE, sum(QUIZ_MIX.values())), QUIZ_MIX, "question",
+                   build_quiz_bank_prompt, QUIZ_SCHEMA, 150),
+    "flashcards": (max(FLASHCARD_BANK_SIZE, sum(FLASHCARD_MIX.values())), FLASHCARD_MIX, "front",
+                   build_flashcard_bank_prompt, FLASHCARDS_SCHEMA, 90),
+}
+
+question_banks = MemoryCache(ttl=NOTES_SESSION_TTL, max_entries=NOTES_SESSION_MAX_ENTRIES,
+                             max_bytes=32 * 1024 * 1024, sizeof=QuestionBank.size)
+
+
+def generate_bank_items(bank, counts):
+    """One call per difficulty in `counts`, run in parallel. Returns the number of items added."""
+    _, _, _, build_prompt, schema, tokens_per_item = BANKS[bank.kind]
+    avoid = bank.questions()
+
+    def generate(difficulty, count):
+        with metrics.stage("prompt"):
+            prompt = build_prompt(bank.notes, difficulty, count, avoid)
+        return ask_json(prompt, schema, max_tokens=min(8000, 200 + count * tokens_per_item),
+                        temperature=0.7, endpoint=bank.kind)
+
+    added, errors = 0, []
+    with ThreadPoolExecutor(max_workers=len(counts)) as pool:
+        futures = {pool.submit(metrics.bind(generate), difficulty, count): difficulty
+                   for difficulty, count in counts.items() if count > 0}
+        for future in as_completed(futures):
+            try:
+                added += bank.add(future.result(), futures[future])
+            except Exception as e:
+                errors.append(e)
+    if errors and not added:
+        raise errors[0]
+    return added
+
+
+def bank_counts(size, mix):
+    """`size` items split between the difficulties in proportion to `mix`."""
+    total = sum(mix.values())
+    return {difficulty: max(1, round(size * count / total)) for difficulty, count in mix.items()}
+
+
+_bank_fills = {}  # bank key -> Future of the bank being generated
+_bank_fills_lock = threading.Lock()
+
+
+def fill_bank(kind, key, notes):
+    """
+    Generates the bank for `key`. Requests that arrive while it is being
+    generated wait for it instead of generating their own.
+    """
+    with _bank_fills_lock:
+        fill = _bank_fills.get(key)
+        leader = fill is None
+        if leader:
+            fill = _bank_fills[key] = Future()
+    if not leader:
+        metrics.inc("smartnotes_question_bank_total", (("kind", kind), ("outcome", "joined")))
+        return fill.result(timeout=flight_timeout(kind))
+    try:
+        bank = question_banks.get(key)  # filled just before this request became the leader
+        if bank is None:
+            size, mix, field, _, _, _ = BANKS[kind]
+            bank = QuestionBank(kind, notes, field)
+            generate_bank_items(bank, bank_counts(size, mix))
+            if len(bank.items) < sum(mix.values()):
+                raise ValueError(f"{kind} bank has only {len(bank.items)} items")
+            question_banks.set(key, bank)
+            metrics.inc("smartnotes_question_bank_total", (("kind", kind), ("outcome", "fill")))
+    except Exception as e:
+        fill.set_exception(e)
+        raise
+    else:
+        fill.set_result(bank)
+    finally:
+        with _bank_fills_lock:
+            del _bank_fills[key]
+    return bank
+
+
+def sample_bank(kind, notes):
+    """A fresh mix of quiz questions or flashcards for `notes`, from its bank."""
+    size, mix, _, _, _, _ = BANKS[kind]
+    key = f"{kind}:{_doc_key(notes, '')[:32]}"
+    bank = question_banks.get(key)
+    if bank is None:
+        bank = fill_bank(kind, key, notes)
+    else:
+        metrics.inc("smartnotes_question_bank_total", (("kind", kind), ("outcome", "hit")))
+
+    items = bank.sample(mix)
+    low = {difficulty: count for difficulty, count in bank_counts(size // 2, mix).items()
+           if bank.unseen(difficulty) < 2 * mix[difficulty]}
+    if low and bank.start_refill(3 * size):
+        background.submit(metrics.bind(refill_bank), key, bank, low)
+    return items
+
+
+def refill_bank(key, bank, counts):
+    try:
+        if generate_bank_items(bank, counts):
+            question_banks.set(key, bank)  # re-measured for the cache's size limit
+        metrics.inc("smartnotes_question_bank_total", (("kind", bank.kind), ("outcome", "refill")))
+    except Exception as e:
+        app.logger.warning("%s bank refill failed: %s", bank.kind, e)
+    finally:
+        bank.end_refill()
+
+
 # ─── ROUTES ───────────────────────────────────────────────────────────────────
+# The page shell is rendered and compressed once per process, and its CSS and
+# JS are served under content-hashed names (see assets.py).
+assets = Assets(os.path.join(app.root_path, "static"))
+with app.app_context():
+    shell = Precompressed(render_template("index.html", asset_url=assets.url).encode("utf-8"),
+                          "text/html", REVALIDATE)
+
+
 @app.route("/")
 def index():
-    return render_template("index.html")
+    return shell.response(request)
+
+
+@app.route("/assets/<name>")
+def asset(name):
+    found = assets.get(name)
+    if found is None:
+        abort(404)
+    return found.response(request)
+
+
+@app.errorhandler(NotesSessionNotFound)
+def notes_session_not_found(e):
+    return jsonify({"error": "Unknown or expired notes_id. Please upload the notes again."}), 404
+
+
+@app.errorhandler(UploadError)
+def upload_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+
+@app.route("/api/notes", methods=["POST"])
+def upload_notes():
+    """
+    Stores notes server-side so later requests can send `notes_id` instead of the text.
+    Expects: { "notes": "...", "syllabus": "..." }, or multipart/form-data with
+             an optional `syllabus` field followed by a .txt/.md `file`
+    Returns: { "notes_id": "...", "chars": ..., "trimmed_chars": ..., "expires_in": ... }
+    """
+    if request.mimetype == "multipart/form-data":
+        with metrics.stage("notes"):
+            session = read_notes_upload()
+        return jsonify(session.info())
+
+    data = request.get_json(silent=True) or {}
+    notes = data.get("notes", "").strip()
+    syllabus = data.get("syllabus", "").strip()
+    if not notes:
+        return jsonify({"error": "Notes content is required"}), 400
+
+    # Trimmed the same way as a file upload, so the same notes make the same session.
+    with metrics.stage("notes"):
+        upload = NotesUpload(syllabus)
+        upload.feed(notes.encode("utf-8"), final=True)
+        session = upload.session()
+    return jsonify(session.info())
+
+
+@app.route("/api/notes/<notes_id>")
+def get_notes_session(notes_id):
+    session = load_notes_session(notes_id)
+    if session is None:
+        raise NotesSessionNotFound()
+    return jsonify(session.info())
 
 
 @app.route("/api/analyze", methods=["POST"])
@@ -424,34 +2020,32 @@ def analyze_notes():
     if not notes:
         return jsonify({"error": "Notes content is required"}), 400
 
-    syllabus = smart_trim(data.get("syllabus", "").strip(), MAX_SYLLABUS_CHARS)
-    prompt = build_analyze_prompt(notes, syllabus)
-
+    full = large_notes(data)
     try:
-        response = call_ai(prompt, max_tokens=2000)
-        result = extract_json(response)
+        if full is not None:
+            notes = condense_notes(full)
+        result = run_analyze(notes, data.get("syllabus", "").strip(), whole_notes(data))
         return jsonify(result)
     except Exception as e:
         app.logger.error("analyze error: %s", e)
-        return jsonify({"error": "Analysis failed. Please try again."}), 500
+        return ai_error("Analysis failed. Please try again.", e)
 
 
 @app.route("/api/flashcards", methods=["POST"])
 def generate_flashcards():
-    _, notes = get_notes_from_request()
+    data, notes = get_notes_from_request()
     if not notes:
         return jsonify({"error": "Notes content is required"}), 400
 
-    notes = smart_trim(notes, MAX_FC_CHARS)
-    prompt = build_flashcard_prompt(notes)
-
+    full = large_notes(data)
     try:
-        response = call_ai(prompt, max_tokens=2500)
-        result = extract_json(response)
+        if full is not None:
+            notes = condense_notes(full)
+        result = run_flashcards(notes)
         return jsonify(result)
     except Exception as e:
         app.logger.error("flashcard error: %s", e)
-        return jsonify({"error": "Flashcard generation failed. Please try again."}), 500
+        return ai_error("Flashcard generation failed. Please try again.", e)
 
 
 @app.route("/api/quiz", methods=["POST"])
@@ -460,15 +2054,12 @@ def generate_quiz():
     if not notes:
         return jsonify({"error": "Notes content is required"}), 400
 
-    prompt = build_quiz_prompt(notes)
-
     try:
-        response = call_ai(prompt, max_tokens=2500)
-        result = extract_json(response)
+        result = run_quiz(notes)
         return jsonify(result)
     except Exception as e:
         app.logger.error("quiz error: %s", e)
-        return jsonify({"error": "Quiz generation failed. Please try again."}), 500
+        return ai_error("Quiz generation failed. Please try again.", e)
 
 
 @app.route("/api/evaluate-quiz", methods=["POST"])
@@ -510,37 +2101,60 @@ def evaluate_quiz():
 
     total = len(questions)
     percentage = round((score / total) * 100) if total > 0 else 0
-    weak_unique = list(set(weak_topics))
-
-    prompt = build_evaluate_prompt(score, total, percentage, weak_unique, correct_topics)
-
-    try:
-        ai_response = call_ai(prompt, max_tokens=800)
-        ai_feedback = extract_json(ai_response)
-    except Exception:
-        level = (
-            "excellent" if percentage >= 90
-            else "good" if percentage >= 70
-            else "needs_improvement" if percentage >= 50
-            else "critical"
-        )
-        ai_feedback = {
-            "performance_level": level,
-            "message": f"You scored {percentage}%. {'Great work!' if percentage >= 70 else 'Keep studying!'}",
-            "recommendations": [f"Review {t}" for t in weak_unique[:3]],
-            "study_plan": "Focus on weak topics and retake the quiz.",
-            "next_steps": ["Re-read notes on weak topics", "Retake the quiz"],
-        }
-
-    return jsonify({
+    weak_unique = sorted(set(weak_topics))
+    band = feedback_band(percentage)
+    graded = {
         "score": score,
         "total": total,
         "percentage": percentage,
         "results": results,
         "weak_topics": weak_unique,
         "strong_topics": list(set(correct_topics)),
-        "ai_feedback": ai_feedback,
-    })
+        "ai_feedback": local_feedback(percentage, weak_unique),
+    }
+
+    if wants_stream(data):
+        return sse_response(stream_feedback(graded, band, weak_unique))
+    if data.get("async_feedback"):
+        key = feedback_id(band, weak_unique)
+        ready = start_feedback(band, weak_unique)
+        if ready:
+            graded["ai_feedback"] = quiz_feedback.get(key) or graded["ai_feedback"]
+        graded.update(feedback_status="ready" if ready else "pending", feedback_id=key,
+                      feedback_url=f"/api/quiz-feedback/{key}")
+        return jsonify(graded)
+
+    try:
+        graded["ai_feedback"] = run_feedback(band, weak_unique)
+    except Exception:
+        pass  # the local feedback stands
+    return jsonify(graded)
+
+
+def stream_feedback(graded, band, weak_topics):
+    """SSE: `result` with the graded quiz and local feedback, `feedback` once the AI's is ready, then `done`."""
+    yield sse("result", graded)
+    try:
+        yield sse("feedback", {"ai_feedback": run_feedback(band, weak_topics)})
+    except Exception as e:
+        app.logger.warning("quiz feedback failed: %s", e)
+    yield sse("done", {})
+
+
+@app.route("/api/quiz-feedback/<key>")
+def get_quiz_feedback(key):
+    """
+    The AI feedback for an `async_feedback` evaluation, by its feedback_id.
+    Returns: { "status": "ready", "ai_feedback": {...} }, or 202 { "status": "pending" }
+    """
+    outcome = parse_feedback_id(key)
+    if outcome is None:
+        return jsonify({"error": "Unknown feedback_id"}), 404
+    feedback = quiz_feedback.get(key)
+    if feedback is not None:
+        return jsonify({"status": "ready", "ai_feedback": feedback})
+    start_feedback(*outcome)  # not started in this worker, or it failed: try (again)
+    return jsonify({"status": "pending"}), 202
 
 
 @app.route("/api/summarize", methods=["POST"])
@@ -550,17 +2164,326 @@ def summarize_notes():
         return jsonify({"error": "Notes content is required"}), 400
 
     style = data.get("style", "all")
-    notes_excerpt = smart_trim(notes, MAX_SUMMARY_CHARS)
-    word_count = len(notes.split())
-    prompt = build_summary_prompt(style, notes_excerpt, word_count)
+    full = large_notes(data)
+    word_count = len(full.split()) if full is not None else None
+
+    if wants_stream(data):
+        return sse_response(stream_summary(notes, style, full, word_count))
 
     try:
-        response = call_ai(prompt, max_tokens=3000, temperature=0.2)
-        result = extract_json(response)
+        if full is not None:
+            notes = condense_notes(full)
+        result = run_summary(notes, style, word_count)
         return jsonify(result)
     except Exception as e:
         app.logger.error("summary error: %s", e)
-        return jsonify({"error": "Summary generation failed. Please try again."}), 500
+        return ai_error("Summary generation failed. Please try again.", e)
+
+
+def stream_summary(notes, style, full=None, word_count=None):
+    """
+    SSE: one `field` event per completed top-level key, then `done` with the
+    full result. Large notes (`full`) are condensed first, inside the stream,
+    so the connection opens straight away.
+    """
+    fields = JsonExtractor(items=True)
+    try:
+        if full is not None:
+            notes = condense_notes(full)
+        prompt = summary_prompt(notes, style, word_count)
+        tier = routed_tier("summary", style)
+        for chunk in stream_ai(prompt, max_tokens=3000, temperature=0.2, endpoint="summary",
+                               model=models.model(tier)):
+            for key, value in fields.feed(chunk):
+                yield sse("field", {"key": key, "value": value})
+        try:
+            with metrics.stage("parse"):
+                result = checked_json(fields, SUMMARY_SCHEMA)
+        except ValueError:
+            # `done` carries the whole result, so the fields already sent are replaced.
+            higher = escalated_tier("summary", tier)
+            if higher is None:
+                raise
+            result = ask_tier(prompt, SUMMARY_SCHEMA, higher, "summary", max_tokens=3000, temperature=0.2)
+        yield sse("done", result)
+    except CircuitOpen:
+        yield sse("done", offline_summary(notes, style))
+    except Exception as e:
+        app.logger.error("summary stream error: %s", e)
+        yield sse("error", {"error": "Summary generation failed. Please try again."})
+
+
+STUDY_PACK_SECTIONS = {
+    "analyze":    ("Analysis failed. Please try again.",
+                   lambda notes, data: run_analyze(notes, data.get("syllabus", "").strip(), whole_notes(data))),
+    "flashcards": ("Flashcard generation failed. Please try again.",
+                   lambda notes, data: run_flashcards(notes)),
+    "quiz":       ("Quiz generation failed. Please try again.",
+                   lambda notes, data: run_quiz(notes)),
+    "summary":    ("Summary generation failed. Please try again.",
+                   lambda notes, data: run_summary(notes, data.get("style", "all"))),
+}
+
+
+@app.route("/api/study-pack", methods=["POST"])
+def study_pack():
+    """
+    Analysis, flashcards, quiz and summary from one upload. The notes are
+    trimmed once and the four AI calls run concurrently.
+    Expects: { "notes": "...", "syllabus": "...", "style": "all", "sections": [...], "stream": false }
+    Returns: { "analyze": {...}, "flashcards": [...], "quiz": [...], "summary": {...}, "errors": {...} },
+    or an SSE stream of one `section` event per finished section, then `done`.
+    """
+    data, notes = get_notes_from_request()
+    if not notes:
+        return jsonify({"error": "Notes content is required"}), 400
+
+    names = data.get("sections") or list(STUDY_PACK_SECTIONS)
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({"error": "sections must be a list of section names"}), 400
+    unknown = [name for name in names if name not in STUDY_PACK_SECTIONS]
+    if unknown:
+        return jsonify({"error": f"Unknown sections: {', '.join(unknown)}"}), 400
+
+    sections = run_sections(names, notes, data)
+    if wants_stream(data):
+        return sse_response(stream_study_pack(sections))
+
+    pack, errors = {}, {}
+    for name, result, error in sections:
+        if error:
+            errors[name] = error
+        else:
+            pack[name] = result
+    pack["errors"] = errors
+    return jsonify(pack), (500 if len(errors) == len(names) else 200)
+
+
+def run_sections(names, notes, data):
+    """Yields (name, result, error) for each section in completion order."""
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = {pool.submit(metrics.bind(STUDY_PACK_SECTIONS[name][1]), notes, data): name
+                   for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                app.logger.error("study-pack %s error: %s", name, e)
+                yield name, None, STUDY_PACK_SECTIONS[name][0]
+
+
+def stream_study_pack(sections):
+    errors = {}
+    for name, result, error in sections:
+        if error:
+            errors[name] = error
+            yield sse("section", {"section": name, "error": error})
+        else:
+            yield sse("section", {"section": name, "result": result})
+    yield sse("done", {"errors": errors})
+
+
+@app.route("/api/cache/stats")
+def cache_stats():
+    if llm_cache is None:
+        return jsonify({"backend": "off"})
+    return jsonify(llm_cache.info())
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled. Set METRICS=on."}), 404
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@metrics.collector
+def cache_and_queue_samples():
+    caches = {"notes_sessions": notes_sessions.info(), "notes_store": notes_store.info(),
+              "chat_summaries": chat_summaries.info(), "question_banks": question_banks.info(),
+              "quiz_feedback": quiz_feedback.info()}
+    if llm_cache is not None:
+        caches["llm"] = llm_cache.info()
+    matcher = syllabus_matcher.cache_info()
+    caches["syllabus_matcher"] = {"hits": matcher.hits, "misses": matcher.misses,
+                                  "entries": matcher.currsize}
+    caches["scored_documents"] = {"entries": len(_scored_docs)}
+
+    samples = []
+    for field, kind in (("hits", "counter"), ("misses", "counter"), ("sets", "counter"),
+                        ("evictions", "counter"), ("expired", "counter"),
+                        ("entries", "gauge"), ("bytes", "gauge")):
+        name = f"smartnotes_cache_{field}" + ("_total" if kind == "counter" else "")
+        samples += [(name, kind, (("cache", cache),), info[field])
+                    for cache, info in caches.items() if field in info]
+    samples.append(("smartnotes_background_queue_depth", "gauge", (), background._work_queue.qsize()))
+
+    health = groq_calls.info()
+    samples.append(("smartnotes_groq_breaker_open", "gauge", (), int(health["breaker"] != "closed")))
+    samples.append(("smartnotes_groq_breaker_opened_total", "counter", (), health["breaker_opened"]))
+    samples += [("smartnotes_groq_p95_seconds", "gauge", (("endpoint", endpoint),), round(p95, 4))
+                for endpoint, p95 in health["p95"].items() if p95 is not None]
+
+    samples.append(("smartnotes_groq_throttled_total", "counter", (), health["throttled"]))
+
+    admitted = admission.info()
+    samples.append(("smartnotes_admission_active", "gauge", (), admitted["active"]))
+    samples.append(("smartnotes_admission_queued", "gauge", (), admitted["queued"]))
+    samples.append(("smartnotes_admission_service_seconds", "gauge", (), admitted["service_seconds"]))
+    samples += [("smartnotes_admission_admitted_total", "counter", (("priority", priority),), n)
+                for priority, n in admitted["admitted"].items()]
+    samples += [("smartnotes_admission_shed_total", "counter", (("priority", priority), ("reason", reason)), n)
+                for (priority, reason), n in admitted["shed"].items()]
+
+    batch = job_store.counts()
+    samples += [("smartnotes_batch_items", "gauge", (("status", status),), batch.get(status, 0))
+                for status in ("queued", "running")]
+
+    if flights is not None:
+        coalescing = flights.info()
+        samples += [(f"smartnotes_singleflight_{field}_total", "counter", (), coalescing[field])
+                    for field in ("leaders", "followers", "timeouts")]
+        samples.append(("smartnotes_singleflight_in_flight", "gauge", (), coalescing["in_flight"]))
+    return samples
+
+
+# ─── CHAT CONTEXT ─────────────────────────────────────────────────────────────
+# Each turn sends the system prompt, a running summary of older turns and as
+# many recent messages as fit in CHAT_TOKEN_BUDGET. Turns that slide out of
+# the verbatim window are folded into the summary in the background after
+# the reply, so summarizing never adds latency to the turn itself.
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _message_digests(messages):
+    """A short digest per message, to recognise folded messages in a later window."""
+    return [hashlib.sha256(json.dumps([m["role"], m["content"]]).encode("utf-8")).hexdigest()[:16]
+            for m in messages]
+
+
+def load_chat_summary(conversation_id, messages, first_index=0):
+    """
+    Returns (summary, index of the first message the summary does not cover).
+    `first_index` is the position of messages[0] in the whole conversation.
+    The summary is used only if the messages it folded that are still in the
+    window match it, position by position; otherwise every message sent is
+    treated as unsummarised.
+    """
+    state = chat_summaries.get(conversation_id) if conversation_id else None
+    if state is None:
+        return "", 0
+    state = json.loads(state)
+    covered = state["count"] - first_index
+    if not 0 <= covered < len(messages):
+        return "", 0
+    folded = state["digests"][len(state["digests"]) - covered:] if covered else []
+    if len(folded) != covered or _message_digests(messages[:covered]) != folded:
+        return "", 0
+    return state["summary"], covered
+
+
+def whole_notes(data):
+    """The request's untrimmed notes, from `notes_id` or `notes`, or ""."""
+    if data.get("notes_id"):
+        session = load_notes_session(str(data["notes_id"]))
+        if session is None:
+            raise NotesSessionNotFound()
+        return session.full_text
+    return str(data.get("notes") or "").strip()
+
+
+def notes_index(text, cache=True):
+    """The passage index for `text`, built on first use and shared by content hash."""
+    key = _doc_key(text, "")
+    index = notes_indexes.get(key) if cache else None
+    if index is None:
+        index = PassageIndex(_STOP_WORDS)
+        for passage in chunk_notes(text, target=CHAT_PASSAGE_CHARS):
+            index.add(passage)
+        if cache:
+            notes_indexes.set(key, index)
+    return index
+
+
+def relevant_passages(index, messages):
+    """
+    The best passages for the latest question, in the notes' order. A
+    follow-up with nothing to match ("why?") uses the question before it.
+    """
+    hits = []
+    for question in [m["content"] for m in reversed(messages) if m["role"] == "user"][:3]:
+        hits = index.search(question, CHAT_PASSAGES)
+        if hits:
+            break
+    budget, kept = CHAT_NOTES_CHARS, []
+    for i, passage, _ in hits:
+        if len(passage) >= budget:
+            passage = passage[:budget].rstrip()
+        if passage:
+            kept.append((i, passage))
+            budget -= len(passage) + 1
+        if budget <= 80:
+            break
+    return [passage for _, passage in sorted(kept)]
+
+
+def build_chat_context(system_prompt, summary, messages, passages=()):
+    """
+    Note passages and the summary go into the system prompt, then recent
+    messages newest-first until the budget runs out.
+    """
+    if passages:
+        system_prompt += ("\n\nRELEVANT PASSAGES FROM THE STUDENT'S NOTES:\n"
+                          + "\n...\n".join(passages))
+    if summary:
+        system_prompt += "\n\nSUMMARY OF THE EARLIER CONVERSATION:\n" + summary
+    if not messages:
+        return [{"role": "system", "content": system_prompt}]
+    budget = CHAT_TOKEN_BUDGET - estimate_tokens(system_prompt)
+    first = len(messages) - 1
+    budget -= estimate_tokens(messages[first]["content"])
+    while first > 0 and len(messages) - first < CHAT_RECENT_MESSAGES:
+        cost = estimate_tokens(messages[first - 1]["content"])
+        if cost > budget:
+            break
+        budget -= cost
+        first -= 1
+    return [{"role": "system", "content": system_prompt}, *messages[first:]]
+
+
+def fold_chat_history(conversation_id, summary, messages, covered, first_index=0):
+    """
+    Folds messages that will fall out of the next turn's verbatim window into
+    the running summary. Runs on the background pool. The summary is stored
+    with the number of messages it covers and a digest of each of them.
+    """
+    cut = len(messages) - (CHAT_RECENT_MESSAGES - 1)
+    if cut <= covered:
+        return
+    to_fold = messages[covered:cut]
+    model = models.model(routed_tier("chat_summary"))
+    try:
+        t0 = time.perf_counter()
+        completion = groq_calls.create(
+            "chat_summary",
+            model=model,
+            messages=[{"role": "user", "content": build_chat_summary_prompt(summary, to_fold)}],
+            max_tokens=CHAT_SUMMARY_TOKENS,
+            temperature=0.2,
+        )
+        metrics.observe("smartnotes_model_seconds", (("model", model),), time.perf_counter() - t0)
+        metrics.record_usage(model, completion.usage, endpoint="chat_summary")
+        new_summary = completion.choices[0].message.content.strip()
+    except Exception as e:
+        app.logger.warning("chat summary error: %s", e)
+        return
+    chat_summaries.set(conversation_id, json.dumps({
+        "summary": new_summary,
+        "count": first_index + cut,
+        "digests": _message_digests(messages[:cut]),
+    }))
 
 
 # ─── AI CHAT ROUTE (Nova Assistant) ──────────────────────────────────────────
@@ -568,19 +2491,31 @@ def summarize_notes():
 def ai_chat():
     """
     Powers the Nova AI tutor chat panel.
-    Expects: { "system": "...", "messages": [{"role": "user"|"assistant", "content": "..."}] }
-    Returns: { "reply": "..." }
+    Expects: { "system": "...", "messages": [{"role": "user"|"assistant", "content": "..."}],
+               "conversation_id": "...", "first_index": 0,
+               "notes": "..." or "notes_id": "...", "stream": false }
+    `first_index` is the position of messages[0] in the whole conversation,
+    for clients that send only the latest messages.
+    Returns: { "reply": "..." }, or an SSE stream of `token` events when streaming
+    With notes, only the passages relevant to the latest question are sent to the model.
     """
     data = request.get_json(silent=True) or {}
     system_prompt = data.get("system", "You are Nova, a friendly AI study tutor. Help students understand topics clearly and encouragingly.")
     messages = data.get("messages", [])
+    conversation_id = str(data.get("conversation_id") or "")[:128]
 
     if not messages:
         return jsonify({"error": "No messages provided"}), 400
 
+    try:
+        first_index = max(0, int(data.get("first_index") or 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "first_index must be a number"}), 400
+    first_index += max(0, len(messages) - 50)
+
     # Sanitize messages — only keep role/content, valid roles only
     clean_messages = []
-    for msg in messages[-20:]:  # limit context to last 20 messages
+    for msg in messages[-50:]:  # older turns are carried by the running summary
         role = msg.get("role", "")
         content = str(msg.get("content", "")).strip()
         if role in ("user", "assistant") and content:
@@ -589,23 +2524,208 @@ def ai_chat():
     if not clean_messages:
         return jsonify({"error": "No valid messages provided"}), 400
 
+    with metrics.stage("notes"):
+        notes = whole_notes(data)
+        passages = relevant_passages(notes_index(notes), clean_messages) if notes else []
+
+    with metrics.stage("prompt"):
+        summary, covered = load_chat_summary(conversation_id, clean_messages, first_index)
+        chat_messages = build_chat_context(system_prompt, summary, clean_messages[covered:], passages)
+
+    def after_reply(reply):
+        if conversation_id:
+            background.submit(fold_chat_history, conversation_id, summary,
+                              [*clean_messages, {"role": "assistant", "content": reply}], covered, first_index)
+
+    model = models.model(routed_tier("chat"))
+    if wants_stream(data):
+        return sse_response(stream_chat(chat_messages, model, after_reply))
+
     try:
-        completion = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                *clean_messages,
-            ],
-            max_tokens=1000,
-            temperature=0.6,
-            timeout=30.0,
-        )
+        with metrics.stage("groq"):
+            t0 = time.perf_counter()
+            completion = groq_calls.create(
+                "chat",
+                model=model,
+                messages=chat_messages,
+                max_tokens=1000,
+                temperature=0.6,
+            )
+            metrics.observe("smartnotes_model_seconds", (("model", model),), time.perf_counter() - t0)
+        metrics.record_usage(model, completion.usage)
         reply = completion.choices[0].message.content.strip()
+        after_reply(reply)
         return jsonify({"reply": reply})
 
     except Exception as e:
         app.logger.error("chat error: %s", e)
-        return jsonify({"error": f"Chat failed: {str(e)}"}), 500
+        return ai_error(f"Chat failed: {str(e)}", e)
+
+
+def stream_chat(chat_messages, model, after_reply=None):
+    """SSE: `token` events carrying each text delta, then `done` with the full reply."""
+    parts = []
+    try:
+        stream = timed_stream(model, groq_calls.create(
+            "chat",
+            model=model,
+            messages=chat_messages,
+            max_tokens=1000,
+            temperature=0.6,
+            stream=True,
+        ))
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                parts.append(delta)
+                yield sse("token", {"delta": delta})
+        reply = "".join(parts).strip()
+        if after_reply:
+            after_reply(reply)
+        yield sse("done", {"reply": reply})
+    except Exception as e:
+        app.logger.error("chat stream error: %s", e)
+        yield sse("error", {"error": f"Chat failed: {str(e)}"})
+
+
+# ─── BATCH JOBS ───────────────────────────────────────────────────────────────
+# Whole-class runs: one analysis per document against a shared syllabus,
+# queued in the job store and worked through by `job_runner` in the
+# background. Progress and results are polled or streamed from /api/jobs.
+def analyze_document(params, document):
+    """
+    One batch item: `document` is {"id": ..., "notes": ...} with the notes as
+    submitted. They are trimmed here, and their syllabus coverage is worked
+    out on the whole notes, outside the index cache chat shares.
+    """
+    syllabus = params["syllabus"]
+    with metrics.stage("notes"):
+        notes = ScoredDocument(document["notes"], syllabus).trim(MAX_NOTES_CHARS)
+        coverage = syllabus_coverage(document["notes"], syllabus, cache=False)
+    try:
+        with admission.slot(None, "batch", groq_calls.deadline("analyze")):
+            result = run_analyze(notes, syllabus, coverage=coverage)
+    except (CircuitOpen, Overloaded) as e:
+        raise RetryLater(e.retry_after)  # wait for Groq, or for a slot, instead of failing the rest of the class
+    except Exception as e:
+        app.logger.error("batch analyze error: %s", e)
+        metrics.inc("smartnotes_batch_items_total", (("kind", "analyze"), ("status", "failed")))
+        if isinstance(e, TimeoutError):
+            raise RuntimeError("The AI service took too long to respond.") from e
+        raise RuntimeError("Analysis failed.") from e
+    metrics.inc("smartnotes_batch_items_total", (("kind", "analyze"), ("status", "done")))
+    return result
+
+
+job_runner = JobRunner(
+    job_store, {"analyze": analyze_document}, workers=BATCH_WORKERS,
+    lease=groq_calls.deadline("analyze") + 15,  # an item left running longer than this is run again
+    on_error=lambda e: app.logger.error("job store error: %s", e),
+)
+if job_store.pending():
+    job_runner.start()  # carry on with jobs left unfinished by a restart
+
+
+@app.route("/api/batch/analyze", methods=["POST"])
+def batch_analyze():
+    """
+    Queues an analysis of every document against one syllabus. The notes are
+    stored as sent; trimming them and checking them against the syllabus is
+    left to the job runner, so submitting a large batch returns at once.
+    Expects: { "syllabus": "...", "documents": [{"id": "...", "notes": "..."} or "notes", ...] }
+    Returns 202: { "job_id": "...", "total": ..., "status_url": "...", "results_url": "..." }
+    """
+    data = request.get_json(silent=True) or {}
+    documents = data.get("documents")
+    if not isinstance(documents, list) or not documents:
+        return jsonify({"error": "documents must be a non-empty list"}), 400
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        return jsonify({"error": f"At most {BATCH_MAX_DOCUMENTS} documents per batch"}), 400
+
+    syllabus = str(data.get("syllabus", "")).strip()
+    trimmed_syllabus = smart_trim(syllabus, MAX_SYLLABUS_CHARS)
+    inputs = []
+    for i, document in enumerate(documents):
+        if not isinstance(document, dict):
+            document = {"notes": document}
+        notes = str(document.get("notes") or "").strip()
+        if not notes:
+            return jsonify({"error": f"Document {i} has no notes"}), 400
+        inputs.append({"id": document.get("id", i), "notes": notes})
+    job_id = job_store.submit("analyze", {"syllabus": trimmed_syllabus}, inputs)
+    job_runner.notify()
+    return jsonify({
+        "job_id": job_id,
+        "total": len(inputs),
+        "status_url": f"/api/jobs/{job_id}",
+        "results_url": f"/api/jobs/{job_id}/results",
+    }), 202
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    """Returns: { "id", "kind", "status": "queued" | "running" | "finished", "total", "queued", "running", "done", "failed" }"""
+    status = job_store.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown or expired job_id"}), 404
+    return jsonify(status)
+
+
+@app.route("/api/jobs/<job_id>/results")
+def job_results(job_id):
+    """
+    Finished items in the order they finished, after `?after=<seq>` (default 0).
+    Returns: { "results": [{ "seq", "index", "id", "result" | "error" }], "next": seq, "status": {...} },
+    or with `?stream=1` (or Accept: text/event-stream) a `result` event per
+    item as it finishes, then `done` with the job's status. A stream still
+    open after BATCH_STREAM_SECONDS ends with `timeout` carrying the `after`
+    to reconnect with.
+    """
+    status = job_store.status(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown or expired job_id"}), 404
+    after = request.args.get("after", 0, type=int)
+    if wants_stream(request.args):
+        return sse_response(stream_job_results(job_id, after))
+
+    results = [job_result(row) for row in job_store.results(job_id, after)]
+    return jsonify({"results": results, "next": results[-1]["seq"] if results else after, "status": status})
+
+
+def job_result(row):
+    seq, index, document, result, error = row
+    item = {"seq": seq, "index": index, "id": document.get("id", index)}
+    if error is None:
+        item["result"] = result
+    else:
+        item["error"] = error
+    return item
+
+
+def stream_job_results(job_id, after, poll=0.5):
+    """
+    A poll that finds nothing new sends a keepalive comment, so a client that
+    has gone away is noticed within `poll` seconds rather than at the next result.
+    """
+    deadline = time.monotonic() + BATCH_STREAM_SECONDS
+    while True:
+        # Status first: once it says finished, every result is already stored.
+        status = job_store.status(job_id)
+        rows = job_store.results(job_id, after)
+        while rows:
+            for row in rows:
+                yield sse("result", job_result(row))
+            after = rows[-1][0]
+            rows = job_store.results(job_id, after)
+        if status is None or status["status"] == "finished":
+            yield sse("done", status or {"id": job_id, "status": "expired"})
+            return
+        if time.monotonic() >= deadline:
+            yield sse("timeout", {"after": after, "status": status})
+            return
+        yield ": keepalive\n\n"
+        time.sleep(poll)
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 10000))
@@ -0,0 +1,78 @@
+"""
+Precompressed responses for the page shell and its static assets.
+
+Each body is compressed once, when the app starts: gzip always, and
+brotli as well when the `brotli` package is installed. A request gets the
+best encoding its Accept-Encoding allows, with a strong ETag per encoding,
+and a conditional GET whose ETag still matches gets 304 with no body.
+
+Static files are served under content-hashed names (`app.3f9c2e1ab4d0.css`)
+and cached by browsers for a year. A changed file gets a new name, so a new
+shell never pairs with stale assets. The shell itself is revalidated on
+every visit, which costs a 304 while it is unchanged.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+
+from flask import Response
+
+try:
+    import brotli
+except ImportError:  # optional: pip install brotli
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+class Precompressed:
+    def __init__(self, body, mimetype, cache_control):
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.bodies = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+
+    def encoding(self, request):
+        """The smallest encoding the client accepts, or identity."""
+        offered = sorted((e for e in self.bodies if e != "identity"), key=lambda e: len(self.bodies[e]))
+        return request.accept_encodings.best_match(offered) or "identity"
+
+    def response(self, request):
+        encoding = self.encoding(request)
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding != "identity":
+            response.content_encoding = encoding
+        response.vary.add("Accept-Encoding")
+        response.set_etag(self.digest[:20] + ("" if encoding == "identity" else "-" + encoding))
+        response.headers["Cache-Control"] = self.cache_control
+        return response.make_conditional(request)
+
+
+class Assets:
+    """The files of `folder`, each served as Precompressed under its hashed name."""
+
+    def __init__(self, folder):
+        self.urls = {}    # name -> hashed URL
+        self.files = {}   # hashed name -> Precompressed
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if not os.path.isfile(path):
+                continue
+            with open(path, "rb") as f:
+                body = f.read()
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            asset = Precompressed(body, mimetype, IMMUTABLE)
+            stem, ext = os.path.splitext(name)
+            hashed = f"{stem}.{asset.digest[:12]}{ext}"
+            self.files[hashed] = asset
+            self.urls[name] = f"/assets/{hashed}"
+
+    def url(self, name):
+        return self.urls[name]
+
+    def get(self, hashed):
+        return self.files.get(hashed)
@@ -0,0 +1,220 @@
+"""
+Content-addressed cache for LLM responses.
+
+Responses are keyed on a hash of everything that decides the completion
+(model, system prompt, user prompt, max_tokens, temperature). Two backends:
+an in-process LRU, and a SQLite file that every gunicorn worker can share.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(model, system_prompt, prompt, max_tokens, temperature):
+    payload = json.dumps([model, system_prompt, prompt, max_tokens, temperature],
+                         ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "sets": 0, "evictions": 0, "expired": 0}
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counts[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else 0.0
+        return counts
+
+
+def _utf8_size(value):
+    return len(value.encode("utf-8"))
+
+
+class MemoryCache:
+    """
+    Thread-safe LRU with a per-entry TTL, bounded by entry count and total
+    bytes. Values are strings unless a `sizeof` function is given for them.
+    """
+
+    backend = "memory"
+
+    def __init__(self, ttl=3600, max_entries=512, max_bytes=32 * 1024 * 1024, sizeof=_utf8_size):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()  # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = _Stats()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                self._drop(key)
+                self.stats.add("expired")
+                entry = None
+            if entry is None:
+                self.stats.add("misses")
+                return None
+            self._data.move_to_end(key)
+            self.stats.add("hits")
+            return entry[1]
+
+    def set(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            self.stats.add("sets")
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.stats.add("evictions")
+
+    def _drop(self, key):
+        self._bytes -= self._data.pop(key)[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            entries, size = len(self._data), self._bytes
+        return {"backend": self.backend, "entries": entries, "bytes": size,
+                **self.stats.snapshot()}
+
+
+class SQLiteCache:
+    """
+    On-disk cache shared by all processes that point at the same file.
+    Recency is tracked per row, so eviction is LRU across workers; the
+    hit/miss counters are per process. Each cache kept in the file has its
+    own `table`.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path, ttl=3600, max_entries=5000, max_bytes=256 * 1024 * 1024, table="llm_cache"):
+        self.path = path
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self.stats = _Stats()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None and row[1] <= now:
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self.stats.add("expired")
+            row = None
+        if row is None:
+            self.stats.add("misses")
+            return None
+        conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+        self.stats.add("hits")
+        return row[0]
+
+    def set(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, size, expires_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, now + self.ttl, now),
+        )
+        self.stats.add("sets")
+        self._prune(conn, now)
+
+    def _prune(self, conn, now):
+        conn.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,))
+        entries, total = conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        evicted = 0
+        while entries > self.max_entries or total > self.max_bytes:
+            row = conn.execute(
+                f"SELECT key, size FROM {self.table} ORDER BY accessed_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (row[0],))
+            entries, total = entries - 1, total - row[1]
+            evicted += 1
+        if evicted:
+            self.stats.add("evictions", evicted)
+
+    def clear(self):
+        self._conn().execute(f"DELETE FROM {self.table}")
+
+    def info(self):
+        entries, total = self._conn().execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}"
+        ).fetchone()
+        return {"backend": self.backend, "path": self.path, "entries": entries,
+                "bytes": total, **self.stats.snapshot()}
+
+
+def cache_from_env():
+    """
+    LLM_CACHE=memory (default) | sqlite | off
+    LLM_CACHE_PATH, LLM_CACHE_TTL, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_MAX_BYTES
+    """
+    backend = os.environ.get("LLM_CACHE", "memory").lower()
+    ttl = int(os.environ.get("LLM_CACHE_TTL", 3600))
+    max_entries = os.environ.get("LLM_CACHE_MAX_ENTRIES")
+    max_bytes = os.environ.get("LLM_CACHE_MAX_BYTES")
+    limits = {}
+    if max_entries:
+        limits["max_entries"] = int(max_entries)
+    if max_bytes:
+        limits["max_bytes"] = int(max_bytes)
+
+    if backend in ("off", "none", "0", "false"):
+        return None
+    if backend == "sqlite":
+        path = os.environ.get("LLM_CACHE_PATH", "/tmp/smartnotes-llm-cache.sqlite3")
+        return SQLiteCache(path, ttl=ttl, **limits)
+    return MemoryCache(ttl=ttl, **limits)
@@ -0,0 +1,27 @@
+"""
+Gunicorn serving profile.
+
+Every API route spends almost all of its time waiting on Groq, so workers
+are threaded (gthread): each process serves GUNICORN_THREADS requests at
+once and a slow completion only holds one thread, not a whole worker.
+Total in-flight requests = WEB_CONCURRENCY x GUNICORN_THREADS.
+
+Set GUNICORN_WORKER_CLASS=gevent to use greenlets instead (needs
+`pip install gevent`; gunicorn monkey-patches the worker itself), or `sync`
+to get the old one-request-per-worker model.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", 64))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 256))  # gevent only
+
+# Streaming responses stay open for the whole generation; keep the worker
+# timeout above the longest Groq deadline (GROQ_DEADLINES in app.py).
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 90))
+graceful_timeout = 30
+keepalive = 5
+backlog = 2048
+
@@ -0,0 +1,237 @@
+"""
+Batch jobs: many items of work kept in SQLite and run by a bounded pool of
+threads in every worker process.
+
+A job is a kind (which handler runs it), params shared by its items, and a
+list of item inputs. Items are claimed with a lease, so each one runs once
+across all the processes sharing the file. An item whose process died is
+claimed again once its lease runs out, and jobs left unfinished by a restart
+carry on in the next process. Results are stored per item as they finish and
+numbered in finish order, so clients can poll progress or read results from
+where they left off.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class RetryLater(Exception):
+    """Raised by a handler to put its item back in the queue for `after` seconds."""
+
+    def __init__(self, after):
+        super().__init__(f"retrying in {after:.0f}s")
+        self.after = after
+
+
+class JobStore:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_attempts=3):
+        self.path = path
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL,"
+            " total INTEGER NOT NULL, created_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS items ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, input TEXT NOT NULL,"
+            " status TEXT NOT NULL DEFAULT 'queued', attempts INTEGER NOT NULL DEFAULT 0,"
+            " not_before REAL NOT NULL DEFAULT 0, lease_until REAL,"
+            " seq INTEGER, result TEXT, error TEXT,"
+            " PRIMARY KEY (job_id, idx));"
+            "CREATE INDEX IF NOT EXISTS items_queue ON items (status, not_before);"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, kind, params, inputs):
+        """Stores a job and queues its items; returns the job id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            expired = [row[0] for row in conn.execute("SELECT id FROM jobs WHERE created_at <= ?",
+                                                      (now - self.ttl,))]
+            for old in expired:
+                conn.execute("DELETE FROM items WHERE job_id = ?", (old,))
+                conn.execute("DELETE FROM jobs WHERE id = ?", (old,))
+            conn.execute("INSERT INTO jobs (id, kind, params, total, created_at) VALUES (?, ?, ?, ?, ?)",
+                         (job_id, kind, json.dumps(params), len(inputs), now))
+            conn.executemany("INSERT INTO items (job_id, idx, input) VALUES (?, ?, ?)",
+                             [(job_id, i, json.dumps(value)) for i, value in enumerate(inputs)])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, lease):
+        """
+        The next runnable item as (job_id, idx, kind, params, input), leased
+        for `lease` seconds, or None. An item whose lease ran out
+        `max_attempts` times is failed instead of run again.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = conn.execute(
+                    "SELECT i.job_id, i.idx, i.attempts, j.kind, j.params, i.input"
+                    " FROM items i JOIN jobs j ON j.id = i.job_id"
+                    " WHERE (i.status = 'queued' AND i.not_before <= ?)"
+                    "    OR (i.status = 'running' AND i.lease_until <= ?)"
+                    " ORDER BY i.rowid LIMIT 1", (now, now)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                job_id, idx, attempts, kind, params, value = row
+                if attempts >= self.max_attempts:
+                    self._finish(conn, job_id, idx, "failed", None,
+                                 "The worker running this item stopped too many times")
+                    continue
+                conn.execute("UPDATE items SET status = 'running', attempts = attempts + 1, lease_until = ?"
+                             " WHERE job_id = ? AND idx = ?", (now + lease, job_id, idx))
+                conn.execute("COMMIT")
+                return job_id, idx, kind, json.loads(params), json.loads(value)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _finish(conn, job_id, idx, status, result, error):
+        conn.execute(
+            "UPDATE items SET status = ?, result = ?, error = ?, lease_until = NULL,"
+            " seq = (SELECT COALESCE(MAX(seq), 0) + 1 FROM items WHERE job_id = ?)"
+            " WHERE job_id = ? AND idx = ? AND status = 'running'",
+            (status, None if result is None else json.dumps(result), error, job_id, job_id, idx),
+        )
+
+    def complete(self, job_id, idx, result):
+        self._finish(self._conn(), job_id, idx, "done", result, None)
+
+    def fail(self, job_id, idx, error):
+        self._finish(self._conn(), job_id, idx, "failed", None, error)
+
+    def release(self, job_id, idx, after):
+        """Puts a running item back in the queue, runnable again in `after` seconds."""
+        self._conn().execute(
+            "UPDATE items SET status = 'queued', attempts = attempts - 1, not_before = ?, lease_until = NULL"
+            " WHERE job_id = ? AND idx = ?", (time.time() + after, job_id, idx))
+
+    def status(self, job_id):
+        """{id, kind, total, created_at, queued, running, done, failed, status}, or None."""
+        conn = self._conn()
+        row = conn.execute("SELECT kind, total, created_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        counts = dict.fromkeys(("queued", "running", "done", "failed"), 0)
+        counts.update(conn.execute("SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status",
+                                   (job_id,)).fetchall())
+        kind, total, created_at = row
+        if counts["queued"] + counts["running"] == 0:
+            state = "finished"
+        elif counts["queued"] == total:
+            state = "queued"
+        else:
+            state = "running"
+        return {"id": job_id, "kind": kind, "status": state, "total": total,
+                "created_at": created_at, **counts}
+
+    def results(self, job_id, after=0, limit=100):
+        """Finished items with seq > `after`, in finish order: [(seq, idx, input, result, error)]."""
+        rows = self._conn().execute(
+            "SELECT seq, idx, input, result, error FROM items WHERE job_id = ? AND seq > ?"
+            " ORDER BY seq LIMIT ?", (job_id, after, limit)
+        ).fetchall()
+        return [(seq, idx, json.loads(value), None if result is None else json.loads(result), error)
+                for seq, idx, value, result, error in rows]
+
+    def pending(self):
+        """Items queued or running, across every job."""
+        return self._conn().execute(
+            "SELECT COUNT(*) FROM items WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def counts(self):
+        return dict(self._conn().execute(
+            "SELECT status, COUNT(*) FROM items WHERE status IN ('queued', 'running') GROUP BY status"
+        ).fetchall())
+
+
+class JobRunner:
+    """
+    `workers` threads that claim items from `store` and run
+    `handlers[kind](params, input)`. Idle threads poll every `poll` seconds;
+    notify() wakes them at once after a submit in this process. `on_error`
+    is called with store errors, which leave the item to a later claim.
+    """
+
+    def __init__(self, store, handlers, workers=4, lease=120.0, poll=1.0, on_error=None):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.lease = lease
+        self.poll = poll
+        self._on_error = on_error
+        self._wake = threading.Event()
+        self._started = False
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for i in range(self.workers):
+            threading.Thread(target=self._loop, name=f"jobs-{i}", daemon=True).start()
+
+    def notify(self):
+        self.start()
+        self._wake.set()
+
+    def _loop(self):
+        while True:
+            try:
+                item = self.store.claim(self.lease)
+                if item is not None:
+                    self._run(*item)
+                    continue
+            except sqlite3.Error as e:
+                # The item stays leased and is claimed again once the lease runs out.
+                if self._on_error is not None:
+                    self._on_error(e)
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def _run(self, job_id, idx, kind, params, value):
+        """Handlers raise with the message the item's result should carry."""
+        try:
+            result = self.handlers[kind](params, value)
+        except RetryLater as e:
+            self.store.release(job_id, idx, e.after)
+        except Exception as e:
+            self.store.fail(job_id, idx, str(e) or type(e).__name__)
+        else:
+            self.store.complete(job_id, idx, result)
+
+
+def job_store_from_env():
+    """
+    JOBS_PATH: the sqlite file shared by the workers (default /tmp/smartnotes-jobs.sqlite3).
+    JOBS_TTL: seconds a job and its results are kept (default 7 days).
+    """
+    return JobStore(os.environ.get("JOBS_PATH", "/tmp/smartnotes-jobs.sqlite3"),
+                    ttl=int(os.environ.get("JOBS_TTL", 7 * 24 * 3600)))
@@ -0,0 +1,294 @@
+"""
+Pulls the JSON value out of model output.
+
+`JsonExtractor` scans the text once, incrementally. It skips prose and code
+fences before the value, jumps over string bodies with a regex, and only
+looks at structural characters in Python. It can be fed streamed chunks and
+reports each top-level field as soon as it is complete. If the output stops
+mid-value (max_tokens), `value()` closes the open containers after the last
+complete element, so 9 finished flashcards out of 10 are kept.
+
+`validate` checks a parsed value against a small schema. It drops list
+items that do not fit, fills in optional fields and normalises enum values.
+"""
+import json
+import re
+
+# A string (possibly unterminated: group 1 is then empty) or one structural character.
+_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*("?)|[][{},]')
+_START = re.compile(r'```|[\[{]')
+_CLOSER = {"{": "}", "[": "]"}
+_decoder = json.JSONDecoder()
+
+
+class JsonExtractor:
+    """
+    feed(chunk) -> newly completed top-level items, as (key, value) for an
+    object or (index, value) for an array; only collected when `items=True`.
+    value() -> the complete value, or the repaired prefix if the text stopped early.
+    """
+
+    def __init__(self, items=False):
+        self.items = items
+        self.buffer = ""
+        self.complete = False
+        self.truncated = False
+        self._pos = 0
+        self._reset()
+
+    def _reset(self):
+        self._start = None
+        self._closers = ""      # closing characters for the open containers, innermost first
+        self._safe = None       # (cut, closers): buffer[start:cut] + closers is valid JSON
+        self._item_start = None
+        self._item_index = 0
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        out = []
+        if self.complete:
+            return out
+        buf = self.buffer
+        i = self._pos
+        while True:
+            if self._start is None:
+                m = _START.search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                i = m.end()
+                if m.group() == "```":
+                    continue
+                self._start = m.start()
+                self._closers = _CLOSER[m.group()]
+                self._safe = (i, self._closers)
+                self._item_start = i
+                continue
+
+            m = _TOKEN.search(buf, i)
+            if m is None:
+                i = len(buf)
+                break
+            tok = m.group()
+            if tok[0] == '"':
+                if not m.group(1):
+                    i = m.start()  # string not finished yet; rescan it with the next chunk
+                    break
+                i = m.end()
+                continue
+
+            at, i = m.start(), m.end()
+            if tok in "[{":
+                self._closers = _CLOSER[tok] + self._closers
+                self._safe = (i, self._closers)
+            elif tok in "]}":
+                if tok != self._closers[0]:
+                    self._reset()  # mismatched bracket: not JSON, look for the next candidate
+                    continue
+                self._closers = self._closers[1:]
+                if self._closers:
+                    self._safe = (i, self._closers)
+                    continue
+                try:
+                    self._value = _loads(buf[self._start:i])
+                except ValueError:
+                    self._reset()
+                    continue
+                if self.items:
+                    out += self._item(buf[self._item_start:at])
+                self.complete = True
+                break
+            else:  # ","
+                self._safe = (at, self._closers)
+                if self.items and len(self._closers) == 1:
+                    out += self._item(buf[self._item_start:at])
+                    self._item_start = i
+        self._pos = i
+        return out
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        An extractor fed all of `text`. A well-formed value is decoded by the
+        C parser straight away; the scanner only runs when that fails
+        (prose brackets before the value, or a truncated response).
+        """
+        extractor = cls()
+        m = _START.search(text)
+        while m is not None and m.group() == "```":
+            m = _START.search(text, m.end())
+        if m is not None:
+            try:
+                extractor._value, end = _decoder.raw_decode(text, m.start())
+            except (ValueError, RecursionError):
+                pass
+            else:
+                extractor.buffer, extractor._start, extractor._pos = text, m.start(), end
+                extractor.complete = True
+                return extractor
+        extractor.feed(text)
+        return extractor
+
+    def _item(self, segment):
+        if not segment.strip():
+            return []
+        try:
+            if self.buffer[self._start] == "{":
+                return list(_loads("{" + segment + "}").items())
+            index, self._item_index = self._item_index, self._item_index + 1
+            return [(index, _loads(segment))]
+        except ValueError:
+            return []
+
+    def value(self):
+        if self.complete:
+            return self._value
+        if self._safe is not None:
+            cut, closers = self._safe
+            self._value = _loads(self.buffer[self._start:cut] + closers)
+            self.truncated = True
+            return self._value
+        return _loads(self.buffer.strip())
+
+
+def _loads(text):
+    try:
+        return json.loads(text)
+    except RecursionError:
+        raise ValueError("JSON nested too deeply") from None
+
+
+def extract_json(text, schema=None):
+    """
+    The JSON value in `text`, checked against `schema` if given. A value
+    inside a ``` fence wins over brackets in the prose before it.
+    Raises ValueError when there is nothing usable.
+    """
+    extractor = parse_json(text)
+    value = extractor.value()
+    return validate(value, schema) if schema is not None else value
+
+
+def parse_json(text):
+    """A JsonExtractor fed the whole of `text` (preferring a fenced value)."""
+    fence = text.find("```")
+    if fence > 0:
+        extractor = JsonExtractor.from_text(text[fence:])
+        if extractor.complete:
+            return extractor
+    return JsonExtractor.from_text(text)
+
+
+def is_complete_json(text):
+    """True when `text` holds a whole JSON value, not one repaired from a truncated response."""
+    return parse_json(text).complete
+
+
+# ─── SCHEMAS ──────────────────────────────────────────────────────────────────
+# A schema is one of:
+#   str / int / float / bool / list / dict   type check (float accepts ints; numeric strings are converted)
+#   one_of("a", "b")                         enum, matched case-insensitively
+#   list_of(schema, min_items=0)             list; items that fail are dropped
+#   {"key": schema, ...}                     object; keys are required unless optional(...)
+#   optional(schema, default=MISSING)        absent or invalid -> default (or left out)
+#   any_of(schema, ...)                      first schema that fits
+
+class SchemaError(ValueError):
+    pass
+
+
+MISSING = object()
+
+
+class one_of:
+    def __init__(self, *values):
+        self.values = {str(v).lower(): v for v in values}
+
+
+class list_of:
+    def __init__(self, item, min_items=0):
+        self.item = item
+        self.min_items = min_items
+
+
+class optional:
+    def __init__(self, schema, default=MISSING):
+        self.schema = schema
+        self.default = default
+
+
+class any_of:
+    def __init__(self, *schemas):
+        self.schemas = schemas
+
+
+def validate(value, schema, path="$"):
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected an object")
+        out = dict(value)
+        for key, sub in schema.items():
+            if isinstance(sub, optional):
+                try:
+                    if key not in value:
+                        raise SchemaError(f"{path}.{key}: missing")
+                    out[key] = validate(value[key], sub.schema, f"{path}.{key}")
+                except SchemaError:
+                    out.pop(key, None)
+                    if sub.default is not MISSING:
+                        out[key] = sub.default() if callable(sub.default) else sub.default
+            elif key not in value:
+                raise SchemaError(f"{path}.{key}: missing")
+            else:
+                out[key] = validate(value[key], sub, f"{path}.{key}")
+        return out
+
+    if isinstance(schema, list_of):
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected a list")
+        out = []
+        for i, item in enumerate(value):
+            try:
+                out.append(validate(item, schema.item, f"{path}[{i}]"))
+            except SchemaError:
+                pass
+        if len(out) < schema.min_items:
+            raise SchemaError(f"{path}: {len(out)} valid items, need {schema.min_items}")
+        return out
+
+    if isinstance(schema, one_of):
+        match = schema.values.get(str(value).strip().lower())
+        if match is None:
+            raise SchemaError(f"{path}: {value!r} is not one of {', '.join(map(str, schema.values.values()))}")
+        return match
+
+    if isinstance(schema, any_of):
+        for sub in schema.schemas:
+            try:
+                return validate(value, sub, path)
+            except SchemaError:
+                pass
+        raise SchemaError(f"{path}: matches none of the allowed shapes")
+
+    if schema in (int, float):
+        if isinstance(value, bool):
+            raise SchemaError(f"{path}: expected a number")
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().rstrip("%"))
+            except ValueError:
+                raise SchemaError(f"{path}: expected a number") from None
+            if value.is_integer():
+                value = int(value)
+        if schema is int and isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, (int, float)) or (schema is int and not isinstance(value, int)):
+            raise SchemaError(f"{path}: expected {schema.__name__}")
+        return value
+
+    if isinstance(schema, type):
+        if not isinstance(value, schema):
+            raise SchemaError(f"{path}: expected {schema.__name__}")
+        return value
+
+    raise TypeError(f"unsupported schema at {path}: {schema!r}")
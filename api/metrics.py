@@ -0,0 +1,254 @@
+"""
+Request metrics: per-stage timings, token usage and cache/queue gauges,
+exposed in the Prometheus text format.
+
+A request is split into stages (notes, prompt, cache, groq, parse). Each
+stage is timed with `metrics.stage(name)` and recorded per endpoint, and
+can be echoed back to the browser in a `Server-Timing` header. When
+metrics are off, `stage()` returns a shared no-op context manager and no
+request hooks are installed.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from werkzeug.wsgi import ClosingIterator
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current = contextvars.ContextVar("request_timings", default=None)
+_NULL = nullcontext()
+
+
+class RequestTimings:
+    """Stage durations for one request. Concurrent stages (study-pack) add up."""
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.status = None
+        self.streamed = False
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self):
+        with self._lock:
+            stages = list(self.stages.items())
+        total = time.perf_counter() - self.started
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class _Stage:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.observe_stage(self.name, time.perf_counter() - self.t0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self, enabled=False, server_timing=False):
+        self.enabled = enabled
+        self.server_timing = enabled and server_timing
+        self._lock = threading.Lock()
+        self._counters = {}    # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> _Histogram
+        self._collectors = []
+        self._in_flight = 0
+
+    # ── recording ──
+    def stage(self, name):
+        """`with metrics.stage("groq"):` — times the block for the current request."""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def observe_stage(self, name, seconds):
+        timings = _current.get()
+        endpoint = timings.endpoint if timings else "background"
+        if timings:
+            timings.add(name, seconds)
+        self._observe("smartnotes_stage_seconds", (("endpoint", endpoint), ("stage", name)), seconds)
+
+    def record_usage(self, model, usage, endpoint=None):
+        """Adds a completion's prompt/completion token counts; `usage` may be None."""
+        if not self.enabled or usage is None:
+            return
+        if endpoint is None:
+            timings = _current.get()
+            endpoint = timings.endpoint if timings else "background"
+        labels = (("endpoint", endpoint), ("model", model))
+        self.inc("smartnotes_prompt_tokens_total", labels, getattr(usage, "prompt_tokens", 0) or 0)
+        self.inc("smartnotes_completion_tokens_total", labels, getattr(usage, "completion_tokens", 0) or 0)
+
+    def inc(self, name, labels=(), value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        """Adds a duration to the `name` histogram, e.g. per-model Groq latency."""
+        if self.enabled:
+            self._observe(name, labels, seconds)
+
+    def _observe(self, name, labels, value, buckets=REQUEST_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def collector(self, fn):
+        """Registers fn() -> [(name, type, labels, value)], sampled on every scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    # ── request lifecycle (Flask hooks) ──
+    def install(self, app, request):
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def _start_timings():
+            rule = request.url_rule.rule if request.url_rule else "unmatched"
+            request.environ["smartnotes.timings"] = timings = RequestTimings(rule)
+            _current.set(timings)
+            with self._lock:
+                self._in_flight += 1
+
+        @app.after_request
+        def _server_timing(response):
+            timings = request.environ.get("smartnotes.timings")
+            if timings is not None:
+                timings.status = response.status_code
+                if self.server_timing:
+                    # For a streamed response this covers only the work before the first byte.
+                    response.headers["Server-Timing"] = timings.server_timing()
+                if response.is_streamed:
+                    # Count the request once the server has sent and closed the body.
+                    timings.streamed = True
+                    response.response = ClosingIterator(response.response,
+                                                        lambda: self._finish(timings, None))
+            return response
+
+        @app.teardown_request
+        def _finish_timings(exc):
+            timings = request.environ.get("smartnotes.timings")
+            if timings is not None and not timings.streamed:
+                self._finish(timings, exc)
+
+    def _finish(self, timings, exc):
+        with self._lock:
+            if timings.finished:
+                return
+            timings.finished = True
+            self._in_flight -= 1
+        status = 500 if exc is not None or timings.status is None else timings.status
+        seconds = time.perf_counter() - timings.started
+        self.inc("smartnotes_requests_total", (("endpoint", timings.endpoint), ("status", str(status))))
+        self._observe("smartnotes_request_seconds", (("endpoint", timings.endpoint),), seconds)
+
+    def bind(self, fn):
+        """Wraps fn so it records into the current request's timings from another thread."""
+        if not self.enabled:
+            return fn
+        timings = _current.get()
+
+        def bound(*args, **kwargs):
+            token = _current.set(timings)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+        return bound
+
+    # ── exposition ──
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            in_flight = self._in_flight
+            snapshot = [(key, (list(h.counts), h.sum, h.count, h.buckets)) for key, h in histograms]
+
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                lines.append(f"# TYPE {name} counter")
+                seen.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+
+        for (name, labels), (counts, total, n, buckets) in snapshot:
+            if name not in seen:
+                lines.append(f"# TYPE {name} histogram")
+                seen.add(name)
+            cumulative = 0
+            for bound, c in zip(buckets, counts):
+                cumulative += c
+                lines.append(f"{name}_bucket{_labels(labels + (('le', repr(float(bound))),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {n}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {n}")
+
+        lines.append("# TYPE smartnotes_requests_in_flight gauge")
+        lines.append(f"smartnotes_requests_in_flight {in_flight}")
+        for collect in self._collectors:
+            for name, kind, labels, value in collect():
+                if name not in seen:
+                    lines.append(f"# TYPE {name} {kind}")
+                    seen.add(name)
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def metrics_from_env():
+    """
+    METRICS=on enables /metrics and the stage timers (default off).
+    SERVER_TIMING=on also adds a Server-Timing header to every response.
+    """
+    on = ("1", "on", "true", "yes")
+    return Metrics(enabled=os.environ.get("METRICS", "off").lower() in on,
+                   server_timing=os.environ.get("SERVER_TIMING", "off").lower() in on)
@@ -0,0 +1,338 @@
+"""
+Tail-latency control for Groq calls.
+
+`Resilient.create(endpoint, **kwargs)` stands in for
+`client.chat.completions.create(**kwargs)`:
+
+- Every call has a deadline, set per endpoint. Each attempt's timeout is
+  whatever is left of it.
+- Connection errors, timeouts, 429 and 5xx responses are retried with
+  full-jitter exponential backoff (or the server's Retry-After, if longer)
+  for as long as the deadline allows.
+- With hedging on, a non-streaming attempt that has not answered after the
+  endpoint's recent p95 latency is sent a second time and the first answer
+  wins. The slower request cannot be cancelled mid-flight; its answer is dropped.
+- A circuit breaker counts consecutive failed attempts. Once it opens, calls
+  fail fast with `CircuitOpen` until a cooldown has passed and a single
+  probe call gets through. Only Groq's own answers and transport errors
+  count for or against it; any other exception leaves it as it was.
+- A rate limiter spaces attempts out to a number of requests per minute.
+  An attempt that would have to wait past its deadline is not sent.
+
+The Groq client should be built with `max_retries=0` so the SDK does not
+retry underneath.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from groq import APIConnectionError, APIError, APIStatusError
+
+
+class CircuitOpen(Exception):
+    """Groq is marked unhealthy; `retry_after` is the seconds until the next probe."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Groq is unavailable; retrying in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_retryable(error):
+    if isinstance(error, APIConnectionError):  # includes APITimeoutError
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def retry_after(error):
+    """Seconds from the response's Retry-After header, or None."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures -> half-open once
+    `cooldown` seconds have passed, letting one probe through -> closed if
+    the probe succeeds, open again if it fails. `threshold=0` disables it.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.opened = 0
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        return "open" if now - self._opened_at < self.cooldown else "half_open"
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def check(self):
+        """
+        Raises CircuitOpen unless a call may go ahead. Returns True if the
+        call is the half-open probe, which must end in success(), failure()
+        or, if it is never sent, abandon_probe().
+        """
+        if self.threshold <= 0:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            state = self._state(now)
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            raise CircuitOpen(max(1.0, self._opened_at + self.cooldown - now))
+
+    def abandon_probe(self):
+        """Lets another call probe: the one admitted by check() was never sent."""
+        with self._lock:
+            self._probing = False
+
+    def success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or (self._opened_at is None and 0 < self.threshold <= self._failures):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._probing = False
+
+
+class RateLimiter:
+    """
+    Token bucket: `per_minute` requests a minute, in bursts of up to
+    `burst` (default: ten seconds' worth). Callers queue in arrival order.
+    `per_minute=0` disables it.
+    """
+
+    def __init__(self, per_minute=0, burst=None):
+        self.rate = per_minute / 60.0
+        self.burst = burst or max(1.0, self.rate * 10)
+        self.throttled = 0
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Waits for a token; False, without waiting, if none would come within `timeout` seconds."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait >= timeout:
+                return False
+            self._tokens -= 1  # reserved now, so later callers queue behind this one
+            if wait:
+                self.throttled += 1
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class LatencyWindow:
+    """The last `size` successful attempt latencies of one endpoint."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=20):
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Resilient:
+    def __init__(self, create, deadlines=None, default_deadline=30.0, attempts=3,
+                 backoff=0.25, max_backoff=4.0, hedge=False, hedge_quantile=0.95,
+                 hedge_min_delay=0.25, breaker=None, limiter=None, on_event=None, max_workers=64):
+        self._create = create
+        self.deadlines = deadlines or {}
+        self.default_deadline = default_deadline
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = breaker or CircuitBreaker(threshold=0)
+        self.limiter = limiter or RateLimiter()
+        self._on_event = on_event
+        self._latency = {}
+        self._latency_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge") if hedge else None
+
+    def _event(self, name, endpoint):
+        if self._on_event is not None:
+            self._on_event(name, endpoint)
+
+    def deadline(self, endpoint):
+        return self.deadlines.get(endpoint, self.default_deadline)
+
+    def latency(self, endpoint):
+        with self._latency_lock:
+            window = self._latency.get(endpoint)
+            if window is None:
+                window = self._latency[endpoint] = LatencyWindow()
+            return window
+
+    def create(self, endpoint, **kwargs):
+        """
+        client.chat.completions.create(**kwargs) within the endpoint's
+        deadline. Raises CircuitOpen, DeadlineExceeded or the last error.
+        A stream is retried only until Groq accepts it, never mid-response.
+        """
+        deadline = time.monotonic() + self.deadline(endpoint)
+        for attempt in range(1, self.attempts + 1):
+            try:
+                probe = self.breaker.check()
+            except CircuitOpen:
+                self._event("breaker_rejections", endpoint)
+                raise
+            if not self.limiter.acquire(deadline - time.monotonic()):
+                if probe:
+                    self.breaker.abandon_probe()
+                self._event("rate_limited", endpoint)
+                raise DeadlineExceeded(f"{endpoint}: the rate limit leaves no time for another attempt")
+            remaining = deadline - time.monotonic()
+            try:
+                result = self._attempt(endpoint, kwargs, remaining)
+            except DeadlineExceeded:
+                self.breaker.failure()
+                self._event("deadline_exceeded", endpoint)
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    if isinstance(e, APIStatusError):
+                        self.breaker.success()  # Groq answered; the request itself was bad
+                    elif isinstance(e, APIError):
+                        self.breaker.failure()  # Groq answered with something unusable
+                    elif probe:
+                        self.breaker.abandon_probe()  # raised here, so it says nothing about Groq
+                    raise
+                self.breaker.failure()
+                if attempt == self.attempts:
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                delay = max(delay, retry_after(e) or 0.0)
+                if time.monotonic() + delay >= deadline:
+                    self._event("deadline_exceeded", endpoint)
+                    raise DeadlineExceeded(f"{endpoint}: no time left to retry after {e}") from e
+                self._event("retries", endpoint)
+                time.sleep(delay)
+            else:
+                self.breaker.success()
+                return result
+
+    def _attempt(self, endpoint, kwargs, timeout):
+        window = self.latency(endpoint)
+        delay = None
+        if self.hedge and not kwargs.get("stream"):
+            delay = window.quantile(self.hedge_quantile)
+        if delay is None or max(delay, self.hedge_min_delay) >= timeout:
+            return self._timed(window, kwargs, timeout)
+        return self._hedged(endpoint, window, kwargs, timeout, max(delay, self.hedge_min_delay))
+
+    def _timed(self, window, kwargs, timeout):
+        t0 = time.monotonic()
+        result = self._create(**kwargs, timeout=timeout)
+        if not kwargs.get("stream"):
+            window.add(time.monotonic() - t0)
+        return result
+
+    def _hedged(self, endpoint, window, kwargs, timeout, delay):
+        started = time.monotonic()
+        first = self._pool.submit(self._timed, window, kwargs, timeout)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        self._event("hedges", endpoint)
+        second = self._pool.submit(self._timed, window, kwargs, timeout - delay)
+        pending, error = {first, second}, None
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, started + timeout - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded(f"{endpoint}: no answer within {timeout:.1f}s")
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._event("hedge_wins", endpoint)
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def info(self):
+        with self._latency_lock:
+            windows = dict(self._latency)
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "throttled": self.limiter.throttled,
+            "p95": {endpoint: window.quantile(0.95) for endpoint, window in windows.items()},
+        }
+
+
+def resilient_from_env(create, deadlines, on_event=None, max_workers=64):
+    """
+    GROQ_DEADLINES="chat=20,evaluate=8" overrides per-endpoint deadlines (seconds).
+    GROQ_ATTEMPTS (default 3), GROQ_HEDGE=on (default off),
+    GROQ_BREAKER_THRESHOLD (consecutive failures, default 5; 0 disables),
+    GROQ_BREAKER_COOLDOWN (seconds, default 30),
+    GROQ_RPM (requests a minute for the whole server, default 0: no limit),
+    shared equally by the WEB_CONCURRENCY worker processes (default 2, as in
+    gunicorn.conf.py).
+    """
+    deadlines = dict(deadlines)
+    for item in os.environ.get("GROQ_DEADLINES", "").split(","):
+        endpoint, sep, seconds = item.partition("=")
+        if sep:
+            deadlines[endpoint.strip()] = float(seconds)
+    return Resilient(
+        create,
+        deadlines=deadlines,
+        default_deadline=deadlines.get("default", 30.0),
+        attempts=max(1, int(os.environ.get("GROQ_ATTEMPTS", 3))),
+        hedge=os.environ.get("GROQ_HEDGE", "off").lower() in ("1", "on", "true", "yes"),
+        breaker=CircuitBreaker(threshold=int(os.environ.get("GROQ_BREAKER_THRESHOLD", 5)),
+                               cooldown=float(os.environ.get("GROQ_BREAKER_COOLDOWN", 30))),
+        limiter=RateLimiter(float(os.environ.get("GROQ_RPM", 0))
+                            / max(1, int(os.environ.get("WEB_CONCURRENCY", 2)))),
+        on_event=on_event,
+        max_workers=max_workers,
+    )
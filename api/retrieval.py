@@ -0,0 +1,100 @@
+"""
+Passage retrieval over a set of notes, for grounding chat turns and
+checking syllabus coverage.
+
+`PassageIndex` ranks passages (a few sentences each) against a question
+with BM25. Passages are added one at a time: each adds its term counts to
+the postings, and document frequencies are read from the postings at query
+time, so nothing is recomputed when the index grows. Term counts are cached
+per passage text, so indexing an edited copy of the notes only tokenizes
+the passages that changed. A query touches only the postings of its own
+terms, which keeps it to milliseconds on a megabyte of notes. Words are
+matched after light suffix stripping, so "schedules" finds "scheduling".
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+_TERM = re.compile(r"[a-z0-9]+")
+_SUFFIXES = ("ations", "ation", "ings", "ing", "ies", "ied", "ates", "ate", "ed", "es", "ly", "s", "e")
+
+
+def stem(word):
+    """
+    Strips one common suffix, keeping at least three letters, so that
+    "scheduling", "schedules" and "schedule" all become "schedul".
+    """
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix == "s" and word.endswith("ss"):
+                return word
+            if suffix in ("ies", "ied"):
+                return word[:-3] + "y"
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text, stop_words=frozenset()):
+    """Stemmed lower-cased words of `text`, minus `stop_words`."""
+    return [stem(word) for word in _TERM.findall(text.lower())
+            if len(word) >= 2 and word not in stop_words]
+
+
+@lru_cache(maxsize=8192)
+def passage_terms(passage, stop_words):
+    return Counter(terms(passage, stop_words))
+
+
+class PassageIndex:
+    def __init__(self, stop_words=frozenset(), k1=1.2, b=0.75):
+        self.stop_words = frozenset(stop_words)
+        self.k1 = k1
+        self.b = b
+        self.passages = []
+        self.chars = 0
+        self._lengths = []
+        self._postings = {}  # term -> [(passage index, term count)]
+        self._total_length = 0
+
+    def add(self, passage):
+        counts = passage_terms(passage, self.stop_words)
+        i = len(self.passages)
+        self.passages.append(passage)
+        self.chars += len(passage)
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        for term, n in counts.items():
+            self._postings.setdefault(term, []).append((i, n))
+
+    def search(self, query, k=5):
+        """The `k` best passages for `query` as [(index, passage, score)], best first; [] if none match."""
+        if not self.passages:
+            return []
+        n = len(self.passages)
+        average = self._total_length / n or 1.0
+        scores = {}
+        for term in set(terms(query, self.stop_words)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[i] / average)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / norm
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [(i, self.passages[i], score) for i, score in best]
+
+    def containing(self, query_terms):
+        """{passage index: how many of `query_terms` it contains}, for passages containing any."""
+        found = {}
+        for term in set(query_terms):
+            for i, _ in self._postings.get(term, ()):
+                found[i] = found.get(i, 0) + 1
+        return found
+
+    def size(self):
+        # Passage text plus roughly as much again for the postings.
+        return 2 * self.chars + 64 * len(self.passages)
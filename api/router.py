@@ -0,0 +1,80 @@
+"""
+Model routing: which Groq model answers each kind of call.
+
+Models are grouped in tiers, listed fastest first: by default `fast`, a
+small instant model, and `quality`, the large one. A route maps an
+endpoint, or an endpoint and summary style (`summary:brief`), to a tier;
+anything unlisted goes to the `default` route. A JSON answer from a tier
+that fails to parse or validate can be escalated: asked again of the next
+tier up.
+
+Configured without code edits:
+    MODEL_TIERS="fast=llama-3.1-8b-instant,quality=llama-3.3-70b-versatile"
+    MODEL_ROUTES="evaluate=fast,summary:brief=fast,chat=quality,default=quality"
+    MODEL_ESCALATE=on
+MODEL_ROUTES entries are merged over the defaults below; without a
+`default` route, unlisted calls go to the last (largest) tier.
+"""
+import os
+
+DEFAULT_TIERS = {
+    "fast":    "llama-3.1-8b-instant",
+    "quality": "llama-3.3-70b-versatile",
+}
+
+# Short, low-stakes outputs go to the fast tier.
+DEFAULT_ROUTES = {
+    "evaluate":      "fast",
+    "summary:brief": "fast",
+    "chat_summary":  "fast",
+    "default":       "quality",
+}
+
+
+class ModelRouter:
+    def __init__(self, tiers=None, routes=None, escalate=True):
+        self.tiers = dict(tiers or DEFAULT_TIERS)
+        self.routes = {name: tier for name, tier in DEFAULT_ROUTES.items() if tier in self.tiers}
+        self.routes.update(routes or {})
+        self.routes.setdefault("default", list(self.tiers)[-1])
+        self.escalate = escalate
+        unknown = set(self.routes.values()) - set(self.tiers)
+        if unknown:
+            raise ValueError(f"MODEL_ROUTES names unknown tiers: {', '.join(sorted(unknown))}")
+
+    def tier(self, endpoint, style=None):
+        """The tier for a call: its `endpoint:style` route, then its endpoint's, then the default."""
+        if style and f"{endpoint}:{style}" in self.routes:
+            return self.routes[f"{endpoint}:{style}"]
+        return self.routes.get(endpoint, self.routes["default"])
+
+    def model(self, tier):
+        return self.tiers[tier]
+
+    def next_tier(self, tier):
+        """The tier to escalate to from `tier`, or None."""
+        names = list(self.tiers)
+        i = names.index(tier)
+        return names[i + 1] if self.escalate and i + 1 < len(names) else None
+
+    def info(self):
+        return {"tiers": self.tiers, "routes": self.routes, "escalate": self.escalate}
+
+
+def _pairs(value):
+    pairs = {}
+    for item in value.split(","):
+        name, sep, target = item.partition("=")
+        if sep:
+            pairs[name.strip()] = target.strip()
+    return pairs
+
+
+def router_from_env():
+    """MODEL_TIERS, MODEL_ROUTES ("endpoint[:style]=tier,...") and MODEL_ESCALATE (default on)."""
+    tiers = _pairs(os.environ.get("MODEL_TIERS", "")) or None
+    return ModelRouter(
+        tiers=tiers,
+        routes=_pairs(os.environ.get("MODEL_ROUTES", "")),
+        escalate=os.environ.get("MODEL_ESCALATE", "on").lower() in ("1", "on", "true", "yes"),
+    )
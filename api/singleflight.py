@@ -0,0 +1,308 @@
+"""
+Single-flight: concurrent requests for the same completion share one Groq call.
+
+The first caller for a key leads and makes the call. Callers that arrive
+while it is in flight follow: they get the leader's result, or its
+exception, instead of repeating the call. Nothing is kept once the flight
+lands; repeats after that are the response cache's job.
+
+`do(key, fn)` shares a return value. `stream(key, fn)` shares a stream of
+text chunks: a background thread pulls them from `fn()` into a buffer that
+every follower replays from the start, so a follower that joins late still
+gets the whole text, and a client that disconnects does not cut the stream
+short for the others.
+
+With a `SQLiteFlights` store, flights are also shared across processes
+(gunicorn workers) using the same file. The leader claims the key with an
+INSERT. Followers in other processes poll the row and receive the whole
+text once the leader has finished (streams are not relayed chunk by chunk
+across processes). A leader that dies leaves its lease to expire, and the
+next caller takes over. A leader's exception reaches those followers as a
+FlightError naming its class and `retry_after`, which `revive` can turn back
+into the exception the leader raised.
+"""
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class FlightTimeout(TimeoutError):
+    pass
+
+
+class FlightError(RuntimeError):
+    """
+    The leading call failed in another process: carries its message, the
+    exception's class name as `kind`, and its `retry_after`, if it had one.
+    """
+
+    def __init__(self, message, kind=None, retry_after=None):
+        super().__init__(message)
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class _Flight:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._cond = threading.Condition()
+
+    def push(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def follow(self, timeout):
+        """Yields every chunk from the first; gives up after `timeout` seconds without one."""
+        i = 0
+        while True:
+            with self._cond:
+                if i == len(self.chunks) and not self.done:
+                    if not self._cond.wait_for(lambda: i < len(self.chunks) or self.done, timeout):
+                        raise FlightTimeout(f"no progress from the leading call in {timeout:.0f}s")
+                new, done, error = self.chunks[i:], self.done, self.error
+            i += len(new)
+            yield from new
+            if done and i == len(self.chunks):
+                if error is not None:
+                    raise error
+                return
+
+    def wait(self, timeout):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.done, timeout):
+                raise FlightTimeout(f"the leading call did not finish in {timeout:.0f}s")
+            if self.error is not None:
+                raise self.error
+            return "".join(self.chunks)
+
+
+class SingleFlight:
+    """
+    `revive(error)` maps a FlightError from a leader in another process to
+    the exception to raise instead (default: the FlightError itself).
+    """
+
+    def __init__(self, store=None, revive=None):
+        self.store = store
+        self.revive = revive
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counts = {"leaders": 0, "followers": 0, "timeouts": 0}
+
+    def _join(self, key):
+        """Returns (flight, True if this caller leads)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self.counts["leaders" if leader else "followers"] += 1
+            return flight, leader
+
+    def _land(self, key, flight, error=None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish(error)
+
+    def _timed_out(self):
+        with self._lock:
+            self.counts["timeouts"] += 1
+
+    def do(self, key, fn, timeout=60.0):
+        """fn() once per key at a time; followers wait up to `timeout` seconds for its result."""
+        flight, leader = self._join(key)
+        if not leader:
+            try:
+                return flight.wait(timeout)
+            except FlightTimeout:
+                self._timed_out()
+                raise
+        try:
+            value = self._lead(key, fn, timeout, stream=False)
+        except BaseException as e:
+            self._land(key, flight, e)
+            raise
+        flight.push(value)
+        self._land(key, flight)
+        return value
+
+    def stream(self, key, fn, timeout=60.0):
+        """
+        Chunks of fn() (a generator function), shared per key. Followers give
+        up after `timeout` seconds without a new chunk.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            # The pump runs in the leader's context, so per-request state
+            # (metrics timings) still applies to it.
+            context = contextvars.copy_context()
+            threading.Thread(target=context.run, args=(self._pump, key, flight, fn, timeout),
+                             name="singleflight", daemon=True).start()
+        try:
+            yield from flight.follow(timeout)
+        except FlightTimeout:
+            self._timed_out()
+            raise
+
+    def _pump(self, key, flight, fn, timeout):
+        try:
+            self._lead(key, fn, timeout, stream=True, on_chunk=flight.push)
+        except BaseException as e:
+            self._land(key, flight, e)
+        else:
+            self._land(key, flight)
+
+    def _lead(self, key, fn, timeout, stream, on_chunk=None):
+        """Runs fn here, or waits for the process that already runs it. Returns the text."""
+        if self.store is None:
+            return self._run(fn, stream, on_chunk)
+        deadline = time.monotonic() + timeout
+        while True:
+            token = self.store.claim(key, lease=timeout)
+            if token is not None:
+                try:
+                    value = self._run(fn, stream, on_chunk,
+                                      lambda: self.store.renew(key, token, lease=timeout))
+                except Exception as e:
+                    self.store.fail(key, token, e)
+                    raise
+                self.store.complete(key, token, value)
+                return value
+            try:
+                value = self.store.wait(key, deadline)
+            except FlightError as e:
+                revived = self.revive(e) if self.revive is not None else e
+                if revived is e:
+                    raise
+                raise revived from e
+            if value is not None:
+                if on_chunk is not None:
+                    on_chunk(value)
+                return value
+            # The other process's lease ran out: try to take over.
+
+    @staticmethod
+    def _run(fn, stream, on_chunk, renew=None):
+        if not stream:
+            return fn()
+        parts = []
+        renewed = time.monotonic()
+        for chunk in fn():
+            parts.append(chunk)
+            on_chunk(chunk)
+            if renew is not None and time.monotonic() - renewed > 1.0:
+                renew()
+                renewed = time.monotonic()
+        return "".join(parts)
+
+    def info(self):
+        with self._lock:
+            return {"backend": "sqlite" if self.store else "memory", "in_flight": len(self._flights),
+                    **self.counts}
+
+
+class SQLiteFlights:
+    """
+    Flight claims shared by every process using the same file. A finished
+    row lingers for `linger` seconds so polling followers can read it.
+    """
+
+    def __init__(self, path, linger=5.0, poll=0.05):
+        self.path = path
+        self.linger = linger
+        self.poll = poll
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS flights ("
+            " key TEXT PRIMARY KEY, token TEXT NOT NULL, lease_until REAL NOT NULL,"
+            " finished_at REAL, value TEXT, error TEXT)"
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key, lease):
+        """A token if this caller now leads the flight for `key`, else None."""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM flights WHERE finished_at <= ? OR (finished_at IS NULL AND lease_until <= ?)",
+                     (now - self.linger, now))
+        token = uuid.uuid4().hex
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO flights (key, token, lease_until) VALUES (?, ?, ?)",
+            (key, token, now + lease),
+        )
+        return token if cursor.rowcount == 1 else None
+
+    def renew(self, key, token, lease):
+        self._conn().execute("UPDATE flights SET lease_until = ? WHERE key = ? AND token = ?",
+                             (time.time() + lease, key, token))
+
+    def complete(self, key, token, value):
+        self._conn().execute("UPDATE flights SET value = ?, finished_at = ? WHERE key = ? AND token = ?",
+                             (value, time.time(), key, token))
+
+    def fail(self, key, token, error):
+        """Records `error` for the followers: its class name, message and retry_after."""
+        record = json.dumps({"kind": type(error).__name__, "message": f"{type(error).__name__}: {error}",
+                             "retry_after": getattr(error, "retry_after", None)})
+        self._conn().execute("UPDATE flights SET error = ?, finished_at = ? WHERE key = ? AND token = ?",
+                             (record, time.time(), key, token))
+
+    def wait(self, key, deadline):
+        """
+        The leader's text once it has finished. Raises FlightError if it
+        failed, FlightTimeout at `deadline` (time.monotonic()). Returns None
+        when the flight is gone without a result (its leader died).
+        """
+        conn = self._conn()
+        while True:
+            row = conn.execute(
+                "SELECT value, error, finished_at, lease_until FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (row[2] is None and row[3] <= time.time()):
+                return None
+            value, error, finished_at, _ = row
+            if finished_at is not None:
+                if error is not None:
+                    error = json.loads(error)
+                    raise FlightError(error["message"], error["kind"], error["retry_after"])
+                return value
+            if time.monotonic() >= deadline:
+                raise FlightTimeout("the leading call in another worker did not finish in time")
+            time.sleep(self.poll)
+
+
+def singleflight_from_env(revive=None):
+    """
+    COALESCE=memory (default: within a worker) | sqlite (across workers) | off
+    COALESCE_PATH: the sqlite file shared by the workers.
+    """
+    backend = os.environ.get("COALESCE", "memory").lower()
+    if backend in ("off", "none", "0", "false"):
+        return None
+    if backend == "sqlite":
+        path = os.environ.get("COALESCE_PATH", "/tmp/smartnotes-flights.sqlite3")
+        return SingleFlight(SQLiteFlights(path), revive=revive)
+    return SingleFlight()
@@ -0,0 +1,1072 @@
+// ─── STATE ───────────────────────────────────────────────
+let currentFlashcards = [];
+let currentFlashcardIndex = 0;
+let seenCards = new Set();
+let currentQuiz = [];
+let quizAnswers = {};
+let quizSubmitted = false;
+let selectedSummaryStyle = 'all';
+
+// ─── TAB SWITCHING ───────────────────────────────────────
+function switchTab(tab, btn) {
+  document.querySelectorAll('.tab-section').forEach(s => s.classList.remove('active'));
+  document.querySelectorAll('nav button').forEach(b => b.classList.remove('active'));
+  document.getElementById('tab-' + tab).classList.add('active');
+  if (btn) btn.classList.add('active');
+}
+
+// ─── LOADING STATE ───────────────────────────────────────
+function setLoading(btnId, loading) {
+  const btn = document.getElementById(btnId);
+  btn.disabled = loading;
+  if (loading) btn.classList.add('loading');
+  else btn.classList.remove('loading');
+}
+
+function showError(elId, msg) {
+  const el = document.getElementById(elId);
+  el.textContent = '⚠ ' + msg;
+  el.classList.add('show');
+  setTimeout(() => el.classList.remove('show'), 8000);
+}
+
+// ─── NOTES UPLOAD ────────────────────────────────────────
+// Long notes are uploaded once to /api/notes and referenced by id afterwards,
+// so re-running a feature on the same notes doesn't resend the whole text.
+const NOTES_UPLOAD_MIN_CHARS = 4000;
+const uploadedNotes = new Map();
+
+async function postNotes(url, notes, extra) {
+  const body = Object.assign({}, extra || {});
+  const key = (body.syllabus || '') + '\u0000' + notes;
+  if (notes.length >= NOTES_UPLOAD_MIN_CHARS) {
+    try {
+      if (!uploadedNotes.has(key)) {
+        const up = await fetch('/api/notes', {
+          method: 'POST', headers: {'Content-Type': 'application/json'},
+          body: JSON.stringify({ notes, syllabus: body.syllabus || '' })
+        });
+        if (up.ok) uploadedNotes.set(key, (await up.json()).notes_id);
+      }
+      if (uploadedNotes.has(key)) {
+        const res = await fetch(url, {
+          method: 'POST', headers: {'Content-Type': 'application/json'},
+          body: JSON.stringify(Object.assign({ notes_id: uploadedNotes.get(key) }, body))
+        });
+        if (res.status !== 404) return res;
+        uploadedNotes.delete(key);  // expired on the server — fall back to sending the text
+      }
+    } catch (e) { /* fall through to a plain request */ }
+  }
+  return fetch(url, {
+    method: 'POST', headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify(Object.assign({ notes }, body))
+  });
+}
+
+// ─── ANALYZE ─────────────────────────────────────────────
+async function analyzeNotes() {
+  const notes = document.getElementById('notes-input').value.trim();
+  const syllabus = document.getElementById('syllabus-input').value.trim();
+  if (!notes) { showError('analyze-error', 'Please paste your study notes first.'); return; }
+  setLoading('analyze-btn', true);
+  document.getElementById('analyze-results').innerHTML = '';
+  document.getElementById('analyze-error').classList.remove('show');
+  try {
+    const res = await postNotes('/api/analyze', notes, { syllabus });
+    const data = await res.json();
+    if (data.error) throw new Error(data.error);
+    renderAnalysis(data);
+  } catch(e) {
+    showError('analyze-error', e.message || 'Analysis failed. Please try again.');
+  } finally {
+    setLoading('analyze-btn', false);
+  }
+}
+
+function clearAnalysis() {
+  document.getElementById('notes-input').value = '';
+  document.getElementById('syllabus-input').value = '';
+  document.getElementById('analyze-results').innerHTML = '';
+}
+
+function renderAnalysis(d) {
+  const statusIcon = { complete: '✓', partial: '◑', missing: '✗' };
+  const statusClass = { complete: 'complete', partial: 'partial', missing: 'missing' };
+  const topicsHTML = (d.topics_covered || []).map(t => `
+    <div class="topic-card">
+      <div class="topic-icon ${statusClass[t.status]}">${statusIcon[t.status]}</div>
+      <div>
+        <div class="topic-name">${t.topic}</div>
+        <div class="topic-note">${t.explanation}</div>
+        ${(t.evidence || []).length ? `<div class="topic-note topic-evidence">“${t.evidence[0]}”</div>` : ''}
+      </div>
+    </div>
+  `).join('');
+  const listItems = arr => (arr || []).map(s => `<li>${s}</li>`).join('');
+  document.getElementById('analyze-results').innerHTML = `
+    <div class="section-heading">Score Overview</div>
+    <div class="score-grid">
+      <div class="score-big">
+        <div class="num">${d.overall_score}<span style="font-size:1.5rem">/100</span></div>
+        <div class="lbl">Overall Score</div>
+      </div>
+      <div class="score-card">
+        <div class="metric-label">Completeness</div>
+        <div class="metric-val" style="color:var(--accent)">${d.completeness}%</div>
+        <div class="progress-bar"><div class="progress-fill" style="width:${d.completeness}%"></div></div>
+      </div>
+      <div class="score-card">
+        <div class="metric-label">Clarity</div>
+        <div class="metric-val" style="color:var(--accent2)">${d.clarity}%</div>
+        <div class="progress-bar"><div class="progress-fill" style="width:${d.clarity}%;background:var(--accent2)"></div></div>
+      </div>
+      <div class="score-card">
+        <div class="metric-label">Structure</div>
+        <div class="metric-val" style="color:var(--green)">${d.structure}%</div>
+        <div class="progress-bar"><div class="progress-fill" style="width:${d.structure}%;background:var(--green)"></div></div>
+      </div>
+    </div>
+    <div class="section-heading">Topic Coverage</div>
+    <div class="topics-grid">${topicsHTML}</div>
+    <div class="section-heading">Feedback</div>
+    <div class="insights-grid">
+      <div class="insight-panel strengths"><h4>✓ Strengths</h4><ul>${listItems(d.strengths)}</ul></div>
+      <div class="insight-panel weaknesses"><h4>✗ Weaknesses</h4><ul>${listItems(d.weaknesses)}</ul></div>
+      <div class="insight-panel suggestions"><h4>→ Improvements</h4><ul>${listItems(d.improvement_suggestions)}</ul></div>
+    </div>
+    <div class="section-heading">Summary</div>
+    <div class="summary-box">${d.summary}</div>
+  `;
+}
+
+// ─── FLASHCARDS ───────────────────────────────────────────
+async function generateFlashcards() {
+  const notes = document.getElementById('fc-notes-input').value.trim();
+  if (!notes) { showError('fc-error', 'Please paste your study notes first.'); return; }
+  setLoading('fc-btn', true);
+  document.getElementById('fc-results').innerHTML = '';
+  document.getElementById('fc-error').classList.remove('show');
+  try {
+    const res = await postNotes('/api/flashcards', notes);
+    const data = await res.json();
+    if (data.error) throw new Error(data.error);
+    if (!Array.isArray(data)) throw new Error('Invalid flashcard data');
+    currentFlashcards = data;
+    currentFlashcardIndex = 0;
+    seenCards = new Set();
+    renderFlashcardUI();
+  } catch(e) {
+    showError('fc-error', e.message || 'Flashcard generation failed.');
+  } finally {
+    setLoading('fc-btn', false);
+  }
+}
+
+function renderFlashcardUI() {
+  if (!currentFlashcards.length) return;
+  document.getElementById('fc-results').innerHTML = `
+    <div class="section-heading">Your Flashcards</div>
+    <div class="flashcard-controls">
+      <span class="fc-counter" id="fc-counter">1 / ${currentFlashcards.length}</span>
+      <div class="fc-progress"><div class="fc-progress-fill" id="fc-progress" style="width:${100/currentFlashcards.length}%"></div></div>
+    </div>
+    <div class="flashcard-scene" onclick="flipCard()">
+      <div class="flashcard-inner" id="fc-inner">
+        <div class="fc-face fc-front">
+          <div class="fc-label">Question</div>
+          <div class="fc-text" id="fc-front-text"></div>
+          <div class="fc-meta"><span class="diff-badge" id="fc-diff-badge"></span></div>
+        </div>
+        <div class="fc-face fc-back">
+          <div class="fc-label">Answer</div>
+          <div class="fc-text" id="fc-back-text"></div>
+          <div class="fc-meta"><span style="font-size:0.7rem;color:var(--muted)" id="fc-topic-label"></span></div>
+        </div>
+      </div>
+    </div>
+    <p class="fc-hint">Click card to flip · Use arrows to navigate</p>
+    <div class="fc-nav">
+      <button class="btn btn-secondary" onclick="prevCard()" style="padding:0.6rem 1.25rem">← Prev</button>
+      <div class="fc-dots" id="fc-dots"></div>
+      <button class="btn btn-primary" onclick="nextCard()" style="padding:0.6rem 1.25rem">Next →</button>
+    </div>
+  `;
+  updateFlashcard();
+}
+
+function updateFlashcard() {
+  const card = currentFlashcards[currentFlashcardIndex];
+  if (!card) return;
+  document.getElementById('fc-inner').classList.remove('flipped');
+  document.getElementById('fc-front-text').textContent = card.front;
+  document.getElementById('fc-back-text').textContent = card.back;
+  document.getElementById('fc-diff-badge').textContent = card.difficulty || 'medium';
+  document.getElementById('fc-diff-badge').className = `diff-badge ${card.difficulty || 'medium'}`;
+  document.getElementById('fc-topic-label').textContent = card.topic || '';
+  const total = currentFlashcards.length;
+  const idx = currentFlashcardIndex;
+  document.getElementById('fc-counter').textContent = `${idx+1} / ${total}`;
+  document.getElementById('fc-progress').style.width = `${((idx+1)/total)*100}%`;
+  let dots = '';
+  for (let i = 0; i < total; i++) {
+    const cls = i === idx ? 'active' : seenCards.has(i) ? 'seen' : '';
+    dots += `<button class="fc-dot ${cls}" onclick="goToCard(${i})"></button>`;
+  }
+  document.getElementById('fc-dots').innerHTML = dots;
+}
+
+function flipCard() {
+  const inner = document.getElementById('fc-inner');
+  if (!inner) return;
+  const isFlipped = inner.classList.contains('flipped');
+  seenCards.add(currentFlashcardIndex);
+  const total = currentFlashcards.length;
+  const idx = currentFlashcardIndex;
+  const counter = document.getElementById('fc-counter');
+  if (counter) counter.textContent = `${idx+1} / ${total}`;
+  let dots = '';
+  for (let i = 0; i < total; i++) {
+    const cls = i === idx ? 'active' : seenCards.has(i) ? 'seen' : '';
+    dots += `<button class="fc-dot ${cls}" onclick="goToCard(${i})"></button>`;
+  }
+  const dotsEl = document.getElementById('fc-dots');
+  if (dotsEl) dotsEl.innerHTML = dots;
+  inner.classList.toggle('flipped', !isFlipped);
+}
+
+function nextCard() {
+  seenCards.add(currentFlashcardIndex);
+  currentFlashcardIndex = (currentFlashcardIndex + 1) % currentFlashcards.length;
+  document.getElementById('fc-inner').classList.remove('flipped');
+  setTimeout(updateFlashcard, 50);
+}
+
+function prevCard() {
+  currentFlashcardIndex = (currentFlashcardIndex - 1 + currentFlashcards.length) % currentFlashcards.length;
+  document.getElementById('fc-inner').classList.remove('flipped');
+  setTimeout(updateFlashcard, 50);
+}
+
+function goToCard(i) {
+  seenCards.add(currentFlashcardIndex);
+  currentFlashcardIndex = i;
+  document.getElementById('fc-inner').classList.remove('flipped');
+  setTimeout(updateFlashcard, 50);
+}
+
+// ─── QUIZ ──────────────────────────────────────────────────
+async function generateQuiz() {
+  const notes = document.getElementById('quiz-notes-input').value.trim();
+  if (!notes) { showError('quiz-error', 'Please paste your study notes first.'); return; }
+  setLoading('quiz-gen-btn', true);
+  document.getElementById('quiz-area').innerHTML = '';
+  document.getElementById('quiz-error').classList.remove('show');
+  try {
+    const res = await postNotes('/api/quiz', notes);
+    const data = await res.json();
+    if (data.error) throw new Error(data.error);
+    if (!Array.isArray(data)) throw new Error('Invalid quiz data');
+    currentQuiz = data;
+    quizAnswers = {};
+    quizSubmitted = false;
+    renderQuiz();
+  } catch(e) {
+    showError('quiz-error', e.message || 'Quiz generation failed.');
+  } finally {
+    setLoading('quiz-gen-btn', false);
+  }
+}
+
+function renderQuiz() {
+  let html = '<div class="section-heading">Your Quiz</div>';
+  currentQuiz.forEach((q, i) => {
+    const qId = String(q.id);
+    const diffClass = q.difficulty || 'medium';
+    const letters = ['A','B','C','D'];
+    let optionsHTML = '';
+    if (q.options && typeof q.options === 'object' && !Array.isArray(q.options)) {
+      optionsHTML = letters.map(l => `
+        <button class="q-option" onclick="selectAnswer(${qId}, '${l}')" id="opt-${qId}-${l}">
+          <span class="q-option-letter">${l}</span>
+          <span>${q.options[l] || ''}</span>
+        </button>
+      `).join('');
+    } else {
+      optionsHTML = (q.options || []).map((opt, j) => `
+        <button class="q-option" onclick="selectAnswer(${qId}, '${letters[j]}')" id="opt-${qId}-${letters[j]}">
+          <span class="q-option-letter">${letters[j]}</span>
+          <span>${opt}</span>
+        </button>
+      `).join('');
+    }
+    html += `
+      <div class="quiz-question-card" id="qcard-${qId}">
+        <div class="q-header">
+          <span class="q-num">Question ${i+1} of ${currentQuiz.length}</span>
+          <div style="display:flex;gap:0.5rem;align-items:center">
+            <span class="diff-badge ${diffClass}">${diffClass}</span>
+            <span class="q-topic-badge">${q.topic || ''}</span>
+          </div>
+        </div>
+        <div class="q-text">${q.question}</div>
+        <div class="q-options">${optionsHTML}</div>
+        <div class="q-explanation" id="exp-${qId}">${q.explanation || ''}</div>
+      </div>
+    `;
+  });
+  html += `
+    <div class="btn-row" style="margin-top:1.5rem">
+      <button class="btn btn-primary" id="submit-quiz-btn" onclick="submitQuiz()">
+        <div class="spinner"></div>
+        <span class="btn-text">📊 Submit & Get Results</span>
+      </button>
+      <span id="answer-count" style="font-size:0.85rem;color:var(--muted)">0 / ${currentQuiz.length} answered</span>
+    </div>
+    <div id="quiz-results"></div>
+  `;
+  document.getElementById('quiz-area').innerHTML = html;
+}
+
+function selectAnswer(questionId, letter) {
+  if (quizSubmitted) return;
+  quizAnswers[questionId] = letter;
+  ['A','B','C','D'].forEach(l => {
+    const el = document.getElementById(`opt-${questionId}-${l}`);
+    if (el) el.classList.remove('selected');
+  });
+  const selected = document.getElementById(`opt-${questionId}-${letter}`);
+  if (selected) selected.classList.add('selected');
+  const count = Object.keys(quizAnswers).length;
+  const counter = document.getElementById('answer-count');
+  if (counter) counter.textContent = `${count} / ${currentQuiz.length} answered`;
+}
+
+async function submitQuiz() {
+  if (Object.keys(quizAnswers).length < currentQuiz.length) {
+    const unanswered = currentQuiz.length - Object.keys(quizAnswers).length;
+    if (!confirm(`You have ${unanswered} unanswered question(s). Submit anyway?`)) return;
+  }
+  quizSubmitted = true;
+  const btn = document.getElementById('submit-quiz-btn');
+  btn.disabled = true;
+  btn.classList.add('loading');
+  try {
+    // The graded result arrives at once with local feedback; the AI's
+    // feedback replaces it when it is ready.
+    const res = await fetch('/api/evaluate-quiz', {
+      method: 'POST', headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({ questions: currentQuiz, answers: quizAnswers, stream: true })
+    });
+    let graded = null;
+    const data = await readSSE(res, (event, payload) => {
+      if (event === 'result') {
+        graded = payload;
+        revealAnswers(graded.results);
+        renderQuizResults(graded);
+        btn.classList.remove('loading');
+      } else if (event === 'feedback' && graded) {
+        renderQuizResults({ ...graded, ai_feedback: payload.ai_feedback }, false);
+      }
+    });
+    if (data) {
+      if (data.error) throw new Error(data.error);
+      revealAnswers(data.results);
+      renderQuizResults(data);
+    }
+  } catch(e) {
+    alert('Evaluation failed: ' + e.message);
+    quizSubmitted = false;
+  } finally {
+    btn.classList.remove('loading');
+  }
+}
+
+function revealAnswers(results) {
+  results.forEach(r => {
+    ['A','B','C','D'].forEach(l => {
+      const el = document.getElementById(`opt-${r.id}-${l}`);
+      if (!el) return;
+      el.disabled = true;
+      el.classList.remove('selected');
+      if (l === r.correct_answer) el.classList.add('reveal-correct');
+    });
+    const userAnswer = r.user_answer ? r.user_answer.toString().toUpperCase() : '';
+    if (!r.is_correct && userAnswer) {
+      const wrongEl = document.getElementById(`opt-${r.id}-${userAnswer}`);
+      if (wrongEl) { wrongEl.classList.remove('reveal-correct'); wrongEl.classList.add('incorrect'); }
+    }
+    const expEl = document.getElementById(`exp-${r.id}`);
+    if (expEl) expEl.classList.add('show');
+  });
+}
+
+function renderQuizResults(data, scroll = true) {
+  const fb = data.ai_feedback || {};
+  const perfClass = fb.performance_level || 'good';
+  const perfLabels = {
+    excellent: '🏆 Excellent Performance',
+    good: '👍 Good Performance',
+    needs_improvement: '📚 Needs Improvement',
+    critical: '⚠ Needs Urgent Attention'
+  };
+  const weakChips = (data.weak_topics || []).map(t => `<span class="topic-chip weak">${t}</span>`).join('');
+  const strongChips = (data.strong_topics || []).map(t => `<span class="topic-chip strong">${t}</span>`).join('');
+  const recoHTML = (fb.recommendations || []).map(r => `<li>${r}</li>`).join('');
+  const stepsHTML = (fb.next_steps || []).map(s => `<li>${s}</li>`).join('');
+  document.getElementById('quiz-results').innerHTML = `
+    <div style="margin-top:2.5rem">
+      <div class="section-heading">Your Results</div>
+      <div class="quiz-result-banner">
+        <div class="performance-chip ${perfClass}">${perfLabels[perfClass] || 'Result'}</div>
+        <div class="result-score">${data.percentage}%</div>
+        <div class="result-label">${data.score} out of ${data.total} correct</div>
+        <div class="result-message">${fb.message || ''}</div>
+      </div>
+      ${weakChips || strongChips ? `
+      <div class="section-heading">Topic Breakdown</div>
+      <div style="margin-bottom:1.5rem">
+        ${weakChips ? `<div style="margin-bottom:0.75rem"><strong style="font-size:0.75rem;text-transform:uppercase;letter-spacing:0.08em;color:var(--red)">Needs Review: </strong>${weakChips}</div>` : ''}
+        ${strongChips ? `<div><strong style="font-size:0.75rem;text-transform:uppercase;letter-spacing:0.08em;color:var(--green)">Strong Topics: </strong>${strongChips}</div>` : ''}
+      </div>` : ''}
+      <div class="section-heading">Personalized Recommendations</div>
+      <div class="reco-cards">
+        <div class="reco-card"><h4>→ Study Recommendations</h4><ul>${recoHTML}</ul></div>
+        <div class="reco-card">
+          <h4>✓ Next Steps</h4>
+          <ul>${stepsHTML}</ul>
+          ${fb.study_plan ? `<p style="margin-top:0.85rem;font-size:0.83rem;line-height:1.5;color:var(--muted);border-top:1px solid var(--border);padding-top:0.85rem">${fb.study_plan}</p>` : ''}
+        </div>
+      </div>
+      <div class="btn-row">
+        <button class="btn btn-primary" onclick="generateQuiz()">↺ Retake Quiz</button>
+        <button class="btn btn-secondary" onclick="switchTabDirect('flashcards')">⚡ Review Flashcards</button>
+      </div>
+    </div>
+  `;
+  if (scroll) document.getElementById('quiz-results').scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function switchTabDirect(tab) {
+  document.querySelectorAll('.tab-section').forEach(s => s.classList.remove('active'));
+  document.querySelectorAll('nav button').forEach(b => b.classList.remove('active'));
+  document.getElementById('tab-' + tab).classList.add('active');
+  const tabMap = { analyze: 0, flashcards: 1, quiz: 2, summary: 3 };
+  const btns = document.querySelectorAll('nav button');
+  if (btns[tabMap[tab]]) btns[tabMap[tab]].classList.add('active');
+}
+
+// ─── KEYBOARD NAVIGATION ─────────────────────────────────
+document.addEventListener('keydown', e => {
+  if (!document.getElementById('tab-flashcards').classList.contains('active')) return;
+  if (!currentFlashcards.length) return;
+  if (e.key === 'ArrowRight') nextCard();
+  if (e.key === 'ArrowLeft') prevCard();
+  if (e.key === ' ') { e.preventDefault(); flipCard(); }
+});
+
+// ─── SUMMARY ──────────────────────────────────────────────
+
+function selectStyle(btn) {
+  document.querySelectorAll('.style-chip').forEach(c => c.classList.remove('active'));
+  btn.classList.add('active');
+  selectedSummaryStyle = btn.dataset.style;
+}
+
+// Reads a text/event-stream response body, calling onEvent(name, data) per event.
+// Non-streaming (JSON) responses — e.g. validation errors — are returned as-is.
+async function readSSE(res, onEvent) {
+  if (!(res.headers.get('Content-Type') || '').startsWith('text/event-stream')) {
+    return res.json();
+  }
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let sep;
+    while ((sep = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      let event = 'message', data = '';
+      raw.split('\n').forEach(line => {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      });
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
+  return null;
+}
+
+async function generateSummary() {
+  const notes = document.getElementById('sum-notes-input').value.trim();
+  if (!notes) { showError('sum-error', 'Please paste your study notes first.'); return; }
+
+  setLoading('sum-btn', true);
+  document.getElementById('sum-results').innerHTML = '';
+  document.getElementById('sum-error').classList.remove('show');
+
+  try {
+    const res = await postNotes('/api/summarize', notes, { style: selectedSummaryStyle, stream: true });
+    const partial = { style: selectedSummaryStyle };
+    let streamError = null;
+    const data = await readSSE(res, (event, payload) => {
+      if (event === 'field') { partial[payload.key] = payload.value; renderSummary(partial); }
+      else if (event === 'done') renderSummary(payload);
+      else if (event === 'error') streamError = payload.error;
+    });
+    if (streamError) throw new Error(streamError);
+    if (data) {
+      if (data.error) throw new Error(data.error);
+      renderSummary(data);
+    }
+  } catch(e) {
+    showError('sum-error', e.message || 'Summary generation failed. Please try again.');
+  } finally {
+    setLoading('sum-btn', false);
+  }
+}
+
+function clearSummary() {
+  document.getElementById('sum-notes-input').value = '';
+  document.getElementById('sum-results').innerHTML = '';
+}
+
+function renderSummary(d) {
+  const style = d.style || 'all';
+  let html = '';
+
+  // ── Header card ──
+  html += `
+    <div class="summary-header-card">
+      <div class="summary-title">${d.title || 'Summary'}</div>
+      <div class="summary-meta">
+        ${d.subject_area ? `<span class="summary-meta-chip">${d.subject_area}</span>` : ''}
+        ${d.word_count_estimate ? `<span class="summary-meta-chip words">~${d.word_count_estimate} words</span>` : ''}
+        <span class="summary-meta-chip" style="background:rgba(34,211,238,0.1);border-color:rgba(34,211,238,0.3);color:var(--cyan)">${style === 'all' ? 'Full Report' : style.charAt(0).toUpperCase() + style.slice(1)}</span>
+      </div>
+    </div>
+  `;
+
+  // ── View Tabs (only for 'all' style) ──
+  if (style === 'all') {
+    html += `
+      <div class="view-tabs">
+        <button class="view-tab active" onclick="showSumView('brief', this)">⚡ Brief</button>
+        <button class="view-tab" onclick="showSumView('detailed', this)">📖 Detailed</button>
+        <button class="view-tab" onclick="showSumView('bullets', this)">• Bullets</button>
+        <button class="view-tab" onclick="showSumView('mindmap', this)">🗺 Mind Map</button>
+        <button class="view-tab" onclick="showSumView('extras', this)">✦ Extras</button>
+      </div>
+    `;
+  }
+
+  // ── Brief Summary ──
+  if (d.brief_summary && (style === 'all' || style === 'brief')) {
+    html += `
+      <div id="sum-view-brief" class="sum-view ${style !== 'all' ? '' : ''}">
+        <div class="section-heading">TL;DR — The Short Version</div>
+        <div class="brief-box">${d.brief_summary}</div>
+      </div>
+    `;
+  }
+
+  // ── Detailed Summary ──
+  if (d.detailed_summary && (style === 'all' || style === 'detailed')) {
+    html += `
+      <div id="sum-view-detailed" class="sum-view" ${style === 'all' ? 'style="display:none"' : ''}>
+        <div class="section-heading">Detailed Breakdown</div>
+        <div class="detailed-box">${d.detailed_summary}</div>
+        ${d.connections && d.connections.length ? `
+          <div class="section-heading">Key Connections</div>
+          <div class="connections-list">${(d.connections || []).map(c => `<div class="connection-item">${c}</div>`).join('')}</div>
+        ` : ''}
+      </div>
+    `;
+  }
+
+  // ── Bullet Summary ──
+  if (d.bullet_summary && (style === 'all' || style === 'bullet')) {
+    const bullets = d.bullet_summary;
+    html += `
+      <div id="sum-view-bullets" class="sum-view" ${style === 'all' ? 'style="display:none"' : ''}>
+        <div class="section-heading">Key Points — Quick Reference</div>
+        <ul class="bullet-list">
+          ${bullets.map((b, i) => `
+            <li>
+              <span class="bullet-num">${i+1}</span>
+              <span>${b}</span>
+            </li>
+          `).join('')}
+        </ul>
+        ${d.key_definitions && d.key_definitions.length ? `
+          <div class="section-heading">Key Definitions</div>
+          <div class="definitions-grid">
+            ${d.key_definitions.map(def => `
+              <div class="def-card">
+                <div class="def-term">${def.term}</div>
+                <div class="def-text">${def.definition}</div>
+              </div>
+            `).join('')}
+          </div>
+        ` : ''}
+      </div>
+    `;
+  }
+
+  // ── Mind Map ──
+  if (d.mindmap && (style === 'all' || style === 'mindmap')) {
+    const mm = d.mindmap;
+    const branchesHTML = (mm.branches || []).map(b => `
+      <div class="mindmap-branch">
+        <div class="branch-title">${b.topic}</div>
+        <ul class="branch-subtopics">
+          ${(b.subtopics || []).map(s => `<li>${s}</li>`).join('')}
+        </ul>
+      </div>
+    `).join('');
+    html += `
+      <div id="sum-view-mindmap" class="sum-view" ${style === 'all' ? 'style="display:none"' : ''}>
+        <div class="section-heading">Mind Map — Visual Overview</div>
+        <div class="mindmap-container">
+          <div class="mindmap-root">${mm.root || d.title || 'Core Topic'}</div>
+          <div class="mindmap-branches">${branchesHTML}</div>
+        </div>
+      </div>
+    `;
+  }
+
+  // ── Extras (dates, gaps, tips) ── only shown in 'all' mode
+  if (style === 'all') {
+    const hasDates = d.important_dates_or_numbers && d.important_dates_or_numbers.length;
+    const hasGaps  = d.gaps && d.gaps.length;
+    const hasTips  = d.revision_tips && d.revision_tips.length;
+
+    html += `<div id="sum-view-extras" class="sum-view" style="display:none">`;
+
+    if (d.key_definitions && d.key_definitions.length) {
+      html += `
+        <div class="section-heading">Key Definitions</div>
+        <div class="definitions-grid">
+          ${d.key_definitions.map(def => `
+            <div class="def-card">
+              <div class="def-term">${def.term}</div>
+              <div class="def-text">${def.definition}</div>
+            </div>
+          `).join('')}
+        </div>
+      `;
+    }
+
+    if (hasDates) {
+      html += `
+        <div class="section-heading">Important Dates & Numbers</div>
+        <div class="dates-grid">
+          ${d.important_dates_or_numbers.map(item => `
+            <div class="date-pill">
+              <span class="date-val">${item.value}</span>
+              <span class="date-ctx">${item.context}</span>
+            </div>
+          `).join('')}
+        </div>
+      `;
+    }
+
+    if (hasGaps) {
+      html += `
+        <div class="section-heading">Gaps in Your Notes</div>
+        <div class="gaps-list">
+          ${d.gaps.map(g => `<div class="gap-item">${g}</div>`).join('')}
+        </div>
+      `;
+    }
+
+    if (hasTips) {
+      html += `
+        <div class="section-heading">Revision Tips</div>
+        <div class="tips-list">
+          ${d.revision_tips.map(t => `<div class="tip-card">${t}</div>`).join('')}
+        </div>
+      `;
+    }
+
+    html += `</div>`;
+  }
+
+  // ── Action buttons ──
+  html += `
+    <div class="btn-row" style="margin-top:2rem">
+      <button class="btn btn-secondary" onclick="switchTabDirect('flashcards')">⚡ Make Flashcards</button>
+      <button class="btn btn-secondary" onclick="switchTabDirect('quiz')">🎯 Take a Quiz</button>
+    </div>
+  `;
+
+  document.getElementById('sum-results').innerHTML = html;
+  document.getElementById('sum-results').scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function showSumView(view, btn) {
+  // Hide all views
+  document.querySelectorAll('.sum-view').forEach(v => v.style.display = 'none');
+  // Deactivate all tabs
+  document.querySelectorAll('.view-tab').forEach(t => t.classList.remove('active'));
+  // Show selected view
+  const el = document.getElementById('sum-view-' + view);
+  if (el) el.style.display = 'block';
+  btn.classList.add('active');
+}
+
+// ─── FILE UPLOAD ──────────────────────────────────────────────
+function toggleUpload(key) {
+  const area = document.getElementById(key + '-upload-area');
+  const btn  = document.getElementById(key + '-upload-toggle');
+  const isOpen = area.classList.contains('show');
+  area.classList.toggle('show', !isOpen);
+  btn.classList.toggle('active', !isOpen);
+}
+function handleDragOver(e, key) {
+  e.preventDefault();
+  document.getElementById(key + '-drop-zone').classList.add('drag-over');
+}
+function handleDragLeave(key) {
+  document.getElementById(key + '-drop-zone').classList.remove('drag-over');
+}
+function handleDrop(e, key) {
+  e.preventDefault();
+  document.getElementById(key + '-drop-zone').classList.remove('drag-over');
+  const file = e.dataTransfer.files[0];
+  if (file) processFile(file, key);
+}
+function handleFileSelect(e, key) {
+  const file = e.target.files[0];
+  if (file) processFile(file, key);
+}
+function processFile(file, key) {
+  const ext = file.name.split('.').pop().toLowerCase();
+  if (!['txt','md','pdf','docx','doc','rtf'].includes(ext)) {
+    alert('Unsupported file type. Please use .txt, .md, .pdf, .docx, or .rtf'); return;
+  }
+  showFileBadge(key, file.name);
+  if (ext === 'pdf') readPDF(file, key);
+  else if (ext === 'docx') readDOCX(file, key);
+  else {
+    const reader = new FileReader();
+    reader.onload = e => {
+      let text = e.target.result;
+      if (ext === 'rtf') text = text.replace(/\\[a-z]+\d*\s?|\{|\}/g, '').replace(/\\\n/g, '\n').trim();
+      setTextarea(key, text);
+    };
+    reader.readAsText(file);
+  }
+}
+function readPDF(file, key) {
+  if (!window.pdfjsLib) {
+    const s = document.createElement('script');
+    s.src = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.min.js';
+    s.onload = () => { window.pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.worker.min.js'; extractPDF(file, key); };
+    document.head.appendChild(s);
+  } else extractPDF(file, key);
+}
+async function extractPDF(file, key) {
+  try {
+    const pdf = await pdfjsLib.getDocument({ data: await file.arrayBuffer() }).promise;
+    let t = '';
+    for (let i = 1; i <= pdf.numPages; i++) {
+      const page = await pdf.getPage(i);
+      const content = await page.getTextContent();
+      t += content.items.map(s => s.str).join(' ') + '\n\n';
+    }
+    setTextarea(key, t.trim());
+  } catch (e) { alert('Could not extract text from PDF. Try copy-pasting manually.'); }
+}
+function readDOCX(file, key) {
+  if (!window.mammoth) {
+    const s = document.createElement('script');
+    s.src = 'https://cdnjs.cloudflare.com/ajax/libs/mammoth/1.6.0/mammoth.browser.min.js';
+    s.onload = () => extractDOCX(file, key);
+    document.head.appendChild(s);
+  } else extractDOCX(file, key);
+}
+async function extractDOCX(file, key) {
+  try {
+    const result = await mammoth.extractRawText({ arrayBuffer: await file.arrayBuffer() });
+    setTextarea(key, result.value.trim());
+  } catch (e) { alert('Could not read .docx file. Try saving as .txt.'); }
+}
+function setTextarea(key, text) {
+  const idMap = {
+    'notes': 'notes-input',
+    'syllabus': 'syllabus-input',
+    'fc-notes': 'fc-notes-input',
+    'quiz-notes': 'quiz-notes-input',
+    'sum-notes': 'sum-notes-input'
+  };
+  const id = idMap[key];
+  const ta = document.getElementById(id);
+  if (ta) { ta.value = text; ta.dispatchEvent(new Event('input')); }
+  const area = document.getElementById(key + '-upload-area');
+  if (area) area.classList.remove('show');
+  const btn = document.getElementById(key + '-upload-toggle');
+  if (btn) { btn.classList.remove('active'); btn.textContent = '✅ File Loaded'; }
+}
+function showFileBadge(key, fileName) {
+  const badge = document.getElementById(key + '-file-badge');
+  if (!badge) return;
+  badge.style.display = 'block';
+  badge.innerHTML = `<span class="upload-file-name">📄 ${fileName} <button class="upload-remove" onclick="clearFile('${key}')">✕</button></span>`;
+}
+function clearFile(key) {
+  const idMap = {
+    'notes': 'notes-input',
+    'syllabus': 'syllabus-input',
+    'fc-notes': 'fc-notes-input',
+    'quiz-notes': 'quiz-notes-input',
+    'sum-notes': 'sum-notes-input'
+  };
+  const id = idMap[key];
+  const ta = document.getElementById(id); if (ta) ta.value = '';
+  const badge = document.getElementById(key + '-file-badge'); if (badge) badge.style.display = 'none';
+  const inp = document.getElementById(key + '-file-input'); if (inp) inp.value = '';
+  const btn = document.getElementById(key + '-upload-toggle'); if (btn) btn.textContent = '📎 Upload File';
+}
+
+
+// ─── AI ASSISTANT ──────────────────────────────────────────────────
+let aiOpen = false;
+let aiChatHistory = [];
+let aiConversationId = newConversationId();
+
+function newConversationId() {
+  return (window.crypto && crypto.randomUUID) ? crypto.randomUUID()
+    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+let aiTyping = false;
+
+const defaultSuggestions = [
+  'Explain this topic in simple terms',
+  'What are the most important concepts I should know?',
+  'Give me a 3-point summary of these notes',
+];
+
+const noteSuggestions = [
+  'What parts of my notes are incomplete?',
+  'Can you create a quick study checklist from this?',
+  'What connections exist between these topics?',
+  'Quiz me on the key concepts from my notes',
+  'What should I focus on for an exam?',
+];
+
+function toggleAI() {
+  aiOpen = !aiOpen;
+  const panel   = document.getElementById('ai-panel');
+  const overlay = document.getElementById('ai-overlay');
+  const fab     = document.getElementById('ai-fab');
+  panel.classList.toggle('open', aiOpen);
+  overlay.classList.toggle('show', aiOpen);
+  fab.classList.toggle('open', aiOpen);
+  if (aiOpen) {
+    updateAIContext();
+    setTimeout(function(){ document.getElementById('ai-input').focus(); }, 350);
+  }
+}
+
+function updateAIContext() {
+  var activeTab = document.querySelector('.tab-section.active');
+  var notes = '';
+  var label = '';
+  if (activeTab) {
+    var id = activeTab.id;
+    if (id === 'tab-analyze')    { notes = document.getElementById('notes-input').value.trim();      label = 'Analyze Notes'; }
+    if (id === 'tab-flashcards') { notes = document.getElementById('fc-notes-input').value.trim();   label = 'Flashcard Notes'; }
+    if (id === 'tab-quiz')       { notes = document.getElementById('quiz-notes-input').value.trim(); label = 'Quiz Notes'; }
+    if (id === 'tab-summary')    { notes = document.getElementById('sum-notes-input').value.trim();  label = 'Summary Notes'; }
+  }
+  var badge    = document.getElementById('ai-context-badge');
+  var suggList = document.getElementById('ai-suggestions-list');
+  if (notes && notes.length > 20) {
+    var preview = notes.slice(0, 40).split('\n').join(' ') + (notes.length > 40 ? '...' : '');
+    badge.textContent = label + ': "' + preview + '"';
+    badge.className = 'ai-context-badge';
+    suggList.innerHTML = noteSuggestions.map(function(s){
+      return '<button class="ai-suggestion-chip" onclick="sendSuggestion(this)">' + s + '</button>';
+    }).join('');
+  } else {
+    badge.textContent = 'No notes loaded — paste notes on any tab';
+    badge.className = 'ai-context-badge none';
+    suggList.innerHTML = defaultSuggestions.map(function(s){
+      return '<button class="ai-suggestion-chip" onclick="sendSuggestion(this)">' + s + '</button>';
+    }).join('');
+  }
+}
+
+function getActiveNotes() {
+  var activeTab = document.querySelector('.tab-section.active');
+  if (!activeTab) return '';
+  var id = activeTab.id;
+  var map = {
+    'tab-analyze':    'notes-input',
+    'tab-flashcards': 'fc-notes-input',
+    'tab-quiz':       'quiz-notes-input',
+    'tab-summary':    'sum-notes-input'
+  };
+  var el = document.getElementById(map[id] || '');
+  return el ? el.value.trim() : '';
+}
+
+function sendSuggestion(btn) {
+  document.getElementById('ai-input').value = btn.textContent;
+  sendAIMessage();
+}
+
+function handleAIKey(e) {
+  if (e.key === 'Enter' && !e.shiftKey) {
+    e.preventDefault();
+    sendAIMessage();
+  }
+}
+
+function autoResizeAI(el) {
+  el.style.height = 'auto';
+  el.style.height = Math.min(el.scrollHeight, 120) + 'px';
+}
+
+function getTime() {
+  return new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+}
+
+function formatAIText(text) {
+  return text
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/\*\*(.+?)\*\*/g, '<strong>$1</strong>')
+    .replace(/\*(.+?)\*/g, '<em>$1</em>')
+    .replace(/`([^`]+)`/g, '<code>$1</code>')
+    .replace(/\n/g, '<br>');
+}
+
+function appendMessage(role, text) {
+  var container = document.getElementById('ai-messages');
+  var div = document.createElement('div');
+  div.className = 'msg ' + role;
+  var avatarText = (role === 'ai') ? '\u2736' : 'You';
+  div.innerHTML =
+    '<div class="msg-avatar">' + avatarText + '</div>' +
+    '<div class="msg-body">' +
+      '<div class="msg-bubble">' + formatAIText(text) + '</div>' +
+      '<div class="msg-time">' + getTime() + '</div>' +
+    '</div>';
+  container.appendChild(div);
+  container.scrollTop = container.scrollHeight;
+  return div;
+}
+
+function showTyping() {
+  var container = document.getElementById('ai-messages');
+  var div = document.createElement('div');
+  div.className = 'msg ai';
+  div.id = 'ai-typing';
+  div.innerHTML =
+    '<div class="msg-avatar">\u2736</div>' +
+    '<div class="msg-body"><div class="typing-bubble">' +
+    '<div class="typing-dot"></div>' +
+    '<div class="typing-dot"></div>' +
+    '<div class="typing-dot"></div>' +
+    '</div></div>';
+  container.appendChild(div);
+  container.scrollTop = container.scrollHeight;
+}
+
+function hideTyping() {
+  var el = document.getElementById('ai-typing');
+  if (el) el.remove();
+}
+
+async function sendAIMessage() {
+  if (aiTyping) return;
+  var input    = document.getElementById('ai-input');
+  var userText = input.value.trim();
+  if (!userText) return;
+
+  input.value = '';
+  input.style.height = 'auto';
+  document.getElementById('ai-suggestions').style.display = 'none';
+
+  appendMessage('user', userText);
+  aiChatHistory.push({ role: 'user', content: userText });
+
+  aiTyping = true;
+  document.getElementById('ai-send-btn').disabled = true;
+  showTyping();
+
+  // The notes go to the server, which adds the passages relevant to each question.
+  var notes = getActiveNotes() || '';
+  var systemPrompt = notes
+    ? 'You are Nova, a friendly and expert AI study tutor inside SmartNotes. Passages from the student\'s notes that relate to their question are given below — use them as context to answer accurately and helpfully. Be concise, clear, and encouraging. Use **bold** for key terms.'
+    : 'You are Nova, a friendly and expert AI study tutor inside SmartNotes. Help students understand academic concepts, clear doubts, explain topics, and guide their learning. Be concise, clear, and encouraging. Use **bold** for key terms.';
+
+  try {
+    var response = await postNotes('/api/chat', notes, {
+      system: systemPrompt,
+      messages: aiChatHistory.slice(-20),
+      first_index: Math.max(0, aiChatHistory.length - 20),
+      conversation_id: aiConversationId,
+      stream: true
+    });
+
+    var streamed = '';
+    var bubble = null;
+    var streamError = null;
+    var data = await readSSE(response, function(event, payload) {
+      if (event === 'token') {
+        streamed += payload.delta;
+        if (!bubble) { hideTyping(); bubble = appendMessage('ai', streamed).querySelector('.msg-bubble'); }
+        else bubble.innerHTML = formatAIText(streamed);
+        var container = document.getElementById('ai-messages');
+        container.scrollTop = container.scrollHeight;
+      } else if (event === 'done') {
+        streamed = payload.reply;
+      } else if (event === 'error') {
+        streamError = payload.error;
+      }
+    });
+
+    if (data && (!response.ok || data.error)) {
+      throw new Error(data.error || ('Server error: ' + response.status));
+    }
+    if (streamError) throw new Error(streamError);
+
+    var aiText = (data ? data.reply : streamed) || 'I received your message but had no content to return. Please try again.';
+    aiChatHistory.push({ role: 'assistant', content: aiText });
+    hideTyping();
+    if (bubble) bubble.innerHTML = formatAIText(aiText);
+    else appendMessage('ai', aiText);
+
+  } catch (err) {
+    hideTyping();
+    var msg = (err && err.message) ? err.message : 'Could not reach the server.';
+    appendMessage('ai', 'Sorry, something went wrong: **' + msg + '**\n\nMake sure your Flask server is running on port 5000.');
+  } finally {
+    aiTyping = false;
+    document.getElementById('ai-send-btn').disabled = false;
+    input.focus();
+  }
+}
+
+function clearChat() {
+  if (!confirm('Clear chat history?')) return;
+  aiChatHistory = [];
+  aiConversationId = newConversationId();
+  var container = document.getElementById('ai-messages');
+  container.innerHTML =
+    '<div class="ai-welcome">' +
+      '<span class="ai-welcome-icon">\uD83E\uDD16</span>' +
+      '<h3>Chat cleared!</h3>' +
+      '<p>Ask me anything about your notes or any topic you want to understand better.</p>' +
+    '</div>';
+  document.getElementById('ai-suggestions').style.display = 'block';
+  updateAIContext();
+}
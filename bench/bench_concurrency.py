@@ -0,0 +1,106 @@
+"""
+Benchmark: throughput of the app under gunicorn with many requests in flight,
+comparing the old sync-worker start command with api/gunicorn.conf.py.
+
+Groq is replaced by bench/mock_groq.py answering every completion after a
+fixed delay, so the numbers measure only how many slow upstream calls the
+server can overlap.
+
+Run from the repo root:  python bench/bench_concurrency.py [in_flight] [latency_s]
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import mock_groq
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(args, groq_url, port, cache=False):
+    env = dict(os.environ, GROQ_API_KEY="bench", GROQ_BASE_URL=groq_url, PORT=str(port))
+    if not cache:
+        env["LLM_CACHE"] = "off"
+    proc = subprocess.Popen(["gunicorn", *args, "--bind", f"127.0.0.1:{port}", "app:app"],
+                            cwd=API_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def post_quiz(base):
+    req = urllib.request.Request(
+        base + "/api/quiz", data=json.dumps({"notes": "Paging maps pages to frames."}).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=300) as res:
+        res.read()
+    return time.perf_counter() - t0
+
+
+def get_index(base):
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(base + "/", timeout=300) as res:
+        res.read()
+    return time.perf_counter() - t0
+
+
+def run_profile(name, args, groq_url, in_flight):
+    port = free_port()
+    proc = start_app(args, groq_url, port)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with ThreadPoolExecutor(in_flight + 1) as pool:
+            t0 = time.perf_counter()
+            quiz = [pool.submit(post_quiz, base) for _ in range(in_flight)]
+            time.sleep(0.2)
+            index = pool.submit(get_index, base)
+            latencies = sorted(f.result() for f in quiz)
+            wall = time.perf_counter() - t0
+            index_latency = index.result()
+    finally:
+        proc.terminate()
+        proc.wait()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<28} {in_flight / wall:8.1f} req/s   wall {wall:6.2f}s   "
+          f"p50 {p50:6.2f}s   p95 {p95:6.2f}s   GET / during load {index_latency:6.2f}s")
+
+
+def main():
+    in_flight = int(sys.argv[1]) if len(sys.argv) > 1 else 128
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    groq = mock_groq.start(latency=f"fixed:{latency}", tokens_per_second=0)
+    groq_url = mock_groq.url(groq)
+    print(f"{in_flight} concurrent POST /api/quiz, upstream latency {latency:.1f}s")
+    # gunicorn picks up api/gunicorn.conf.py on its own and turns sync workers
+    # into gthread when threads > 1, so pin the old model explicitly.
+    run_profile("sync, 2 workers (old)",
+                ["--workers", "2", "--worker-class", "sync", "--threads", "1"],
+                groq_url, in_flight)
+    run_profile("gunicorn.conf.py (gthread)", ["--config", "gunicorn.conf.py"],
+                groq_url, in_flight)
+    groq.shutdown()
+
+
+if __name__ == "__main__":
+    main()
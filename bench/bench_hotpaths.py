@@ -0,0 +1,234 @@
+"""
+Benchmark: the CPU work a request does before and after the Groq call —
+smart_trim, extract_syllabus_keywords, extract_json and the prompt builders —
+over reproducible synthetic corpora (notes from 1 KB to 10 MB, short to long
+syllabi, model outputs bare, fenced, wrapped in prose or truncated).
+
+Each case reports the best wall time and the peak traced memory, and is
+compared against bench/baseline.json. A case that is slower or uses more
+memory than the baseline by more than the tolerance is a regression, and the
+script exits with status 1.
+
+Timings depend on the machine: record a baseline on the machine you compare
+on (`--update`), and commit it only from a quiet one.
+
+Run from the repo root:
+    python bench/bench_hotpaths.py                 compare against the baseline
+    python bench/bench_hotpaths.py --update        rewrite the baseline
+    python bench/bench_hotpaths.py --quick         skip the 10 MB corpus
+    python bench/bench_hotpaths.py -k smart_trim   only cases whose name contains this
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+import app  # noqa: E402
+from jsonextract import extract_json  # noqa: E402
+from bench_smart_trim import SYLLABUS, make_notes  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+NOTE_SIZES = [("1KB", 1024), ("10KB", 10 * 1024), ("100KB", 100 * 1024),
+              ("1MB", 1024 * 1024), ("10MB", 10 * 1024 * 1024)]
+
+TOPICS = (
+    "process scheduling", "virtual memory", "page replacement", "file systems",
+    "disk scheduling", "deadlock avoidance", "semaphores and monitors",
+    "remote procedure calls", "consistency models", "interrupt handling",
+    "system calls", "thread synchronization", "memory allocation", "caching",
+    "distributed consensus", "input output subsystems", "device drivers",
+)
+
+
+def make_syllabus(lines, seed=0):
+    rng = random.Random(seed)
+    out = []
+    for i in range(lines):
+        topic = rng.choice(TOPICS)
+        extra = ", ".join(rng.sample(TOPICS, k=rng.randint(1, 3)))
+        out.append(f"{i + 1}. {topic.capitalize()}: {extra}")
+    return "\n".join(out)
+
+
+SYLLABI = [("short", SYLLABUS), ("medium", make_syllabus(40, seed=1)),
+           ("long", make_syllabus(400, seed=2))]
+
+
+def make_flashcards(n, seed=0):
+    rng = random.Random(seed)
+    return json.dumps([{
+        "id": i + 1,
+        "front": f"What is {rng.choice(TOPICS)}?",
+        "back": " ".join(rng.choice(app.BASE_KEYWORDS) for _ in range(30)),
+        "topic": rng.choice(TOPICS),
+        "difficulty": rng.choice(["easy", "medium", "hard"]),
+    } for i in range(n)], indent=2)
+
+
+def wrap_output(body, style):
+    if style == "bare":
+        return body
+    if style == "json_fence":
+        return f"```json\n{body}\n```"
+    if style == "plain_fence":
+        return f"```\n{body}\n```"
+    return f"Sure! Here is the JSON you asked for:\n\n{body}\n\nLet me know if you need anything else."
+
+
+OUTPUT_STYLES = ["bare", "json_fence", "plain_fence", "prose"]
+
+
+def cold_caches():
+    """Forget scored documents and syllabus matchers so every run does the full work."""
+    with app._scored_docs_lock:
+        app._scored_docs.clear()
+    app.syllabus_matcher.cache_clear()
+
+
+def build_cases(quick):
+    """(name, setup, fn) for every case; setup runs untimed before each call."""
+    cases = []
+    sizes = NOTE_SIZES[:-1] if quick else NOTE_SIZES
+    for label, size in sizes:
+        notes = make_notes(size)
+        cases.append((f"smart_trim/notes/{label}", cold_caches,
+                      lambda notes=notes: app.smart_trim(notes, app.MAX_NOTES_CHARS, SYLLABUS)))
+        cases.append((f"smart_trim/flashcards/{label}", cold_caches,
+                      lambda notes=notes: app.smart_trim(notes, app.MAX_FC_CHARS)))
+
+    for label, syllabus in SYLLABI:
+        cases.append((f"extract_syllabus_keywords/{label}", None,
+                      lambda syllabus=syllabus: app.extract_syllabus_keywords(syllabus)))
+        cases.append((f"smart_trim/syllabus/{label}", cold_caches,
+                      lambda syllabus=syllabus: app.smart_trim(syllabus, app.MAX_SYLLABUS_CHARS)))
+
+    for cards in (10, 200):
+        body = make_flashcards(cards)
+        for style in OUTPUT_STYLES:
+            text = wrap_output(body, style)
+            cases.append((f"extract_json/{cards}cards/{style}", None,
+                          lambda text=text: extract_json(text)))
+        # Cut off mid-card, as when the model runs into max_tokens.
+        truncated = wrap_output(body, "json_fence")[:int(len(body) * 0.9)]
+        cases.append((f"extract_json/{cards}cards/truncated", None,
+                      lambda text=truncated: extract_json(text, app.FLASHCARDS_SCHEMA)))
+
+    notes = app.smart_trim(make_notes(1024 * 1024), app.MAX_NOTES_CHARS, SYLLABUS)
+    syllabus = app.smart_trim(SYLLABI[1][1], app.MAX_SYLLABUS_CHARS)
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": make_notes(600, seed=i)}
+                for i in range(8)]
+    cases += [
+        ("prompt/analyze", None, lambda: app.build_analyze_prompt(notes, syllabus)),
+        ("prompt/flashcards", None, lambda: app.build_flashcard_prompt(notes)),
+        ("prompt/quiz", None, lambda: app.build_quiz_prompt(notes)),
+        ("prompt/evaluate", None,
+         lambda: app.build_evaluate_prompt(6, sorted(TOPICS[:4]))),
+        ("prompt/chat_summary", None, lambda: app.build_chat_summary_prompt("", messages)),
+    ]
+    for style in ("brief", "detailed", "bullet", "mindmap"):
+        cases.append((f"prompt/summary/{style}", cold_caches,
+                      lambda style=style: app.summary_prompt(notes, style)))
+    return cases
+
+
+def measure(setup, fn, min_time=0.5, max_runs=100):
+    """Best wall time over enough runs to fill `min_time`, and peak traced bytes of one run."""
+    times = []
+    while len(times) < 3 or (sum(times) < min_time and len(times) < max_runs):
+        if setup:
+            setup()
+        gc.disable()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+        gc.enable()
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def ratios(seconds, peak, base):
+    # Sub-100µs cases are mostly timer noise, and small allocations swing with
+    # interpreter state; only compare cases above those floors.
+    time_ratio = seconds / base["seconds"] if max(seconds, base["seconds"]) > 1e-4 else 1.0
+    mem_ratio = peak / base["peak_bytes"] if base["peak_bytes"] > 64 * 1024 else 1.0
+    return time_ratio, mem_ratio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--update", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--quick", action="store_true", help="skip the 10 MB corpus")
+    parser.add_argument("-k", dest="filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--time-tolerance", type=float, default=1.5,
+                        help="fail when a case is this many times slower than the baseline (default 1.5)")
+    parser.add_argument("--memory-tolerance", type=float, default=1.25,
+                        help="fail when peak memory grows by this factor (default 1.25)")
+    args = parser.parse_args()
+
+    def regressed(time_ratio, mem_ratio):
+        return time_ratio > args.time_tolerance or mem_ratio > args.memory_tolerance
+
+    baseline = load_baseline()
+    results, regressions = {}, []
+    print(f"{'case':<38} {'best':>11} {'peak mem':>10}   vs baseline")
+    for name, setup, fn in build_cases(args.quick):
+        if args.filter not in name:
+            continue
+        seconds, peak = measure(setup, fn)
+        base = baseline.get(name)
+        note = "new"
+        if base:
+            # A single slow pass is usually a noisy neighbour; measure again
+            # before calling it a regression.
+            for _ in range(2):
+                if not regressed(*ratios(seconds, peak, base)):
+                    break
+                retry_seconds, retry_peak = measure(setup, fn)
+                seconds, peak = min(seconds, retry_seconds), min(peak, retry_peak)
+            time_ratio, mem_ratio = ratios(seconds, peak, base)
+            note = f"time x{time_ratio:.2f}  mem x{mem_ratio:.2f}"
+            if regressed(time_ratio, mem_ratio):
+                note += "  REGRESSION"
+                regressions.append(name)
+        results[name] = {"seconds": round(seconds, 6), "peak_bytes": peak}
+        print(f"{name:<38} {seconds * 1000:9.3f}ms {peak / 1024:8.0f}KB   {note}")
+
+    if args.update:
+        merged = {**baseline, **results}
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(dict(sorted(merged.items())), f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {os.path.relpath(BASELINE_PATH)} ({len(results)} cases)")
+        return 0
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) against {os.path.relpath(BASELINE_PATH)}:")
+        for name in regressions:
+            print(f"  {name}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
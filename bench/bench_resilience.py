@@ -0,0 +1,145 @@
+"""
+Benchmark: tail latency of call_ai against a slow, flaky Groq, with and
+without the retry / hedging / circuit-breaker layer in api/resilience.py.
+
+bench/mock_groq.py serves the completions, with a heavy-tailed time to first
+token and a share of 429/5xx errors. Each configuration sends the same number
+of quiz prompts from a fixed number of threads, and reports p50/p95/p99,
+the error rate and how many requests reached Groq. `before` is the old
+client: one call with the SDK's own two retries and a 30 s timeout.
+
+The outage scenario fails every request, as when Groq is down, and shows how
+long each call takes to fail with and without the breaker.
+
+Run from the repo root:
+    python bench/bench_resilience.py
+    python bench/bench_resilience.py --requests 800 --latency lognormal:0.4,1.0 --error-rate 0.1
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mock_groq
+
+MOCK = None
+
+
+def setup(args):
+    global MOCK
+    MOCK = mock_groq.start(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                           error_rate=args.error_rate)
+    os.environ["GROQ_BASE_URL"] = mock_groq.url(MOCK)
+    os.environ["GROQ_API_KEY"] = "bench"
+    os.environ["LLM_CACHE"] = "off"
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+
+def configurations(app, resilience):
+    from groq import Groq
+
+    sdk_retries = Groq(api_key="bench", base_url=os.environ["GROQ_BASE_URL"])
+    deadlines = app.GROQ_DEADLINES
+    create = app.client.chat.completions.create
+
+    def breaker():
+        return resilience.CircuitBreaker(threshold=5, cooldown=30.0)
+
+    return {
+        "before":          lambda: resilience.Resilient(sdk_retries.chat.completions.create,
+                                                        default_deadline=30.0, attempts=1),
+        "retries":         lambda: resilience.Resilient(create, deadlines, attempts=3, breaker=breaker()),
+        "retries+hedging": lambda: resilience.Resilient(create, deadlines, attempts=3, breaker=breaker(),
+                                                        hedge=True),
+    }
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))]
+
+
+def drive(app, prompt, requests, concurrency):
+    """Runs call_ai `requests` times; returns ([seconds], errors)."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(_):
+        nonlocal errors
+        t0 = time.perf_counter()
+        try:
+            app.call_ai(prompt, max_tokens=2500, cache=False, endpoint="quiz")
+            ok = True
+        except Exception:
+            ok = False
+        with lock:
+            latencies.append(time.perf_counter() - t0)
+            errors += not ok
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return sorted(latencies), errors
+
+
+def warm_up(app, prompt, n=40):
+    """Fills the latency window the hedge delay is taken from."""
+    for _ in range(n):
+        try:
+            app.call_ai(prompt, max_tokens=2500, cache=False, endpoint="quiz")
+        except Exception:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of call_ai with and without resilience.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", default="lognormal:0.3,1.2",
+                        help="mock time to first token, as in mock_groq.py (default lognormal:0.3,1.2)")
+    parser.add_argument("--tokens-per-second", type=float, default=20000.0)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--outage-requests", type=int, default=40,
+                        help="calls in the outage scenario (0 skips it)")
+    args = parser.parse_args()
+
+    setup(args)
+    import app  # noqa: E402
+    import resilience  # noqa: E402
+    app.app.logger.disabled = True
+    from bench_smart_trim import make_notes
+    prompt = app.build_quiz_prompt(make_notes(4096))
+    stats = MOCK.RequestHandlerClass.config.stats
+
+    print(f"mock: latency {args.latency}, error rate {args.error_rate:.0%}; "
+          f"{args.requests} calls from {args.concurrency} threads\n")
+    header = f"{'config':<16} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'errors':>7} {'groq reqs':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, make in configurations(app, resilience).items():
+        app.groq_calls = make()
+        warm_up(app, prompt)
+        sent = stats.get("requests", 0)
+        latencies, errors = drive(app, prompt, args.requests, args.concurrency)
+        sent = stats.get("requests", 0) - sent
+        print(f"{name:<16} {percentile(latencies, 50):>7.3f}s {percentile(latencies, 95):>7.3f}s "
+              f"{percentile(latencies, 99):>7.3f}s {latencies[-1]:>7.3f}s "
+              f"{errors / args.requests:>7.1%} {sent / args.requests:>9.2f}x")
+
+    if args.outage_requests:
+        MOCK.RequestHandlerClass.config.error_rate = 1.0
+        print(f"\noutage: every request fails; {args.outage_requests} calls from 4 threads")
+        for name, make in configurations(app, resilience).items():
+            if name == "retries+hedging":
+                continue
+            app.groq_calls = make()
+            latencies, _ = drive(app, prompt, args.outage_requests, 4)
+            print(f"{name:<16} p50 {percentile(latencies, 50):.3f}s  p99 {percentile(latencies, 99):.3f}s  "
+                  f"total {sum(latencies):.1f}s of waiting")
+    MOCK.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Benchmark: chat grounding on large notes. Times building the passage index
+(cold, then again for the same notes after an edit in the middle, which
+reuses the unchanged passages' term counts) and the per-turn query, and
+compares the chat prompt's size with retrieved passages against the old
+frontend behaviour of pasting the first 4,000 characters of the notes.
+
+Run from the repo root:  python bench/bench_retrieval.py [size_kb]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+import app  # noqa: E402
+from bench_smart_trim import make_notes  # noqa: E402
+
+QUESTIONS = [
+    "How does the banker's algorithm avoid deadlock?",
+    "What is the difference between paging and segmentation?",
+    "Explain round robin scheduling",
+    "why?",
+]
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    size_kb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+    notes = make_notes(size_kb * 1024)
+    middle = len(notes) // 2
+    edited = notes[:middle] + " Also note that thrashing wastes time. " + notes[middle:]
+
+    index, cold = timed(app.notes_index, notes)
+    _, warm = timed(app.notes_index, notes)
+    _, rebuilt = timed(app.notes_index, edited)
+    print(f"{size_kb} KB of notes, {len(index.passages)} passages")
+    print(f"  index build (cold)       {cold * 1000:8.1f} ms")
+    print(f"  index lookup (cached)    {warm * 1000:8.1f} ms")
+    print(f"  index build (after edit) {rebuilt * 1000:8.1f} ms")
+
+    messages = []
+    for question in QUESTIONS:
+        messages.append({"role": "user", "content": question})
+        runs = 50
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            passages = app.relevant_passages(index, messages)
+        per_query = (time.perf_counter() - t0) / runs
+        grounded = app.build_chat_context("You are Nova.", "", messages, passages)[0]["content"]
+        print(f"  {question[:40]:<40} {per_query * 1000:6.2f} ms/query, "
+              f"{len(passages)} passages, {app.estimate_tokens(grounded)} system-prompt tokens")
+        messages.append({"role": "assistant", "content": "..."})
+    pasted = "You are Nova.\n\nSTUDENT NOTES:\n" + notes[:4000]
+    print(f"  old prompt with the first 4,000 chars pasted: {app.estimate_tokens(pasted)} tokens")
+
+
+if __name__ == "__main__":
+    main()
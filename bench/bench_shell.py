@@ -0,0 +1,89 @@
+"""
+Benchmark: what a browser downloads for the page shell (GET /) and the
+assets it links, on a first visit and on a revisit.
+
+For each Accept-Encoding a browser might send, it reports the bytes on the
+wire for the shell plus its same-origin CSS/JS, and the median time to
+first byte of the shell over repeated requests. The revisit sends the
+shell's ETag back (If-None-Match) and, like a browser, does not fetch
+assets it already has under the same hashed URL.
+
+Run from the repo root:  python bench/bench_shell.py [base_url]
+Without base_url, a single-worker gunicorn is started from api/.
+"""
+import http.client
+import re
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+from bench_concurrency import free_port, start_app
+
+ACCEPT_ENCODINGS = [None, "gzip, deflate", "gzip, deflate, br"]
+ASSET = re.compile(rb'(?:href|src)="(/[^"/][^"]*)"')
+
+
+def get(netloc, path, headers):
+    """(status, headers, body bytes as sent, seconds to first byte)."""
+    conn = http.client.HTTPConnection(netloc, timeout=30)
+    t0 = time.perf_counter()
+    conn.request("GET", path, headers=headers)
+    res = conn.getresponse()
+    ttfb = time.perf_counter() - t0
+    body = res.read()
+    conn.close()
+    return res.status, dict(res.getheaders()), body, ttfb
+
+
+def decoded(body, encoding):
+    if encoding == "gzip":
+        import gzip
+        return gzip.decompress(body)
+    if encoding == "br":
+        import brotli
+        return brotli.decompress(body)
+    return body
+
+
+def measure(netloc, accept, runs=200):
+    headers = {"Accept-Encoding": accept} if accept else {}
+    _, res_headers, body, _ = get(netloc, "/", headers)
+    encoding = res_headers.get("Content-Encoding", "identity")
+    html = decoded(body, encoding)
+    assets = ASSET.findall(html)
+    first_visit = len(body) + sum(len(get(netloc, a.decode(), headers)[2]) for a in assets)
+
+    ttfbs = sorted(get(netloc, "/", headers)[3] for _ in range(runs))
+    etag = res_headers.get("ETag")
+    revisit = None
+    if etag:
+        status, _, body, _ = get(netloc, "/", dict(headers, **{"If-None-Match": etag}))
+        revisit = (status, len(body))
+    return encoding, first_visit, len(assets), statistics.median(ttfbs), revisit, res_headers.get("Cache-Control")
+
+
+def main():
+    proc = None
+    if len(sys.argv) > 1:
+        netloc = urlsplit(sys.argv[1]).netloc
+    else:
+        port = free_port()
+        proc = start_app(["-w", "1"], "http://127.0.0.1:9", port)
+        netloc = f"127.0.0.1:{port}"
+    try:
+        print(f"{'Accept-Encoding':<18} {'sent as':<9} {'first visit':>12} {'TTFB p50':>9} {'revisit':>14}  Cache-Control")
+        for accept in ACCEPT_ENCODINGS:
+            encoding, first_visit, n_assets, ttfb, revisit, cache_control = measure(netloc, accept)
+            revisit = f"{revisit[0]}, {revisit[1]} B" if revisit else "full page"
+            print(f"{accept or '(none)':<18} {encoding:<9} {first_visit / 1024:>8.1f} KB{'':1} "
+                  f"{ttfb * 1000:>7.2f}ms {revisit:>14}  {cache_control or '-'}"
+                  + (f"  (+{n_assets} assets)" if n_assets else ""))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: smart_trim line scoring, compiled keyword matcher vs. the old
+per-keyword `in` scan, and the per-request trimming path (notes budget, then
+flashcard and summary budgets) with and without a shared ScoredDocument.
+Also checks that the old and new paths produce identical output.
+
+Run from the repo root:  python bench/bench_smart_trim.py [size_kb]
+"""
+import os
+import random
+import re
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+import app  # noqa: E402
+
+SYLLABUS = """1. Introduction to operating systems and system calls
+2. Process scheduling: round robin, priority scheduling, shortest job first
+3. Memory management - paging, segmentation, virtual memory
+4. File systems and disk scheduling algorithms
+5. Deadlocks: detection, avoidance, banker's algorithm
+6. Concurrency, semaphores, monitors and the critical section problem
+7. Distributed systems, remote procedure calls and consistency models"""
+
+WORDS = (
+    "the process scheduler picks a task from the ready queue because memory "
+    "is limited therefore paging is used hence virtual memory for example "
+    "the banker's algorithm avoids deadlock whereas detection is reactive "
+    "semaphores guard the critical section such as a monitor in summary "
+    "file systems store data on disk and disk scheduling reduces seek time "
+    "remote procedure calls hide the network consistency models define order"
+).split()
+
+
+def make_notes(size, seed=0):
+    """Zipf-distributed prose: topic words mixed into a larger filler vocabulary."""
+    rng = random.Random(seed)
+    filler = ["".join(rng.choice("etaoinshrdlucmfwypvbgkq") for _ in range(rng.randint(2, 9)))
+              for _ in range(3000)]
+    vocab = filler + WORDS * 3
+    rng.shuffle(vocab)
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    out, total = [], 0
+    while total < size:
+        sentence = " ".join(rng.choices(vocab, weights, k=rng.randint(6, 30)))
+        sentence = sentence.capitalize() + rng.choice([".", ".", "!", "?", ".\n"])
+        out.append(sentence)
+        total += len(sentence) + 1
+    return " ".join(out)[:size]
+
+
+def legacy_scores(lines, syllabus):
+    syllabus_keywords = app.extract_syllabus_keywords(syllabus)
+
+    def score_line(line):
+        lower = line.lower()
+        syllabus_hits = sum(1 for kw in syllabus_keywords if kw in lower)
+        base_hits     = sum(1 for kw in app.BASE_KEYWORDS if kw in lower)
+        length_bonus  = min(len(line), 300) / 300
+        return syllabus_hits * 5 + base_hits * 2 + length_bonus
+
+    return [score_line(line) for line in lines]
+
+
+def matcher_scores(lines, syllabus):
+    tokens = app.KeywordMatcher.tokenize(lines)
+    syllabus_hits = app.KeywordMatcher(app.extract_syllabus_keywords(syllabus)).count_hits(lines, tokens)
+    base_hits = app._BASE_MATCHER.count_hits(lines, tokens)
+    return [s * 5 + b * 2 + min(len(line), 300) / 300
+            for s, b, line in zip(syllabus_hits, base_hits, lines)]
+
+
+def timed(fn, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def request_trims_uncached(notes, syllabus):
+    trimmed = app.ScoredDocument(notes, syllabus).trim(app.MAX_NOTES_CHARS)
+    return (trimmed,
+            app.ScoredDocument(trimmed).trim(app.MAX_FC_CHARS),
+            app.ScoredDocument(trimmed).trim(app.MAX_SUMMARY_CHARS))
+
+
+def request_trims_shared(notes, syllabus):
+    trimmed = app.ScoredDocument(notes, syllabus).trimmed(app.MAX_NOTES_CHARS)
+    return (trimmed.text,
+            trimmed.trim(app.MAX_FC_CHARS),
+            trimmed.trim(app.MAX_SUMMARY_CHARS))
+
+
+def request_trims_cached(notes, syllabus):
+    trimmed = app.scored_document(notes, syllabus).trimmed(app.MAX_NOTES_CHARS)
+    return (trimmed.text,
+            trimmed.trim(app.MAX_FC_CHARS),
+            trimmed.trim(app.MAX_SUMMARY_CHARS))
+
+
+def main():
+    size = int(sys.argv[1]) * 1024 if len(sys.argv) > 1 else 1024 * 1024
+    notes = make_notes(size)
+    raw_lines = re.split(r'(?<=[.!?])\s+|\n+', notes.strip())
+    lines = [l.strip() for l in raw_lines if l.strip()]
+
+    t_old, old = timed(legacy_scores, lines, SYLLABUS)
+    t_new, new = timed(matcher_scores, lines, SYLLABUS)
+    assert old == new, "score mismatch between legacy scan and KeywordMatcher"
+
+    print(f"input: {len(notes):,} chars, {len(lines):,} lines, "
+          f"{len(app.extract_syllabus_keywords(SYLLABUS))} syllabus keywords")
+    print(f"legacy `in` scan : {t_old * 1000:8.1f} ms")
+    print(f"KeywordMatcher   : {t_new * 1000:8.1f} ms   ({t_old / t_new:.1f}x)")
+
+    t_uncached, uncached = timed(request_trims_uncached, notes, SYLLABUS)
+    t_shared, shared = timed(request_trims_shared, notes, SYLLABUS)
+    assert uncached == shared, "trim mismatch between rescoring and ScoredDocument.trimmed"
+    print(f"notes + flashcard + summary trims, rescored each time : {t_uncached * 1000:8.1f} ms")
+    print(f"notes + flashcard + summary trims, one ScoredDocument : {t_shared * 1000:8.1f} ms")
+    request_trims_cached(notes, SYLLABUS)
+    t_cached, cached = timed(request_trims_cached, notes, SYLLABUS)
+    assert cached == shared
+    print(f"same notes again, document from scored_document cache : {t_cached * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
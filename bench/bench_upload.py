@@ -0,0 +1,113 @@
+"""
+Benchmark: server memory for a large notes upload, sent as JSON
+({"notes": ...}, parsed whole) and as a multipart .txt file (read and
+trimmed 64 KB at a time).
+
+Each case starts a fresh single-worker gunicorn, streams a generated notes
+file from disk to /api/notes, and reports the worker's peak RSS (VmHWM)
+above what it used after start-up, with the request's wall time. Both paths
+must return the same notes_id. Linux only (reads /proc).
+
+Run from the repo root:  python bench/bench_upload.py [size_mb ...]
+"""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+from bench_concurrency import free_port, start_app
+from bench_smart_trim import make_notes
+
+
+def worker_pid(master):
+    with open(f"/proc/{master.pid}/task/{master.pid}/children") as f:
+        return int(f.read().split()[0])
+
+
+def peak_rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def write_notes(path, size, kind):
+    """`size` // 1 MB copies of 1 MB of notes, JSON-escaped for the json body."""
+    block = make_notes(1024 * 1024)
+    if kind == "json":
+        block = json.dumps(block)[1:-1]
+    with open(path, "w") as f:
+        for _ in range(max(1, size // (1024 * 1024))):
+            f.write(block)
+
+
+def body_parts(kind):
+    """(prefix bytes, suffix bytes, content type) around the file's bytes."""
+    if kind == "json":
+        return b'{"notes": "', b'"}', "application/json"
+    boundary = uuid.uuid4().hex
+    prefix = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"notes.txt\"\r\n"
+              f"Content-Type: text/plain\r\n\r\n").encode()
+    suffix = f"\r\n--{boundary}--\r\n".encode()
+    return prefix, suffix, f"multipart/form-data; boundary={boundary}"
+
+
+def upload(port, path, kind):
+    prefix, suffix, content_type = body_parts(kind)
+    length = len(prefix) + os.path.getsize(path) + len(suffix)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    t0 = time.perf_counter()
+    conn.putrequest("POST", "/api/notes")
+    conn.putheader("Content-Type", content_type)
+    conn.putheader("Content-Length", str(length))
+    conn.endheaders()
+    conn.send(prefix)
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            conn.send(chunk)
+    conn.send(suffix)
+    res = conn.getresponse()
+    body = json.loads(res.read())
+    conn.close()
+    if res.status != 200:
+        raise RuntimeError(f"{kind} upload failed: {res.status} {body}")
+    return body["notes_id"], time.perf_counter() - t0
+
+
+def measure(path, kind):
+    port = free_port()
+    proc = start_app(["-w", "1", "--timeout", "600"], "http://127.0.0.1:9", port)
+    try:
+        pid = worker_pid(proc)
+        baseline = peak_rss_kb(pid)
+        notes_id, seconds = upload(port, path, kind)
+        return notes_id, (peak_rss_kb(pid) - baseline) / 1024, seconds
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    sizes = [float(a) for a in sys.argv[1:]] or [1, 10, 40]
+    print(f"{'notes':>8} {'body':<10} {'peak RSS +':>11} {'time':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mb in sizes:
+            ids = set()
+            for kind in ("json", "multipart"):
+                path = os.path.join(tmp, f"notes-{mb}.{kind}")
+                write_notes(path, int(mb * 1024 * 1024), kind)
+                notes_id, rss, seconds = measure(path, kind)
+                ids.add(notes_id)
+                print(f"{mb:>6g}MB {kind:<10} {rss:>9.1f}MB {seconds:>7.2f}s")
+            if len(ids) != 1:
+                print("  notes_id differs between the two bodies")
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+"""
+Load test: drives every route in api/app.py at a fixed concurrency and reports
+p50/p95/p99 latency, throughput and error rate per route.
+
+By default it starts bench/mock_groq.py and the app under gunicorn
+(api/gunicorn.conf.py), pointing the app at the mock through GROQ_BASE_URL
+and turning the LLM cache off, so every request does a full round trip.
+Pass --url to drive an app that is already running instead.
+
+Run from the repo root:
+    python bench/load_test.py --concurrency 64 --duration 30
+    python bench/load_test.py --routes quiz,chat_stream --latency lognormal:1.5,0.4 --error-rate 0.05
+    python bench/load_test.py --url http://127.0.0.1:10000 --requests 500
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_concurrency import free_port, start_app
+from bench_smart_trim import SYLLABUS, make_notes
+
+import mock_groq
+
+STYLES = ["brief", "detailed", "bullet", "mindmap", "all"]
+
+
+class Client:
+    """Builds varied request bodies so response caches do not flatten the results."""
+
+    def __init__(self, base, notes_kb):
+        self.base = base
+        self.notes_kb = notes_kb
+        self._seed = itertools.count()
+        self._notes_ids = []
+        self._lock = threading.Lock()
+
+    def notes(self):
+        return make_notes(self.notes_kb * 1024, seed=next(self._seed))
+
+    def request(self, method, path, body=None, stream=False):
+        """Returns (status, time to first byte, total seconds)."""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as res:
+                status = res.status
+                first = None
+                if stream:
+                    failed = False
+                    for line in res:
+                        if first is None:
+                            first = time.perf_counter() - t0
+                        failed = failed or line.startswith(b"event: error")
+                    if failed:
+                        status = 502
+                else:
+                    res.read(1)
+                    first = time.perf_counter() - t0
+                    res.read()
+        except urllib.error.HTTPError as e:
+            e.read()
+            status, first = e.code, time.perf_counter() - t0
+        except OSError:
+            status, first = 0, time.perf_counter() - t0
+        return status, first, time.perf_counter() - t0
+
+    def notes_id(self):
+        with self._lock:
+            if self._notes_ids:
+                return random.choice(self._notes_ids)
+        return self.upload()
+
+    def upload(self):
+        req = urllib.request.Request(
+            self.base + "/api/notes", headers={"Content-Type": "application/json"},
+            data=json.dumps({"notes": self.notes(), "syllabus": SYLLABUS}).encode())
+        with urllib.request.urlopen(req, timeout=300) as res:
+            notes_id = json.loads(res.read())["notes_id"]
+        with self._lock:
+            self._notes_ids.append(notes_id)
+        return notes_id
+
+
+QUIZ = mock_groq.PAYLOADS["quiz"]
+
+
+ROUTES = {
+    "index":          lambda c: c.request("GET", "/"),
+    "notes_upload":   lambda c: c.request("POST", "/api/notes", {"notes": c.notes(), "syllabus": SYLLABUS}),
+    "notes_info":     lambda c: c.request("GET", f"/api/notes/{c.notes_id()}"),
+    "analyze":        lambda c: c.request("POST", "/api/analyze", {"notes": c.notes(), "syllabus": SYLLABUS}),
+    "analyze_by_id":  lambda c: c.request("POST", "/api/analyze", {"notes_id": c.notes_id()}),
+    "flashcards":     lambda c: c.request("POST", "/api/flashcards", {"notes": c.notes()}),
+    "quiz":           lambda c: c.request("POST", "/api/quiz", {"notes": c.notes()}),
+    "evaluate_quiz":  lambda c: c.request("POST", "/api/evaluate-quiz", {
+        "questions": QUIZ, "answers": {str(q["id"]): random.choice("ABCD") for q in QUIZ}}),
+    "summarize":      lambda c: c.request("POST", "/api/summarize",
+                                          {"notes": c.notes(), "style": random.choice(STYLES)}),
+    "summarize_stream": lambda c: c.request("POST", "/api/summarize",
+                                            {"notes": c.notes(), "style": random.choice(STYLES),
+                                             "stream": True}, stream=True),
+    "study_pack":     lambda c: c.request("POST", "/api/study-pack", {"notes": c.notes(), "syllabus": SYLLABUS}),
+    "chat":           lambda c: c.request("POST", "/api/chat", chat_body(c)),
+    "chat_stream":    lambda c: c.request("POST", "/api/chat", {**chat_body(c), "stream": True}, stream=True),
+    "cache_stats":    lambda c: c.request("GET", "/api/cache/stats"),
+}
+
+
+def chat_body(client):
+    turns = random.randint(1, 12)
+    messages = [{"role": "user" if i % 2 == 0 else "assistant",
+                 "content": make_notes(random.randint(80, 600), seed=next(client._seed))}
+                for i in range(turns * 2 - 1)]
+    return {"messages": messages, "conversation_id": f"load-{random.randrange(1000)}"}
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_load(client, routes, concurrency, duration=None, total=None):
+    """Runs routes round-robin from `concurrency` threads; returns ({route: [(status, ttfb, seconds)]}, wall)."""
+    results = defaultdict(list)
+    lock = threading.Lock()
+    issued = itertools.count()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(offset):
+        for n in itertools.count(offset):
+            if total is not None and next(issued) >= total:
+                return
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            name = routes[n % len(routes)]
+            outcome = ROUTES[name](client)
+            with lock:
+                results[name].append(outcome)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    return results, time.perf_counter() - t0
+
+
+def report(results, wall):
+    header = (f"{'route':<18} {'reqs':>6} {'req/s':>7} {'errors':>7} {'p50':>8} {'p95':>8} "
+              f"{'p99':>8} {'ttfb p50':>9}")
+    print(header)
+    print("-" * len(header))
+    everything = []
+    for name in ROUTES:
+        outcomes = results.get(name)
+        if not outcomes:
+            continue
+        everything += outcomes
+        print_row(name, outcomes, wall)
+    print("-" * len(header))
+    print_row("all", everything, wall)
+
+
+def print_row(name, outcomes, wall):
+    latencies = sorted(o[2] for o in outcomes)
+    first = sorted(o[1] for o in outcomes)
+    errors = sum(1 for o in outcomes if not 200 <= o[0] < 300)
+    print(f"{name:<18} {len(outcomes):>6} {len(outcomes) / wall:>7.1f} {errors / len(outcomes):>7.1%} "
+          f"{percentile(latencies, 50):>7.3f}s {percentile(latencies, 95):>7.3f}s "
+          f"{percentile(latencies, 99):>7.3f}s {percentile(first, 50):>8.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive every app route at a fixed concurrency.")
+    parser.add_argument("--url", help="an already running app; skips starting the mock and gunicorn")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds to run (default 20)")
+    parser.add_argument("--requests", type=int, help="stop after this many requests instead")
+    parser.add_argument("--routes", default=",".join(ROUTES),
+                        help=f"comma-separated subset of: {', '.join(ROUTES)}")
+    parser.add_argument("--notes-kb", type=int, default=8, help="size of the generated notes")
+    parser.add_argument("--gunicorn-args", default="--config gunicorn.conf.py",
+                        help="arguments for the gunicorn the script starts")
+    parser.add_argument("--cache", action="store_true", help="leave the app's LLM cache on")
+    parser.add_argument("--latency", action="append", default=[],
+                        help="mock time to first token, as in mock_groq.py (default lognormal:0.5,0.4)")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)}")
+
+    mock = proc = None
+    base = args.url
+    if base is None:
+        latency, type_latency = "lognormal:0.5,0.4", {}
+        for spec in args.latency:
+            name, sep, rest = spec.partition("=")
+            if sep:
+                type_latency[name] = rest
+            else:
+                latency = spec
+        mock = mock_groq.start(latency=latency, type_latency=type_latency,
+                               tokens_per_second=args.tokens_per_second,
+                               error_rate=args.error_rate, truncate_rate=args.truncate_rate)
+        port = free_port()
+        proc = start_app(args.gunicorn_args.split(), mock_groq.url(mock), port, cache=args.cache)
+        base = f"http://127.0.0.1:{port}"
+
+    client = Client(base.rstrip("/"), args.notes_kb)
+    try:
+        if any(r in ("notes_info", "analyze_by_id") for r in routes):
+            client.upload()
+        limit = f"{args.requests} requests" if args.requests else f"{args.duration:.0f}s"
+        print(f"{base}: {len(routes)} routes, concurrency {args.concurrency}, {limit}")
+        results, wall = run_load(client, routes, args.concurrency,
+                                 duration=None if args.requests else args.duration,
+                                 total=args.requests)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    report(results, wall)
+    if mock is not None:
+        print(f"mock Groq: {json.dumps(mock.RequestHandlerClass.config.stats)}")
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,385 @@
+"""
+A local stand-in for the Groq chat-completions API, for load tests that
+should not spend real quota.
+
+It answers POST .../chat/completions the way Groq does. With `stream: true`
+it sends SSE chunks, ending with `x_groq.usage` and `[DONE]`. The reply is a
+canned payload chosen by recognising which of the app's prompts was sent
+(analyze, flashcards, quiz, evaluate, summary, chunk_digest, chat_summary or chat).
+
+Per request it samples a time to first token from a latency distribution.
+It then "generates" the completion at a fixed tokens-per-second rate. It
+can fail a share of requests with Groq-style error bodies, and cut a share
+of completions short with finish_reason "length", as max_tokens does.
+
+Point the app at it with configuration alone:
+    GROQ_BASE_URL=http://127.0.0.1:8800 gunicorn --config gunicorn.conf.py app:app
+
+Run from the repo root:
+    python bench/mock_groq.py --port 8800 --latency lognormal:0.8,0.5 --error-rate 0.02
+    python bench/mock_groq.py --latency quiz=fixed:3 --latency chat=uniform:0.2,0.6
+
+Latency specs: fixed:S, uniform:LO,HI, normal:MEAN,SD, lognormal:MEDIAN,SIGMA,
+exp:MEAN (all in seconds). `TYPE=SPEC` overrides the default for one prompt type.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMPT_TYPES = ["analyze", "flashcards", "quiz", "evaluate", "summary", "chunk_digest", "chat_summary", "chat"]
+
+PAYLOADS = {
+    "analyze": {
+        "overall_score": 72, "completeness": 68, "clarity": 80, "structure": 70,
+        "topics_covered": [
+            {"topic": "Process scheduling", "status": "complete",
+             "explanation": "Round robin and priority scheduling are both explained with examples."},
+            {"topic": "Virtual memory", "status": "partial",
+             "explanation": "Paging is described but page replacement policies are not."},
+            {"topic": "Deadlocks", "status": "missing",
+             "explanation": "No mention of deadlock detection or avoidance."},
+        ],
+        "strengths": ["Clear definitions", "Good use of examples", "Logical ordering"],
+        "weaknesses": ["Thin coverage of memory management", "No worked problems"],
+        "improvement_suggestions": ["Add page replacement examples", "Summarise each unit",
+                                    "Include a deadlock section"],
+        "summary": "Solid notes on scheduling with gaps in memory management and deadlocks.",
+    },
+    "flashcards": [
+        {"id": i, "front": f"Question {i} about process scheduling?",
+         "back": "Round robin gives each process a fixed time quantum before preempting it.",
+         "topic": "Process scheduling", "difficulty": ("easy", "medium", "hard")[i % 3]}
+        for i in range(1, 11)
+    ],
+    "quiz": [
+        {"id": i, "question": f"Question {i}: which policy avoids starvation?",
+         "options": ["A) Round robin", "B) Strict priority", "C) Shortest job first", "D) LIFO"],
+         "correct_answer": "A", "explanation": "Every process gets a time slice in turn.",
+         "topic": "Process scheduling", "difficulty": ("easy", "medium", "hard")[i % 3]}
+        for i in range(1, 9)
+    ],
+    "evaluate": {
+        "performance_level": "good",
+        "message": "Good work — you have the core ideas, and a little review will close the gaps.",
+        "recommendations": ["Revisit page replacement", "Practise deadlock questions", "Redo missed items"],
+        "study_plan": "Spend two short sessions on the weak topics, then retake the quiz.",
+        "next_steps": ["Re-read notes on weak topics", "Retake the quiz"],
+    },
+    "summary": {
+        "style": "all", "title": "Operating Systems Notes", "subject_area": "Operating Systems",
+        "word_count_estimate": 1200,
+        "brief_summary": "The notes cover scheduling, memory management and file systems.",
+        "detailed_summary": "Scheduling decides which process runs next. " * 20,
+        "bullet_summary": [f"Key point {i}" for i in range(1, 9)],
+        "key_definitions": [{"term": "Paging", "definition": "Mapping pages to frames."},
+                            {"term": "Quantum", "definition": "A round robin time slice."}],
+        "mindmap": {"root": "Operating Systems", "branches": [
+            {"topic": "Scheduling", "subtopics": ["Round robin", "Priority", "SJF"]},
+            {"topic": "Memory", "subtopics": ["Paging", "Segmentation"]},
+            {"topic": "Files", "subtopics": ["Allocation", "Directories"]},
+            {"topic": "Concurrency", "subtopics": ["Semaphores", "Monitors"]},
+        ]},
+        "connections": ["Scheduling affects memory pressure", "Paging relies on disk scheduling"],
+        "important_dates_or_numbers": [{"value": "4 KB", "context": "Typical page size"}],
+        "gaps": ["Deadlocks are not covered"],
+        "revision_tips": ["Draw the process state diagram", "Work a paging example", "Quiz yourself"],
+    },
+    "chunk_digest": {
+        "summary": "This part explains round robin and priority scheduling and how paging maps pages to frames.",
+        "key_points": ["Round robin preempts a process after a fixed quantum",
+                       "Priority scheduling can starve low-priority processes",
+                       "Paging splits memory into fixed-size frames"],
+        "definitions": [{"term": "Quantum", "definition": "The time slice a process runs before preemption."}],
+        "topics": ["Process scheduling", "Paging"],
+    },
+    "chat_summary": "The student asked about process scheduling and paging; Nova explained "
+                    "round robin with a worked example and defined page frames.",
+    "chat": "Great question! Round robin gives every process a short time slice in turn, so no "
+            "process waits forever. Think of it like taking turns on a swing: everyone gets a go "
+            "before anyone gets a second one. Want me to walk through an example with numbers?",
+}
+
+_PROMPT_MARKERS = [
+    ("analyze", "academic evaluator"),
+    ("flashcards", "academic flashcards"),
+    ("quiz", "multiple-choice quiz"),
+    ("evaluate", "A student scored"),
+    ("chunk_digest", "Condense this part of a student's notes"),
+    ("chat_summary", "running summary of a tutoring conversation"),
+]
+_SUMMARY_STYLE = re.compile(r'"style": "(\w+)"')
+_ITEM_COUNT = re.compile(r"exactly (\d+) (easy|medium|hard) ")
+
+# Question-bank prompts ask for N items of one difficulty; each gets its own wording.
+_BANK_WORDS = ("paging", "segmentation", "quantum", "semaphore", "monitor", "deadlock", "inode",
+               "journaling", "thrashing", "locality", "preemption", "starvation", "interrupt",
+               "context", "switch", "cache", "frame", "kernel", "mutex", "spooling")
+
+ERRORS = {
+    429: ("rate_limit_exceeded", "Rate limit reached for model. Please try again in 1s."),
+    500: ("internal_server_error", "Internal server error."),
+    503: ("service_unavailable", "Service unavailable. Please try again later."),
+}
+
+
+def classify(messages):
+    """Returns (prompt type, summary style or None) for a chat-completions request."""
+    prompt = messages[-1].get("content", "") if messages else ""
+    for name, marker in _PROMPT_MARKERS:
+        if marker in prompt:
+            return name, None
+    style = _SUMMARY_STYLE.search(prompt)
+    if style:
+        return "summary", style.group(1)
+    return "chat", None
+
+
+def parse_latency(spec):
+    """'lognormal:0.8,0.5' -> a function returning a sampled delay in seconds."""
+    kind, _, args = spec.partition(":")
+    params = [float(x) for x in args.split(",")] if args else []
+    samplers = {
+        "fixed": lambda s: s,
+        "uniform": lambda lo, hi: random.uniform(lo, hi),
+        "normal": lambda mean, sd: max(0.0, random.gauss(mean, sd)),
+        "lognormal": lambda median, sigma: random.lognormvariate(math.log(median), sigma),
+        "exp": lambda mean: random.expovariate(1 / mean),
+    }
+    if kind not in samplers:
+        raise ValueError(f"unknown latency distribution {kind!r}")
+    sampler = samplers[kind]
+    return lambda: sampler(*params)
+
+
+class MockConfig:
+    def __init__(self, latency="fixed:0.5", type_latency=None, tokens_per_second=400.0,
+                 error_rate=0.0, error_codes=(429, 500, 503), truncate_rate=0.0,
+                 chunk_chars=16, payloads=None):
+        self.latency = parse_latency(latency)
+        self.type_latency = {t: parse_latency(s) for t, s in (type_latency or {}).items()}
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_codes = list(error_codes)
+        self.truncate_rate = truncate_rate
+        self.chunk_chars = chunk_chars
+        self.payloads = {**PAYLOADS, **(payloads or {})}
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "truncated": 0}
+        self._lock = threading.Lock()
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def content(self, prompt_type, style, prompt=""):
+        wanted = _ITEM_COUNT.search(prompt) if prompt_type in ("quiz", "flashcards") else None
+        if wanted:
+            return json.dumps(bank_items(prompt_type, int(wanted.group(1)), wanted.group(2)), indent=2)
+        payload = self.payloads[prompt_type]
+        if isinstance(payload, str):
+            return payload
+        if prompt_type == "summary" and style:
+            payload = {**payload, "style": style}
+        return json.dumps(payload, indent=2)
+
+    def time_to_first_token(self, prompt_type):
+        return self.type_latency.get(prompt_type, self.latency)()
+
+    def generation_time(self, completion_tokens):
+        return completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+
+def bank_items(prompt_type, count, difficulty):
+    items = []
+    for i in range(1, count + 1):
+        a, b, c = random.sample(_BANK_WORDS, 3)
+        if prompt_type == "quiz":
+            items.append({"id": i, "question": f"How does {a} interact with {b} and {c}?",
+                          "options": ["A) It bounds it", "B) It replaces it", "C) It ignores it", "D) It delays it"],
+                          "correct_answer": "A", "explanation": f"{a.capitalize()} bounds {b}.",
+                          "topic": a.capitalize(), "difficulty": difficulty})
+        else:
+            items.append({"id": i, "front": f"What links {a}, {b} and {c}?",
+                          "back": f"{a.capitalize()} limits how {b} affects {c}.",
+                          "topic": a.capitalize(), "difficulty": difficulty})
+    return items
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None  # set per server by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        config = self.config
+        config.count("requests")
+        messages = body.get("messages", [])
+        prompt_type, style = classify(messages)
+        delay = config.time_to_first_token(prompt_type)
+
+        if config.error_rate and random.random() < config.error_rate:
+            config.count("errors")
+            time.sleep(delay)
+            code = random.choice(config.error_codes)
+            kind, message = ERRORS.get(code, ("api_error", "Mock error."))
+            headers = {"retry-after": "1"} if code == 429 else {}
+            self._send_json(code, {"error": {"message": message, "type": kind, "code": kind}}, headers)
+            return
+
+        content = config.content(prompt_type, style, messages[-1].get("content", "") if messages else "")
+        finish_reason = "stop"
+        max_chars = int(body.get("max_tokens") or 1 << 30) * 4
+        if len(content) > max_chars:
+            content, finish_reason = content[:max_chars], "length"
+        if config.truncate_rate and random.random() < config.truncate_rate:
+            config.count("truncated")
+            content, finish_reason = content[:random.randint(1, max(1, len(content) - 1))], "length"
+
+        usage = {
+            "prompt_tokens": sum(estimate_tokens(m.get("content", "")) for m in messages),
+            "completion_tokens": estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock")
+
+        time.sleep(delay)
+        if body.get("stream"):
+            config.count("streamed")
+            self._stream(completion_id, model, content, finish_reason, usage)
+            return
+        time.sleep(config.generation_time(usage["completion_tokens"]))
+        self._send_json(200, {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "finish_reason": finish_reason,
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _send_json(self, code, payload, headers=None):
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, completion_id, model, content, finish_reason, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(delta, finish=None, extra=None):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk",
+                     "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **(extra or {})}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+
+        size = self.config.chunk_chars
+        pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+        pause = self.config.generation_time(usage["completion_tokens"]) / len(pieces)
+        event({"role": "assistant", "content": ""})
+        for piece in pieces:
+            if pause:
+                time.sleep(pause)
+            event({"content": piece})
+        event({}, finish_reason, {"x_groq": {"id": completion_id, "usage": usage}})
+        self._write_chunk("data: [DONE]\n\n")
+        self._write_chunk("")
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(host="127.0.0.1", port=0, **config):
+    """A ThreadingHTTPServer serving the mock; `config` is passed to MockConfig."""
+    handler = type("MockHandler", (Handler,), {"config": MockConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start(host="127.0.0.1", port=0, **config):
+    """Starts the mock on a background thread and returns the server; its URL is `url(server)`."""
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = make_server(host, port, **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def url(server):
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Groq chat-completions stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", action="append", default=[],
+                        help="time to first token, e.g. lognormal:0.8,0.5; TYPE=SPEC for one prompt type")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0,
+                        help="generation speed after the first token; 0 answers at once")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-codes", default="429,500,503", help="status codes to fail with")
+    parser.add_argument("--truncate-rate", type=float, default=0.0,
+                        help="share of completions cut short with finish_reason=length")
+    parser.add_argument("--payloads", help="JSON file mapping prompt type to a canned reply (string or JSON)")
+    args = parser.parse_args()
+
+    latency, type_latency = "fixed:0.5", {}
+    for spec in args.latency:
+        name, sep, rest = spec.partition("=")
+        if sep:
+            if name not in PROMPT_TYPES:
+                parser.error(f"unknown prompt type {name!r}; expected one of {', '.join(PROMPT_TYPES)}")
+            type_latency[name] = rest
+        else:
+            latency = spec
+    payloads = None
+    if args.payloads:
+        with open(args.payloads) as f:
+            payloads = json.load(f)
+
+    ThreadingHTTPServer.request_queue_size = 1024
+    server = make_server(args.host, args.port, latency=latency, type_latency=type_latency,
+                         tokens_per_second=args.tokens_per_second, error_rate=args.error_rate,
+                         error_codes=[int(c) for c in args.error_codes.split(",")],
+                         truncate_rate=args.truncate_rate, payloads=payloads)
+    print(f"mock Groq listening on {url(server)}  (GROQ_BASE_URL={url(server)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.RequestHandlerClass.config.stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+
+from resilience import CircuitBreaker, CircuitOpen, DeadlineExceeded, RateLimiter, Resilient  # noqa: E402
+
+
+class ProbeRejectedByLimiterTest(unittest.TestCase):
+    def test_breaker_probes_again_after_the_limiter_turns_the_probe_away(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        limiter = RateLimiter(per_minute=60, burst=1)
+        calls = []
+        resilient = Resilient(lambda **kwargs: calls.append(kwargs) or "ok",
+                              deadlines={"chat": 0.2}, breaker=breaker, limiter=limiter)
+
+        breaker.failure()
+        self.assertTrue(limiter.acquire(1.0))  # the bucket is now empty for about a second
+        time.sleep(0.06)
+        self.assertEqual(breaker.state, "half_open")
+
+        with self.assertRaises(DeadlineExceeded):
+            resilient.create("chat")
+        self.assertEqual(calls, [])
+
+        # The abandoned probe must not leave the breaker rejecting every call.
+        self.assertTrue(breaker.check())
+        breaker.abandon_probe()
+        time.sleep(1.0)
+        self.assertEqual(resilient.create("chat"), "ok")
+        self.assertEqual(breaker.state, "closed")
+
+    def test_a_second_call_is_rejected_while_the_probe_is_out(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+        breaker.failure()
+        self.assertTrue(breaker.check())
+        with self.assertRaises(CircuitOpen):
+            breaker.check()
+
+
+class BreakerAccountingTest(unittest.TestCase):
+    def test_an_error_raised_outside_groq_leaves_the_breaker_as_it_was(self):
+        def broken(**kwargs):
+            raise ValueError("could not parse the completion")
+
+        breaker = CircuitBreaker(threshold=2, cooldown=60.0)
+        resilient = Resilient(broken, breaker=breaker)
+        breaker.failure()
+        with self.assertRaises(ValueError):
+            resilient.create("chat")
+        breaker.failure()
+        self.assertEqual(breaker.state, "open")  # the ValueError did not reset the count
+
+    def test_a_probe_that_raises_outside_groq_lets_the_next_call_probe(self):
+        def broken(**kwargs):
+            raise ValueError("could not parse the completion")
+
+        breaker = CircuitBreaker(threshold=1, cooldown=0.0)
+        breaker.failure()
+        with self.assertRaises(ValueError):
+            Resilient(broken, breaker=breaker).create("chat")
+        self.assertEqual(breaker.state, "half_open")
+        self.assertTrue(breaker.check())
+
+
+if __name__ == "__main__":
+    unittest.main()